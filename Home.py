@@ -1,17 +1,44 @@
 import streamlit as st
 import time
 import os
+import uuid
 from datetime import datetime
-from openai import OpenAI
+from openai import OpenAI, NotFoundError
 import pandas as pd
-import tempfile
+import json
+from Utils.jobs import submit_job, get_job, list_jobs, is_finished, report_progress, job_duration
+from Utils.upload_ledger import content_hash, find_upload, record_upload, forget_file
+from Utils.upload_bodies import upload_body
+from Utils.projects import project_key
+from Utils.project_store import PERSISTED_KEYS, save_project, load_project, list_projects, delete_project
+from Utils.vector_lifecycle import register_file, touch_file, touch_project, schedule_compaction
+from Utils.vector_routing import route_vector_store, get_project_vector_store, file_attributes, file_search_resources
+from Utils.upload_pipeline import run_upload_pipeline, clear_checkpoints, with_retries
+from Utils.local_index import index_source, SHARED_SCOPE
+from Utils.assistant_pool import get_pooled_assistant, project_instructions
+from Utils.orchestrator import run_stages, format_stage_statuses, StageFailed
+from Utils.streaming import RunStreamHandler
+from Utils.run_waiter import stream_run
+from Utils.context_policy import run_options, start_fresh_thread
+from Utils.run_scheduler import run_slot, post_exchange
+from Utils.artifact_cache import fetch_artifacts
+from Utils.answer_cache import lookup_answer, store_answer, data_version, bump_data_version
+from Utils.sheet_cache import save_sheets, load_sheets
+from Utils.query_router import route_question
+from Utils.resource_registry import register_resource, touch_resource, claim_resource, release_project, resource_live, schedule_reaper
 
 # Initialize OpenAI client
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
-# Vector Store ID for main RAG system (replace with your actual vector store ID)
+# Shared Vector Store ID for tenant-wide knowledge; project data is routed to per-project stores
 VECTOR_STORE_ID = 'vs_qUspcB7VllWXM4z7aAEdIK9L'
 
+# How long the processing stages wait for a still-running prewarm before doing the work themselves
+PREWARM_WAIT_SECONDS = 120
+
+# Set DDMAC_DEBUG_JOBS=1 to also list every session's background jobs in the sidebar
+SHOW_ALL_JOBS = os.getenv("DDMAC_DEBUG_JOBS") == "1"
+
 # AccuBid standard sheet mappings
 ACCUBID_SHEET_MAPPINGS = {
     "Ext": {"meaning": "Extensions", "description": "Total day to day material, eg screws, pipes, plugs, etc"},
@@ -233,84 +260,296 @@ def generate_markdown_from_excel(sheet_data, sheet_info, project_info):
     
     return markdown_content
 
-def upload_to_vector_store(markdown_content, filename):
-    """Upload markdown content to vector store"""
+def upload_to_vector_store(markdown_content, filename, digest=None, project_info=None):
+    """Upload markdown content to the project's vector store (skipped if identical content is already there)"""
     try:
         # Debug: Check if vector store ID is set
         if not VECTOR_STORE_ID:
             return False, "❌ Vector Store ID not configured"
+        
+        vector_store_id = route_vector_store(client, project_info, VECTOR_STORE_ID)
+        project = project_key(project_info)
+        
+        # The local retrieval index gets the same chunk records as the vector store
+        report_progress("Updating local retrieval index...")
+        index_source(project or SHARED_SCOPE, filename, markdown_content)
+        
+        digest = digest or content_hash(markdown_content)
+        existing = find_upload(digest, vector_store_id)
+        if existing:
+            touch_file(existing['file_id'])
+            return True, f"Already in vector store (file {existing['file_id']})"
             
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.md', delete=False) as temp_file:
-            temp_file.write(markdown_content)
-            temp_file_path = temp_file.name
-
-        with open(temp_file_path, "rb") as f:
-            file_batch = client.vector_stores.file_batches.upload_and_poll(
-                vector_store_id=VECTOR_STORE_ID,
-                files=[f]
-            )
-
-        os.remove(temp_file_path)
+        # Checkpointed per content and store, so a retry resumes after the last finished step
+        pipeline_id = f"vector_upload:{vector_store_id}:{digest}"
+        results = run_upload_pipeline(
+            client, pipeline_id, vector_store_id,
+            [(filename, markdown_content, file_attributes(project_info, "project_data"))]
+        )
+        file_id, status = results[filename]
         
-        if file_batch.status == "completed":
+        if status == "completed":
+            record_upload(digest, file_id, filename, len(markdown_content.encode('utf-8')),
+                          target=vector_store_id, vector_store_file_id=file_id)
+            # A re-processed workbook supersedes the project's previous markdown
+            register_file(vector_store_id, file_id, "project_data", project_key=project,
+                          revision_key=f"project_data:{project}" if project else None, filename=filename)
+            clear_checkpoints(pipeline_id)
             return True, "Successfully uploaded to vector store"
         else:
-            return False, f"Upload failed with status: {file_batch.status}"
+            return False, f"Upload failed with status: {status}"
             
     except Exception as e:
         return False, f"Error uploading to vector store: {str(e)}"
 
-def create_assistant_thread_with_excel(uploaded_file):
-    """Create a new Assistant with code interpreter and upload the Excel file to it"""
-    try:
-        # Debug: Check OpenAI API key
-        api_key = os.getenv("OPENAI_API_KEY")
-        if not api_key:
-            return None, None, None, "❌ OpenAI API key not found in environment variables"
-        
-        # Save Excel file temporarily
-        temp_path = os.path.join(tempfile.gettempdir(), uploaded_file.name)
-        with open(temp_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
-
-        # Upload Excel file to OpenAI for assistant use
-        with open(temp_path, "rb") as f:
-            file_obj = client.files.create(
-                file=f,
+def upload_excel_file(filename, excel_bytes, project=None, owner="project"):
+    """Upload the Excel file for code interpreter, reusing an identical earlier upload; returns the file id"""
+    excel_digest = content_hash(excel_bytes)
+    existing = find_upload(excel_digest)
+    if existing:
+        try:
+            file_id = with_retries(client.files.retrieve, existing['file_id']).id
+            register_resource(file_id, "file", owner, project)
+            return file_id
+        except NotFoundError:
+            # Deleted since it was recorded (compaction, reaper or by hand) - upload it again
+            forget_file(existing['file_id'])
+    
+    # Upload Excel file to OpenAI for assistant use straight from memory
+    def upload_excel():
+        with upload_body(filename, excel_bytes) as body:
+            return client.files.create(
+                file=body,
                 purpose='assistants'
             )
+    file_obj = with_retries(upload_excel)
+    record_upload(excel_digest, file_obj.id, filename, len(excel_bytes))
+    register_resource(file_obj.id, "file", owner, project)
+    return file_obj.id
 
-        # Clean up temp file
-        os.remove(temp_path)
-        
-        # Create a new Assistant with code_interpreter and Excel file
-        project_info = st.session_state.project_info
-        assistant_name = f"DDMac Bot - {project_info.get('project_name', 'Project')} Analyzer"
-        assistant_description = f"""DDMac Bot expert for electrical estimation analysis.
+def create_project_thread(file_id, vector_store_id, project=None):
+    """Create the project thread with the Excel file attached and file_search scoped to the project's store"""
+    thread = with_retries(
+        client.beta.threads.create,
+        tool_resources={
+            "code_interpreter": {
+                "file_ids": [file_id]
+            },
+            **file_search_resources(vector_store_id)
+        }
+    )
+    register_resource(thread.id, "thread", "project", project)
+    return thread.id
 
-Project: {project_info.get('project_name', 'Unknown')} | Company: {project_info.get('company_name', 'Unknown')} | Type: {project_info.get('project_type', 'Unknown')}
+def prewarm_project_resources(filename, excel_bytes):
+    """Background job: upload the workbook and create its thread while the user is still filling in the forms
+    
+    Neither step depends on the form answers; the project's file_search store is attached
+    when the thread is adopted. Unclaimed results are owned by "prewarm" and reaped when idle.
+    """
+    report_progress(f"Uploading {filename}...")
+    file_id = upload_excel_file(filename, excel_bytes, owner="prewarm")
+    report_progress("Creating thread...")
+    thread = with_retries(
+        client.beta.threads.create,
+        tool_resources={"code_interpreter": {"file_ids": [file_id]}}
+    )
+    register_resource(thread.id, "thread", "prewarm")
+    get_pooled_assistant(client, "analyzer")
+    return {"file_id": file_id, "thread_id": thread.id}
 
-Analyzes Excel data for costs, materials, labor, timelines. Uses code interpreter for calculations and data analysis."""
-        
-        assistant = client.beta.assistants.create(
-            name=assistant_name,
-            description=assistant_description,
-            model="gpt-4o",
-            tools=[{"type": "code_interpreter"}],
-            tool_resources={
-                "code_interpreter": {
-                    "file_ids": [file_obj.id]
-                }
-            }
+def start_prewarm(uploaded_file):
+    """Start prewarming for a newly uploaded file once per content hash; returns the job id"""
+    excel_bytes = uploaded_file.getvalue()
+    digest = content_hash(excel_bytes)
+    if digest not in st.session_state.prewarm_jobs:
+        st.session_state.prewarm_jobs[digest] = submit_job(
+            "prewarm", prewarm_project_resources, uploaded_file.name, excel_bytes,
+            label=f"Prewarm {uploaded_file.name}", session=st.session_state.job_session
         )
-        
-        # Create a thread for this assistant
-        thread = client.beta.threads.create()
-        
-        return thread.id, file_obj.id, assistant.id, "Assistant and thread created successfully"
-        
-    except Exception as e:
-        return None, None, None, f"Error creating assistant: {str(e)}"
+    return st.session_state.prewarm_jobs[digest]
+
+def await_prewarm(job_id, timeout=PREWARM_WAIT_SECONDS):
+    """Result of a prewarm job, waiting for it if still running; None if there is none, it failed or was reaped"""
+    deadline = time.time() + timeout
+    while job_id:
+        job = get_job(job_id)
+        if job is None:
+            return None
+        if is_finished(job):
+            if job['status'] != 'completed':
+                return None
+            prewarm = job['result']
+            # Unclaimed prewarm resources are reaped after an idle hour; if either is gone the
+            # stages upload and create fresh ones, otherwise they are touched so they stay until adopted
+            if not (resource_live(prewarm['file_id']) and resource_live(prewarm['thread_id'])):
+                return None
+            touch_resource(prewarm['file_id'])
+            touch_resource(prewarm['thread_id'])
+            return prewarm
+        if time.time() > deadline:
+            return None
+        time.sleep(0.2)
+    return None
+
+def adopt_prewarmed_thread(thread_id, file_id, vector_store_id, project=None):
+    """Attach the project's vector store to a prewarmed thread and hand it over to the project"""
+    with_retries(
+        client.beta.threads.update,
+        thread_id,
+        tool_resources={
+            "code_interpreter": {
+                "file_ids": [file_id]
+            },
+            **file_search_resources(vector_store_id)
+        }
+    )
+    claim_resource(thread_id, "project", project)
+    return thread_id
+
+def project_file_stage(prewarm, excel_filename, excel_bytes, project):
+    """Prewarmed Excel file id if available, otherwise upload now"""
+    if prewarm:
+        claim_resource(prewarm['file_id'], "project", project)
+        return prewarm['file_id']
+    return upload_excel_file(excel_filename, excel_bytes, project)
+
+def project_thread_stage(prewarm, file_id, vector_store_id, project):
+    """Adopt the prewarmed thread if it carries this file, otherwise create the thread now"""
+    if prewarm and prewarm['file_id'] == file_id:
+        return adopt_prewarmed_thread(prewarm['thread_id'], file_id, vector_store_id, project)
+    return create_project_thread(file_id, vector_store_id, project)
+
+def start_fresh_project_thread():
+    """Replace the project thread with one seeded by a cached summary of the conversation so far"""
+    project = project_key(st.session_state.project_info)
+    vector_store_id = get_project_vector_store(client, st.session_state.project_info, create=False)
+    thread_id = start_fresh_thread(
+        client,
+        st.session_state.thread_id,
+        tool_resources={
+            "code_interpreter": {
+                "file_ids": [st.session_state.file_id]
+            },
+            **file_search_resources(vector_store_id)
+        }
+    )
+    register_resource(thread_id, "thread", "project", project)
+    return thread_id
+
+def processing_stages(excel_filename, excel_bytes, sheet_data, sheet_info, project_info, prewarm_job_id=None):
+    """Processing flow as orchestrator stages; independent network calls and markdown generation overlap"""
+    project = project_key(project_info)
+    return [
+        {"name": "prewarm", "label": "♨️ Collect prewarmed upload",
+         "fn": lambda: await_prewarm(prewarm_job_id)},
+        {"name": "file_id", "label": "📤 Upload Excel file", "after": ["prewarm"],
+         "fn": lambda prewarm: project_file_stage(prewarm, excel_filename, excel_bytes, project)},
+        {"name": "assistant_id", "label": "🤖 Get analyzer assistant",
+         "fn": lambda: get_pooled_assistant(client, "analyzer")},
+        {"name": "vector_store_id", "label": "🗄️ Route project vector store",
+         "fn": lambda: get_project_vector_store(client, project_info)},
+        {"name": "thread_id", "label": "🧵 Create project thread", "after": ["prewarm", "file_id", "vector_store_id"],
+         "fn": lambda prewarm, file_id, vector_store_id: project_thread_stage(prewarm, file_id, vector_store_id, project)},
+        {"name": "markdown_content", "label": "📝 Generate markdown document",
+         "fn": lambda: generate_markdown_from_excel(sheet_data, sheet_info, project_info)},
+    ]
+
+def persist_project():
+    """Save the current project's session fields to the local project store"""
+    save_project(
+        project_key(st.session_state.project_info),
+        {key: st.session_state[key] for key in PERSISTED_KEYS if key in st.session_state}
+    )
+
+def resume_project(key):
+    """Restore a saved project into session state from the local store (no API calls); returns success"""
+    snapshot = load_project(key)
+    if not snapshot:
+        return False
+    resources = [snapshot.get(field) for field in ('thread_id', 'file_id') if snapshot.get(field)]
+    if not all(resource_live(resource_id) for resource_id in resources):
+        # The reaper already deleted this project's thread or workbook; the snapshot can't be resumed
+        delete_project(key)
+        return False
+    for field, value in snapshot.items():
+        st.session_state[field] = value
+    st.session_state.uploaded_file = None
+    st.session_state.processing_status = 'complete'
+    st.session_state.proceed_with_processing = False
+    st.session_state.vector_upload_job_id = None
+    st.session_state.vector_upload_args = None
+    st.session_state.floating_chat_open = False
+    touch_project(key)
+    # Take back everything a Reset released, so the reaper doesn't delete it under the resumed project
+    for resource_id in resources:
+        claim_resource(resource_id, "project", key)
+    return True
+
+def sync_vector_upload_job():
+    """Copy the background vector store job outcome into session state and return the job snapshot"""
+    job_id = st.session_state.get('vector_upload_job_id')
+    if not job_id:
+        return None
+    job = get_job(job_id)
+    if is_finished(job):
+        upload_success, upload_msg = job['result'] if job['status'] == 'completed' else (False, job['error'])
+        st.session_state.vector_upload_success = upload_success
+        st.session_state.vector_upload_message = upload_msg
+        for result in st.session_state.conversion_results:
+            if result['type'] == "RAG Vector Store Entry":
+                result['status'] = "Success" if upload_success else "Failed"
+        if st.session_state.get('vector_upload_persisted') != job_id:
+            st.session_state.vector_upload_persisted = job_id
+            persist_project()
+    return job
+
+def submit_vector_upload_job(markdown_content, filename, digest, project_info):
+    """Start (or resume) the vector store upload as a background job"""
+    st.session_state.vector_upload_args = (markdown_content, filename, digest, project_info)
+    return submit_job(
+        "vector_upload",
+        upload_to_vector_store,
+        markdown_content,
+        filename,
+        digest,
+        project_info,
+        label=f"Vector store: {project_info.get('project_name', 'Project')}",
+        session=st.session_state.job_session
+    )
+
+def vector_upload_pending():
+    """True while the background vector store job is still queued or running"""
+    job_id = st.session_state.get('vector_upload_job_id')
+    return bool(job_id) and get_job(job_id) is not None and not is_finished(get_job(job_id))
+
+@st.fragment(run_every=2)
+def render_vector_upload_status():
+    """Live status of the background vector store upload (refreshes itself until the job finishes)"""
+    was_pending = st.session_state.get('vector_upload_status_shown') == 'pending'
+    job = sync_vector_upload_job()
+    if job is None:
+        status_color = "🟢" if st.session_state.vector_upload_success else "🔴"
+        st.write(f"Status: {status_color} {'Success' if st.session_state.vector_upload_success else 'Unknown'}")
+        return
+    if not is_finished(job):
+        st.session_state.vector_upload_status_shown = 'pending'
+        st.write(f"Status: 🟡 {job['status'].capitalize()} ({job_duration(job):.0f}s)")
+        st.caption(job['message'])
+        return
+    st.session_state.vector_upload_status_shown = 'finished'
+    if job['status'] == 'completed' and st.session_state.vector_upload_success:
+        st.write("Status: 🟢 Success")
+    else:
+        st.write("Status: 🔴 Failed")
+        st.caption(st.session_state.get('vector_upload_message', ''))
+        if st.session_state.get('vector_upload_args') and st.button("🔁 Retry upload", key="retry_vector_upload"):
+            # Resumes from the pipeline's checkpoints - no reprocessing, no new assistant
+            st.session_state.vector_upload_job_id = submit_vector_upload_job(*st.session_state.vector_upload_args)
+            st.rerun()
+    if was_pending:
+        # Refresh the rest of the page (sidebar, statistics) once the job lands
+        st.rerun()
 
 # Custom CSS for better styling
 st.markdown("""
@@ -418,6 +657,20 @@ if 'floating_chat_messages' not in st.session_state:
     st.session_state.floating_chat_messages = []
 if 'assistant_id' not in st.session_state:
     st.session_state.assistant_id = None
+if 'vector_upload_job_id' not in st.session_state:
+    st.session_state.vector_upload_job_id = None
+if 'prewarm_jobs' not in st.session_state:
+    st.session_state.prewarm_jobs = {}
+if 'job_session' not in st.session_state:
+    st.session_state.job_session = uuid.uuid4().hex
+
+# Pick up the outcome of any background vector store upload finished since the last rerun
+sync_vector_upload_job()
+
+# Expire superseded and abandoned files, and reap idle or released threads/files,
+# in the background (each at most every few hours)
+schedule_compaction(client)
+schedule_reaper(client)
 
 # Header
 st.markdown("""
@@ -448,6 +701,9 @@ with col1:
     
     if uploaded_file is not None:
         st.session_state.uploaded_file = uploaded_file
+        # Upload the workbook and create its thread now; processing picks the results up later
+        if os.getenv("OPENAI_API_KEY"):
+            start_prewarm(uploaded_file)
         
         # File details
         st.success(f"✅ File uploaded: {uploaded_file.name}")
@@ -529,8 +785,8 @@ with col1:
                     st.session_state.processing_status = 'processing'
                     st.rerun()
     
-    # REAL PROCESSING IMPLEMENTATION
-    if st.session_state.uploaded_file and hasattr(st.session_state, 'project_info'):
+    # REAL PROCESSING IMPLEMENTATION (a resumed project is complete without an uploaded file)
+    if (st.session_state.uploaded_file or st.session_state.processing_status == 'complete') and st.session_state.project_info:
         if st.session_state.processing_status == 'processing':
             st.markdown('<div class="status-indicator status-processing">🤖 AI Processing Pipeline Active...</div>', unsafe_allow_html=True)
             
@@ -553,22 +809,13 @@ with col1:
                     status_text = st.empty()
                     
                     try:
-                        # Step 3: Create Assistant with code_interpreter and Excel file
-                        progress_bar.progress(20)
-                        status_text.text('🤖 Creating dedicated AI assistant with code interpreter for your Excel data...')
-                        thread_id, file_id, assistant_id, assistant_msg = create_assistant_thread_with_excel(st.session_state.uploaded_file)
-                        
-                        if not thread_id:
-                            st.error(f"❌ Assistant Creation Failed: {assistant_msg}")
-                            st.error("🔍 Check your OpenAI API key and permissions")
+                        # Debug: Check OpenAI API key
+                        if not os.getenv("OPENAI_API_KEY"):
+                            st.error("❌ Assistant Setup Failed: OpenAI API key not found in environment variables")
                             st.session_state.processing_status = 'error'
                             st.session_state.proceed_with_processing = False
                             st.stop()
                         
-                        # Step 4: Generate markdown document using session state data
-                        progress_bar.progress(50)
-                        status_text.text('📝 Creating comprehensive markdown document...')
-                        
                         # Use sheet info from session state for processing
                         session_sheet_info = {
                             sheet_name: {
@@ -578,21 +825,60 @@ with col1:
                             for sheet_name in st.session_state.sheet_names
                         }
                         
-                        markdown_content = generate_markdown_from_excel(
-                            sheet_data, session_sheet_info, st.session_state.project_info
-                        )
+                        # Steps 3-4: Upload, assistant lookup, store routing, thread creation and markdown
+                        # generation run concurrently; only the thread waits for the upload and store
+                        status_text.text('🤖 Running processing stages concurrently...')
+                        stage_status = st.empty()
+                        
+                        def show_stage_progress(statuses):
+                            finished = sum(status['status'] == 'completed' for status in statuses.values())
+                            progress_bar.progress(int(80 * finished / len(statuses)))
+                            stage_status.markdown(format_stage_statuses(statuses))
+                        
+                        try:
+                            stage_results = run_stages(
+                                processing_stages(
+                                    st.session_state.uploaded_file.name,
+                                    st.session_state.uploaded_file.getvalue(),
+                                    sheet_data,
+                                    session_sheet_info,
+                                    st.session_state.project_info,
+                                    prewarm_job_id=st.session_state.prewarm_jobs.get(
+                                        content_hash(st.session_state.uploaded_file.getvalue())
+                                    )
+                                ),
+                                on_update=show_stage_progress
+                            )
+                        except StageFailed as stage_error:
+                            st.error(f"❌ Processing stage failed: {stage_error}")
+                            st.error("🔍 Check your OpenAI API key and permissions")
+                            st.session_state.processing_status = 'error'
+                            st.session_state.proceed_with_processing = False
+                            st.stop()
+                        
+                        # The prewarmed thread now belongs to this project; never hand it out again
+                        st.session_state.prewarm_jobs.pop(content_hash(st.session_state.uploaded_file.getvalue()), None)
+                        
+                        thread_id = stage_results['thread_id']
+                        file_id = stage_results['file_id']
+                        assistant_id = stage_results['assistant_id']
+                        markdown_content = stage_results['markdown_content']
                         
-                        # Step 5: Upload to vector store
+                        # Step 5: Hand vector store ingestion to a background job so chat is usable right away
                         progress_bar.progress(80)
-                        status_text.text('🗄️ Uploading to vector store for future reference...')
-                        upload_success, upload_msg = upload_to_vector_store(
-                            markdown_content, 
-                            f"{st.session_state.project_info['company_name']}_{st.session_state.project_info['project_name']}_enhanced.md"
+                        status_text.text('🗄️ Queuing vector store upload in the background...')
+                        # Hash the inputs rather than the markdown, which embeds a generation timestamp
+                        markdown_digest = content_hash(
+                            st.session_state.uploaded_file.getvalue(),
+                            json.dumps(session_sheet_info, sort_keys=True),
+                            json.dumps(st.session_state.project_info, sort_keys=True)
+                        )
+                        vector_upload_job_id = submit_vector_upload_job(
+                            markdown_content,
+                            f"{st.session_state.project_info['company_name']}_{st.session_state.project_info['project_name']}_enhanced.md",
+                            markdown_digest,
+                            st.session_state.project_info
                         )
-                        
-                        if not upload_success:
-                            st.warning(f"⚠️ Vector Store Upload Failed: {upload_msg}")
-                            st.warning("🔍 Check your Vector Store ID and API permissions")
                         
                         # Step 6: Complete processing - ONLY clear flag on success
                         progress_bar.progress(100)
@@ -604,7 +890,8 @@ with col1:
                         st.session_state.file_id = file_id
                         st.session_state.assistant_id = assistant_id
                         st.session_state.markdown_content = markdown_content
-                        st.session_state.vector_upload_success = upload_success
+                        st.session_state.vector_upload_success = False
+                        st.session_state.vector_upload_job_id = vector_upload_job_id
                         
                         # Create results for display
                         project_info = st.session_state.project_info
@@ -620,19 +907,24 @@ with col1:
                                 "filename": f"Vector embedding for {project_info['project_name']}",
                                 "icon": "🧠",
                                 "description": "Added to knowledge base for chat queries",
-                                "status": "Success" if upload_success else "Failed"
+                                "status": "Pending"
                             },
                             {
                                 "type": "Assistant Thread", 
                                 "filename": f"Assistant ID: {assistant_id}",
                                 "icon": "🤖",
-                                "description": "Dedicated AI assistant with Excel file and code interpreter"
+                                "description": "Shared analyzer assistant with your Excel file attached to the project thread"
                             }
                         ]
                         
                         # Clear the flag only on successful completion
                         st.session_state.proceed_with_processing = False
                         st.session_state.processing_status = 'complete'
+                        # A (re-)processed workbook invalidates the project's cached answers; its parsed
+                        # sheets are cached once here for local numeric and SQL answers
+                        bump_data_version(project_key(st.session_state.project_info))
+                        save_sheets(project_key(st.session_state.project_info), sheet_data)
+                        persist_project()
                         st.rerun()
                         
                     except Exception as e:
@@ -730,8 +1022,7 @@ with col1:
                         #     st.info("Navigate to Chat page to query the vector store about this project!")
                         st.info("💬 Use floating chat for vector store queries")
                     with col_b:
-                        status_color = "🟢" if result.get('status') == 'Success' else "🔴"
-                        st.write(f"Status: {status_color} {result.get('status', 'Unknown')}")
+                        render_vector_upload_status()
                 
                 elif result['type'] == "Assistant Thread":
                     col_a, col_b = st.columns(2)
@@ -786,6 +1077,8 @@ with col2:
         st.metric("Processing Time", "Real-time" if st.session_state.processing_status == 'complete' else "Pending")
         if st.session_state.vector_upload_success:
             st.metric("Vector Store", "✅ Uploaded")
+        elif vector_upload_pending():
+            st.metric("Vector Store", "⏳ Uploading")
         elif st.session_state.processing_status == 'complete':
             st.metric("Vector Store", "❌ Failed")
     else:
@@ -807,7 +1100,13 @@ if st.session_state.conversion_results and st.session_state.thread_id and st.ses
         st.write(f"**Project:** {project_name}")
         st.info("💡 This assistant can run Python code on your Excel data for detailed analysis!")
         
-        # Display chat messages
+        # Display chat messages; artifacts come from the local cache (misses fetched concurrently)
+        artifact_ids = []
+        for message in st.session_state.floating_chat_messages:
+            artifact_ids += message.get('images') or []
+            artifact_ids += [file_info['file_id'] for file_info in message.get('files') or []]
+        artifacts = fetch_artifacts(client, artifact_ids) if artifact_ids else {}
+        
         chat_container = st.container()
         with chat_container:
             for message in st.session_state.floating_chat_messages:
@@ -815,44 +1114,37 @@ if st.session_state.conversion_results and st.session_state.thread_id and st.ses
                     st.markdown(f"**You:** {message['content']}")
                 else:
                     st.markdown(f"**Assistant:** {message['content']}")
+                    if message.get('cached'):
+                        st.caption("⚡ Cached answer - the project data hasn't changed since this was asked")
+                    if message.get('routed'):
+                        st.caption("🧮 Computed locally from the workbook sheets")
                     
                     # Display any images generated by Code Interpreter
                     if message.get('images'):
                         for image_file_id in message['images']:
-                            try:
-                                # Download and display the image
-                                image_data = client.files.content(image_file_id)
-                                image_bytes = image_data.read()
-                                st.image(image_bytes, caption=f"Generated by Code Interpreter", use_column_width=True)
-                            except Exception as img_error:
-                                st.error(f"Could not display image {image_file_id}: {str(img_error)}")
+                            artifact = artifacts.get(image_file_id)
+                            if isinstance(artifact, Exception):
+                                st.error(f"Could not display image {image_file_id}: {str(artifact)}")
+                            elif artifact:
+                                st.image(artifact[0], caption=f"Generated by Code Interpreter", use_column_width=True)
                     
                     # Display download buttons for any files generated by Code Interpreter
                     if message.get('files'):
                         st.markdown("**📁 Generated Files:**")
                         for file_info in message['files']:
-                            try:
-                                file_id = file_info['file_id']
-                                
-                                # Get file info from OpenAI
-                                file_obj = client.files.retrieve(file_id)
-                                filename = file_obj.filename or f"generated_file_{file_id}"
-                                
-                                # Download file content
-                                file_data = client.files.content(file_id)
-                                file_bytes = file_data.read()
-                                
-                                # Create download button
+                            file_id = file_info['file_id']
+                            artifact = artifacts.get(file_id)
+                            if isinstance(artifact, Exception):
+                                st.error(f"Could not prepare download for file {file_id}: {str(artifact)}")
+                            elif artifact:
+                                file_bytes, filename = artifact
                                 st.download_button(
-                                    label=f"📥 Download {filename}",
+                                    label=f"📥 Download {filename or f'generated_file_{file_id}'}",
                                     data=file_bytes,
-                                    file_name=filename,
+                                    file_name=filename or f"generated_file_{file_id}",
                                     mime="application/octet-stream",
                                     key=f"download_file_{file_id}_{len(st.session_state.floating_chat_messages)}"
                                 )
-                                
-                            except Exception as file_error:
-                                st.error(f"Could not prepare download for file {file_info['file_id']}: {str(file_error)}")
         
         # Chat input
         user_message = st.text_input("Ask about your project...", key="floating_chat_input", placeholder="e.g., What is the total cost in this estimate?")
@@ -868,68 +1160,75 @@ if st.session_state.conversion_results and st.session_state.thread_id and st.ses
                     })
                     
                     try:
-                        # Create message in the thread
-                        client.beta.threads.messages.create(
-                            thread_id=st.session_state.thread_id,
-                            role="user",
-                            content=user_message
-                        )
+                        current_project = project_key(st.session_state.project_info)
+                        touch_project(current_project)
+                        touch_resource(st.session_state.thread_id)
                         
-                        # Run the assistant
-                        run = client.beta.threads.runs.create(
-                            thread_id=st.session_state.thread_id,
-                            assistant_id=st.session_state.assistant_id
-                        )
+                        # Simple totals, averages and largest-line lookups are computed from the sheets directly
+                        routed = route_question(user_message, load_sheets(current_project), st.session_state.sheet_info)
+                        if routed:
+                            # Posted to the thread too, so follow-ups and knowledge extraction see the exchange
+                            post_exchange(client, st.session_state.thread_id, user_message, routed['content'])
+                            st.session_state.floating_chat_messages.append({
+                                'role': 'assistant',
+                                'content': routed['content'],
+                                'routed': True
+                            })
+                            persist_project()
+                            st.rerun()
+                        
+                        # Repeated questions against the same workbook are answered from the cache; without a
+                        # project there is no workbook to key on, so nothing is cached across sessions
+                        cache_scope = f"home:{current_project}" if current_project else None
+                        cache_version = data_version(current_project)
+                        cached = cache_scope and lookup_answer(cache_scope, cache_version, user_message)
+                        if cached:
+                            # Posted to the thread too, so follow-ups and knowledge extraction see the exchange
+                            post_exchange(client, st.session_state.thread_id, user_message, cached['content'])
+                            st.session_state.floating_chat_messages.append({**cached, 'cached': True})
+                            persist_project()
+                            st.rerun()
                         
-                        # Wait for completion (simple polling)
+                        # Stream the run so text and code interpreter output render as they arrive
+                        queue_placeholder = st.empty()
+                        response_placeholder = st.empty()
+                        code_placeholder = st.empty()
+                        
+                        def render_stream(handler):
+                            response_placeholder.markdown(f"**Assistant:** {handler.text}▌")
+                            if handler.code:
+                                code_placeholder.code(handler.code + (f"\n# Output:\n{handler.code_output}" if handler.code_output else ""), language="python")
+                        
+                        handler = RunStreamHandler(on_update=render_stream, metric_prefix="home_chat")
                         with st.spinner("Assistant is thinking..."):
-                            while run.status in ['queued', 'in_progress']:
-                                time.sleep(1)
-                                run = client.beta.threads.runs.retrieve(thread_id=st.session_state.thread_id, run_id=run.id)
+                            # One run at a time per thread: wait for our turn, then post and run
+                            with run_slot(client, st.session_state.thread_id,
+                                          on_wait=lambda position: queue_placeholder.info(f"⏳ Queued behind {position} other run(s) on this thread...")):
+                                queue_placeholder.empty()
+                                client.beta.threads.messages.create(
+                                    thread_id=st.session_state.thread_id,
+                                    role="user",
+                                    content=user_message
+                                )
+                                run = stream_run(
+                                    client,
+                                    handler,
+                                    operation="chat",
+                                    thread_id=st.session_state.thread_id,
+                                    assistant_id=st.session_state.assistant_id,
+                                    additional_instructions=project_instructions(st.session_state.project_info),
+                                    **run_options("home_chat")
+                                )
                         
-                        if run.status == 'completed': 
-                            # Get the assistant's response
-                            messages = client.beta.threads.messages.list(thread_id=st.session_state.thread_id)
-                            
-                            # Process the message content - handle text, images, and files
-                            assistant_content = ""
-                            images = []
-                            files = []
-                            
-                            for content_block in messages.data[0].content:
-                                if hasattr(content_block, 'text'):
-                                    # Text content - also check for file annotations
-                                    text_value = content_block.text.value
-                                    assistant_content += text_value + "\n"
-                                    
-                                    # Check for file annotations in text content
-                                    if hasattr(content_block.text, 'annotations'):
-                                        for annotation in content_block.text.annotations:
-                                            if hasattr(annotation, 'file_path'):
-                                                file_id = annotation.file_path.file_id
-                                                files.append({
-                                                    'file_id': file_id,
-                                                    'filename': f"generated_file_{file_id}.csv"  # Default name, will be updated
-                                                })
-                                                
-                                elif hasattr(content_block, 'image_file'):
-                                    # Image content from Code Interpreter
-                                    file_id = content_block.image_file.file_id
-                                    images.append(file_id)
-                                    assistant_content += f"[Generated Image: file-{file_id}]\n"
-                            
-                            # Store the message with text, images, and files info
-                            message_data = {
-                                'role': 'assistant', 
-                                'content': assistant_content.strip(),
-                                'images': images if images else None,
-                                'files': files if files else None
-                            }
-                            
-                            st.session_state.floating_chat_messages.append(message_data)
+                        # "incomplete" means the completion token cap was hit - still show what we got
+                        if run is not None and run.status in ('completed', 'incomplete'):
+                            st.session_state.floating_chat_messages.append(handler.message_data())
+                            if cache_scope:
+                                store_answer(cache_scope, cache_version, user_message, handler.message_data())
+                            persist_project()
                             st.rerun()
                         else:
-                            st.error(f"Assistant run failed with status: {run.status}")
+                            st.error(f"Assistant run failed with status: {run.status if run else 'unknown'}")
                             
                     except Exception as e:
                         st.error(f"Chat error: {str(e)}")
@@ -942,6 +1241,14 @@ if st.session_state.conversion_results and st.session_state.thread_id and st.ses
             if st.button("Close Chat", key="close_chat"):
                 st.session_state.floating_chat_open = False
                 st.rerun()
+            if st.button("🧹 Fresh context", key="fresh_chat_context", help="Continue on a new thread seeded with a summary of this one - keeps runs fast and cheap on long conversations"):
+                try:
+                    with st.spinner("Summarizing the conversation..."):
+                        st.session_state.thread_id = start_fresh_project_thread()
+                    persist_project()
+                    st.rerun()
+                except Exception as e:
+                    st.error(f"Could not start a fresh context: {str(e)}")
 
 elif st.session_state.conversion_results:
     project_name = st.session_state.project_info.get('project_name', 'this project') if st.session_state.project_info else 'this project'
@@ -957,6 +1264,8 @@ with st.sidebar:
     st.header("🛠️ Controls")
     
     if st.button("🔄 Reset & Start New Project", use_container_width=True):
+        # The old project's thread and files are cleaned up by the reaper after a grace period
+        release_project(project_key(st.session_state.project_info))
         st.session_state.uploaded_file = None
         st.session_state.processing_status = 'ready'
         st.session_state.conversion_results = []
@@ -966,6 +1275,9 @@ with st.sidebar:
         st.session_state.assistant_id = None
         st.session_state.markdown_content = None
         st.session_state.vector_upload_success = False
+        st.session_state.vector_upload_job_id = None
+        st.session_state.vector_upload_args = None
+        st.session_state.prewarm_jobs = {}
         st.session_state.sheet_info = {}
         st.session_state.sheet_names = []
         st.session_state.proceed_with_processing = False
@@ -973,6 +1285,22 @@ with st.sidebar:
         st.session_state.floating_chat_messages = []
         st.rerun()
     
+    # Resume a previously processed project from the local store
+    saved_projects = list_projects()
+    if saved_projects:
+        st.markdown("---")
+        st.markdown("### 📂 Resume Project")
+        labels = {
+            project['project_key']: f"{project['title']} ({datetime.fromtimestamp(project['updated_at']).strftime('%Y-%m-%d %H:%M')})"
+            for project in saved_projects
+        }
+        selected_key = st.selectbox("Saved projects", list(labels), format_func=labels.get, key="resume_project_key")
+        if st.button("📂 Resume", use_container_width=True):
+            if resume_project(selected_key):
+                st.rerun()
+            else:
+                st.error("Saved project could not be loaded (it may have been cleaned up) - please process it again")
+    
     # Assistant Thread Info
     if st.session_state.thread_id and st.session_state.assistant_id:
         st.markdown("---")
@@ -982,10 +1310,27 @@ with st.sidebar:
         st.write(f"📁 File attached: {st.session_state.project_info.get('file_name', 'Excel file')}")
         st.write("🔧 **Tools:** Code Interpreter (can run Python on your Excel data)")
         if st.session_state.vector_upload_success:
-            st.success("✅ Also available in main vector store")
+            st.success("✅ Also available in the project's vector store")
+        elif vector_upload_pending():
+            st.info("⏳ Vector store upload running in the background - chat is already available")
         else:
             st.warning("⚠️ Vector store upload failed")
     
+    # Background job table - only this session's jobs; the process-wide table is for debugging
+    background_jobs = list_jobs(session=st.session_state.job_session)
+    if background_jobs:
+        st.markdown("---")
+        st.markdown("### ⚙️ Background Jobs")
+        for job in background_jobs[:5]:
+            status_icon = {"queued": "⏳", "running": "🔄", "completed": "✅", "failed": "❌"}.get(job['status'], "❔")
+            st.write(f"{status_icon} **{job['label']}** - {job['status']} ({job_duration(job):.0f}s)")
+            if job['status'] == 'failed':
+                st.caption(job['error'])
+    if SHOW_ALL_JOBS:
+        with st.expander("🛠️ All server jobs (debug)"):
+            for job in list_jobs():
+                st.caption(f"{job['kind']} · {job['label']} - {job['status']} ({job_duration(job):.0f}s) · session {job['session'] or 'system'}")
+    
     # st.markdown("---")
     # st.markdown("### 📈 Usage Stats")
     # st.metric("Files Processed Today", "12")
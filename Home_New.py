@@ -2,14 +2,20 @@ import streamlit as st
 import time
 import os
 from datetime import datetime
-from openai import OpenAI
+from openai import OpenAI, NotFoundError
 import pandas as pd
-import tempfile
+from Utils.upload_bodies import upload_body
+from Utils.upload_ledger import content_hash, find_upload, record_upload, forget_file
+from Utils.projects import project_key
+from Utils.resource_registry import register_resource
+from Utils.vector_lifecycle import register_file, touch_file
+from Utils.vector_routing import (route_vector_store, get_project_vector_store, file_attributes, file_search_resources,
+                                  add_file_to_store)
 
 # Initialize OpenAI client
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
-# Vector Store ID for main RAG system (replace with your actual vector store ID)
+# Shared Vector Store ID for tenant-wide knowledge; project data is routed to per-project stores
 VECTOR_STORE_ID = 'vs_qUspcB7VllWXM4z7aAEdIK9L'
 
 # Set page configuration
@@ -175,51 +181,82 @@ def generate_markdown_from_excel(sheet_data, sheet_info, project_info):
     
     return markdown_content
 
-def upload_to_vector_store(markdown_content, filename):
-    """Upload markdown content to vector store"""
+def upload_to_vector_store(markdown_content, filename, project_info=None):
+    """Upload markdown content to the project's vector store (skipped if identical content is already there)"""
     try:
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.md', delete=False) as temp_file:
-            temp_file.write(markdown_content)
-            temp_file_path = temp_file.name
-
-        with open(temp_file_path, "rb") as f:
-            file_batch = client.vector_stores.file_batches.upload_and_poll(
-                vector_store_id=VECTOR_STORE_ID,
-                files=[f]
+        vector_store_id = route_vector_store(client, project_info, VECTOR_STORE_ID)
+        project = project_key(project_info)
+        
+        digest = content_hash(markdown_content)
+        existing = find_upload(digest, vector_store_id)
+        if existing:
+            touch_file(existing['file_id'])
+            return True, f"Already in vector store (file {existing['file_id']})"
+        
+        with upload_body(filename, markdown_content) as body:
+            file_obj = client.files.create(
+                file=body,
+                purpose='assistants'
             )
-
-        os.remove(temp_file_path)
         
-        if file_batch.status == "completed":
+        vector_store_file = add_file_to_store(
+            client, vector_store_id, file_obj.id, file_attributes(project_info, "project_data")
+        )
+        
+        if vector_store_file.status == "completed":
+            record_upload(digest, file_obj.id, filename, len(markdown_content.encode('utf-8')),
+                          target=vector_store_id, vector_store_file_id=file_obj.id)
+            # A re-processed workbook supersedes the project's previous markdown
+            register_file(vector_store_id, file_obj.id, "project_data", project_key=project,
+                          revision_key=f"project_data:{project}" if project else None, filename=filename)
             return True, "Successfully uploaded to vector store"
         else:
-            return False, f"Upload failed with status: {file_batch.status}"
+            return False, f"Upload failed with status: {vector_store_file.status}"
             
     except Exception as e:
         return False, f"Error uploading to vector store: {str(e)}"
 
-def create_assistant_thread_with_excel(uploaded_file):
-    """Create a new Assistant thread and upload the Excel file to it"""
+def upload_excel_file(uploaded_file, project=None):
+    """Upload the Excel file for code interpreter, reusing an identical earlier upload; returns the file id"""
+    excel_bytes = uploaded_file.getvalue()
+    excel_digest = content_hash(excel_bytes)
+    existing = find_upload(excel_digest)
+    if existing:
+        try:
+            file_id = client.files.retrieve(existing['file_id']).id
+            register_resource(file_id, "file", "project", project)
+            return file_id
+        except NotFoundError:
+            # Deleted since it was recorded (compaction, reaper or by hand) - upload it again
+            forget_file(existing['file_id'])
+    
+    # Upload Excel file to OpenAI for assistant use straight from memory
+    with upload_body(uploaded_file.name, excel_bytes) as body:
+        file_obj = client.files.create(
+            file=body,
+            purpose='assistants'
+        )
+    record_upload(excel_digest, file_obj.id, uploaded_file.name, len(excel_bytes))
+    register_resource(file_obj.id, "file", "project", project)
+    return file_obj.id
+
+def create_assistant_thread_with_excel(uploaded_file, project_info=None):
+    """Create the project thread with the Excel file attached and file_search scoped to the project's store"""
     try:
-        # Create a new thread
-        thread = client.beta.threads.create()
+        project = project_key(project_info)
+        file_id = upload_excel_file(uploaded_file, project)
         
-        # Save Excel file temporarily
-        temp_path = os.path.join(tempfile.gettempdir(), uploaded_file.name)
-        with open(temp_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
-
-        # Upload Excel file to OpenAI for assistant use
-        with open(temp_path, "rb") as f:
-            file_obj = client.files.create(
-                file=f,
-                purpose='assistants'
-            )
-
-        # Clean up temp file
-        os.remove(temp_path)
+        thread = client.beta.threads.create(
+            tool_resources={
+                "code_interpreter": {
+                    "file_ids": [file_id]
+                },
+                **file_search_resources(get_project_vector_store(client, project_info))
+            }
+        )
+        register_resource(thread.id, "thread", "project", project)
         
-        return thread.id, file_obj.id, "Thread created successfully"
+        return thread.id, file_id, "Thread created successfully"
         
     except Exception as e:
         return None, None, f"Error creating thread: {str(e)}"
@@ -467,7 +504,9 @@ with col1:
                         # Step 3: Create Assistant thread with Excel file
                         progress_bar.progress(20)
                         status_text.text('🤖 Creating AI thread for project analysis...')
-                        thread_id, file_id, thread_msg = create_assistant_thread_with_excel(st.session_state.uploaded_file)
+                        thread_id, file_id, thread_msg = create_assistant_thread_with_excel(
+                            st.session_state.uploaded_file, st.session_state.project_info
+                        )
                         
                         if not thread_id:
                             st.error(f"Failed to create thread: {thread_msg}")
@@ -486,7 +525,8 @@ with col1:
                         status_text.text('🗄️ Uploading to vector store for future reference...')
                         upload_success, upload_msg = upload_to_vector_store(
                             markdown_content, 
-                            f"{st.session_state.project_info['company_name']}_{st.session_state.project_info['project_name']}_enhanced.md"
+                            f"{st.session_state.project_info['company_name']}_{st.session_state.project_info['project_name']}_enhanced.md",
+                            st.session_state.project_info
                         )
                         
                         if not upload_success:
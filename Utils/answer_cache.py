@@ -0,0 +1,139 @@
+"""
+Answer cache for repeated questions, scoped to a project's data version.
+
+Answers are keyed on (scope, data version, normalized question). Every ingest of
+new data for a scope bumps its version, so answers computed against an older
+workbook are never served again and are purged on the bump. Lookups match the
+normalized question exactly; similar=True also accepts the most similar cached
+question by token Jaccard similarity, provided its numbers are the same.
+Entries expire after ANSWER_TTL_SECONDS and each scope keeps at most
+MAX_ENTRIES_PER_SCOPE, evicting the least recently used.
+"""
+
+import json
+import time
+
+from Utils.db import connect, ensure_schema
+from Utils.local_index import tokenize
+
+ANSWER_TTL_SECONDS = 7 * 24 * 60 * 60
+MAX_ENTRIES_PER_SCOPE = 500
+SIMILARITY_THRESHOLD = 0.85
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS answer_cache (
+    scope TEXT NOT NULL,
+    data_version TEXT NOT NULL,
+    question_key TEXT NOT NULL,
+    question TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_hit_at REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (scope, data_version, question_key)
+);
+CREATE INDEX IF NOT EXISTS idx_answer_cache_lru ON answer_cache (scope, last_hit_at);
+CREATE TABLE IF NOT EXISTS data_versions (
+    scope TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+def normalize_question(question):
+    """Order-preserving token form of a question (case, punctuation and stopwords removed)"""
+    return " ".join(tokenize(question))
+
+
+def data_version(*scopes):
+    """Combined data version of the given scopes (e.g. a project plus shared knowledge)"""
+    ensure_schema("answer_cache", SCHEMA)
+    scopes = [scope for scope in scopes if scope]
+    with connect() as conn:
+        versions = {row["scope"]: row["version"] for row in conn.execute(
+            f"SELECT scope, version FROM data_versions WHERE scope IN ({','.join('?' * len(scopes))})", scopes
+        )} if scopes else {}
+    return "|".join(f"{scope}:{versions.get(scope, 0)}" for scope in scopes)
+
+
+def bump_data_version(scope):
+    """Record that a scope's data changed; cached answers that depended on it are dropped"""
+    if not scope:
+        return
+    ensure_schema("answer_cache", SCHEMA)
+    with connect() as conn:
+        conn.execute(
+            """INSERT INTO data_versions (scope, version, updated_at) VALUES (?, 1, ?)
+               ON CONFLICT (scope) DO UPDATE SET version = version + 1, updated_at = excluded.updated_at""",
+            (scope, time.time())
+        )
+        conn.execute("DELETE FROM answer_cache WHERE '|' || data_version || '|' LIKE ?", (f"%|{scope}:%",))
+
+
+def _jaccard(a, b):
+    a, b = set(a.split()), set(b.split())
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+def _numbers(question_key):
+    return sorted(token for token in question_key.split() if any(char.isdigit() for char in token))
+
+
+def lookup_answer(scope, version, question, similar=False):
+    """Cached answer payload for a question, or None
+
+    similar=True opts into fuzzy matching; a reordered or reworded question can then get
+    another question's answer, so it is off by default.
+    """
+    question_key = normalize_question(question)
+    if not scope or not question_key:
+        return None
+    ensure_schema("answer_cache", SCHEMA)
+    now = time.time()
+    with connect() as conn:
+        conn.execute("DELETE FROM answer_cache WHERE created_at < ?", (now - ANSWER_TTL_SECONDS,))
+        row = conn.execute(
+            "SELECT question_key, answer FROM answer_cache WHERE scope = ? AND data_version = ? AND question_key = ?",
+            (scope, version, question_key)
+        ).fetchone()
+        if row is None and similar:
+            candidates = conn.execute(
+                "SELECT question_key, answer FROM answer_cache WHERE scope = ? AND data_version = ?",
+                (scope, version)
+            ).fetchall()
+            scored = [
+                (_jaccard(question_key, candidate["question_key"]), candidate) for candidate in candidates
+                if _numbers(candidate["question_key"]) == _numbers(question_key)
+            ]
+            scored = [item for item in scored if item[0] >= SIMILARITY_THRESHOLD]
+            row = max(scored, key=lambda item: item[0])[1] if scored else None
+        if row is None:
+            return None
+        conn.execute(
+            """UPDATE answer_cache SET last_hit_at = ?, hits = hits + 1
+               WHERE scope = ? AND data_version = ? AND question_key = ?""",
+            (now, scope, version, row["question_key"])
+        )
+    return json.loads(row["answer"])
+
+
+def store_answer(scope, version, question, answer):
+    """Cache a JSON-serializable answer payload, evicting least recently used entries past the limit"""
+    question_key = normalize_question(question)
+    if not scope or not question_key:
+        return
+    ensure_schema("answer_cache", SCHEMA)
+    now = time.time()
+    with connect() as conn:
+        conn.execute(
+            """INSERT OR REPLACE INTO answer_cache
+               (scope, data_version, question_key, question, answer, created_at, last_hit_at, hits)
+               VALUES (?, ?, ?, ?, ?, ?, ?, 0)""",
+            (scope, version, question_key, question, json.dumps(answer), now, now)
+        )
+        conn.execute(
+            """DELETE FROM answer_cache WHERE scope = ? AND rowid NOT IN (
+                   SELECT rowid FROM answer_cache WHERE scope = ? ORDER BY last_hit_at DESC LIMIT ?)""",
+            (scope, scope, MAX_ENTRIES_PER_SCOPE)
+        )
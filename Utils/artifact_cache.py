@@ -0,0 +1,161 @@
+"""
+Content-addressed cache for code interpreter artifacts (images, generated files).
+
+OpenAI file ids are immutable, so their bytes never need fetching twice. Blobs are
+stored on disk under their SHA-256 (identical outputs share one blob) with a SQLite
+index from file_id to hash and filename, and the most recently used blobs are also
+kept in a bounded in-memory LRU. Both tiers are bounded; the disk tier evicts least
+recently used entries. Misses are fetched concurrently.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from Utils.db import DATA_DIR, connect, ensure_schema
+
+ARTIFACT_DIR = os.path.join(DATA_DIR, "artifacts")
+MAX_MEMORY_BYTES = 64 * 1024 * 1024
+MAX_DISK_BYTES = 512 * 1024 * 1024
+FETCH_WORKERS = 4
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS artifacts (
+    file_id TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL,
+    filename TEXT,
+    size_bytes INTEGER NOT NULL,
+    fetched_at REAL NOT NULL,
+    last_used_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_artifacts_sha ON artifacts (sha256);
+CREATE INDEX IF NOT EXISTS idx_artifacts_used ON artifacts (last_used_at);
+"""
+
+_memory = OrderedDict()
+_memory_bytes = 0
+_lock = threading.Lock()
+
+
+def _blob_path(sha256):
+    return os.path.join(ARTIFACT_DIR, sha256[:2], sha256)
+
+
+def _remember(file_id, data, filename):
+    global _memory_bytes
+    with _lock:
+        if file_id in _memory:
+            _memory.move_to_end(file_id)
+            return
+        _memory[file_id] = (data, filename)
+        _memory_bytes += len(data)
+        while _memory_bytes > MAX_MEMORY_BYTES and len(_memory) > 1:
+            _, (evicted, _) = _memory.popitem(last=False)
+            _memory_bytes -= len(evicted)
+
+
+def _from_memory(file_id):
+    with _lock:
+        if file_id in _memory:
+            _memory.move_to_end(file_id)
+            return _memory[file_id]
+    return None
+
+
+def _from_disk(file_id):
+    ensure_schema("artifact_cache", SCHEMA)
+    with connect() as conn:
+        row = conn.execute("SELECT sha256, filename FROM artifacts WHERE file_id = ?", (file_id,)).fetchone()
+        if row is None:
+            return None
+        path = _blob_path(row["sha256"])
+        if not os.path.exists(path):
+            conn.execute("DELETE FROM artifacts WHERE file_id = ?", (file_id,))
+            return None
+        conn.execute("UPDATE artifacts SET last_used_at = ? WHERE file_id = ?", (time.time(), file_id))
+    with open(path, "rb") as f:
+        return f.read(), row["filename"]
+
+
+def _store(file_id, data, filename):
+    ensure_schema("artifact_cache", SCHEMA)
+    sha256 = hashlib.sha256(data).hexdigest()
+    path = _blob_path(sha256)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    now = time.time()
+    with connect() as conn:
+        conn.execute(
+            """INSERT OR REPLACE INTO artifacts (file_id, sha256, filename, size_bytes, fetched_at, last_used_at)
+               VALUES (?, ?, ?, ?, ?, ?)""",
+            (file_id, sha256, filename, len(data), now, now)
+        )
+    _evict_disk()
+
+
+def _evict_disk():
+    """Drop least recently used blobs until the disk tier fits MAX_DISK_BYTES"""
+    with connect() as conn:
+        blobs = conn.execute(
+            """SELECT sha256, MAX(size_bytes) AS size_bytes, MAX(last_used_at) AS last_used_at
+               FROM artifacts GROUP BY sha256 ORDER BY last_used_at"""
+        ).fetchall()
+        total = sum(blob["size_bytes"] for blob in blobs)
+        for blob in blobs:
+            if total <= MAX_DISK_BYTES:
+                break
+            conn.execute("DELETE FROM artifacts WHERE sha256 = ?", (blob["sha256"],))
+            try:
+                os.remove(_blob_path(blob["sha256"]))
+            except OSError:
+                pass
+            total -= blob["size_bytes"]
+
+
+def _fetch(client, file_id):
+    data = client.files.content(file_id).read()
+    try:
+        filename = client.files.retrieve(file_id).filename
+    except Exception:
+        filename = None
+    _store(file_id, data, filename)
+    return data, filename
+
+
+def get_artifact(client, file_id):
+    """(bytes, filename) for a file id from memory, disk, or OpenAI in that order"""
+    cached = _from_memory(file_id) or _from_disk(file_id)
+    if cached is None:
+        cached = _fetch(client, file_id)
+    _remember(file_id, *cached)
+    return cached
+
+
+def fetch_artifacts(client, file_ids):
+    """{file_id: (bytes, filename) or exception} for many ids, fetching cache misses concurrently"""
+    results = {}
+    missing = []
+    for file_id in dict.fromkeys(file_ids):
+        cached = _from_memory(file_id) or _from_disk(file_id)
+        if cached is None:
+            missing.append(file_id)
+        else:
+            _remember(file_id, *cached)
+            results[file_id] = cached
+    if missing:
+        with ThreadPoolExecutor(max_workers=min(FETCH_WORKERS, len(missing)), thread_name_prefix="ddmac-artifact") as executor:
+            futures = {file_id: executor.submit(_fetch, client, file_id) for file_id in missing}
+        for file_id, future in futures.items():
+            try:
+                results[file_id] = future.result()
+                _remember(file_id, *results[file_id])
+            except Exception as e:
+                results[file_id] = e
+    return results
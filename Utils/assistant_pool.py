@@ -0,0 +1,118 @@
+"""
+Pool of long-lived, pre-configured assistants, one per role.
+
+Instead of creating a gpt-4o assistant for every processed workbook, the pages ask
+the pool for a role ("analyzer", "proposal_writer") and attach per-project files at
+thread level through tool_resources. Project details go into each run's
+additional_instructions. Pooled assistants are created once, stored in SQLite, and
+updated in place when their configuration below changes.
+"""
+
+import hashlib
+import json
+import threading
+import time
+
+from openai import NotFoundError
+
+from Utils.db import connect, ensure_schema
+
+ASSISTANT_ROLES = {
+    "analyzer": {
+        "name": "DDMac Bot - Project Analyzer",
+        "description": "DDMac Bot expert for electrical estimation analysis. Analyzes AccuBid Excel data for costs, "
+                       "materials, labor, timelines.",
+        "instructions": "You are DDMac Bot, an expert in electrical estimation. The project's AccuBid Excel export is "
+                        "attached to the thread for code interpreter. Use code interpreter for calculations and data "
+                        "analysis, and file_search for the project's knowledge base. Follow the project details given "
+                        "in the run instructions.",
+        "model": "gpt-4o",
+        "tools": [{"type": "code_interpreter"}, {"type": "file_search"}],
+    },
+    "proposal_writer": {
+        "name": "DDMac Bot - Proposal Writer",
+        "description": "Generates DDMac proposal documents from AccuBid Excel data and the DOCX template.",
+        "instructions": "You are DDMac Bot's proposal writer. The thread provides an AccuBid Excel export and the "
+                        "ddmac_template.docx template for code interpreter. Follow the user's step-by-step "
+                        "instructions exactly and always save the finished DOCX for download.",
+        "model": "gpt-4o",
+        "tools": [{"type": "code_interpreter"}],
+    },
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS assistant_pool (
+    role TEXT PRIMARY KEY,
+    assistant_id TEXT NOT NULL,
+    config_hash TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+_pool_lock = threading.Lock()
+_verified = {}
+
+
+def _config_hash(config):
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def get_pooled_assistant(client, role):
+    """Assistant id for a role, creating or re-configuring the pooled assistant when needed"""
+    config = ASSISTANT_ROLES[role]
+    config_hash = _config_hash(config)
+    cached = _verified.get(role)
+    if cached and cached[1] == config_hash:
+        return cached[0]
+
+    ensure_schema("assistant_pool", SCHEMA)
+    with _pool_lock:
+        with connect() as conn:
+            row = conn.execute("SELECT * FROM assistant_pool WHERE role = ?", (role,)).fetchone()
+
+        assistant_id = None
+        if row:
+            try:
+                if row["config_hash"] != config_hash:
+                    client.beta.assistants.update(assistant_id=row["assistant_id"], **config)
+                else:
+                    client.beta.assistants.retrieve(row["assistant_id"])
+                assistant_id = row["assistant_id"]
+            except NotFoundError:
+                # Deleted remotely - fall through and create a fresh one
+                assistant_id = None
+
+        if assistant_id is None:
+            assistant_id = client.beta.assistants.create(**config).id
+
+        now = time.time()
+        with connect() as conn:
+            conn.execute(
+                """INSERT INTO assistant_pool (role, assistant_id, config_hash, created_at, updated_at)
+                   VALUES (?, ?, ?, ?, ?)
+                   ON CONFLICT (role) DO UPDATE SET assistant_id = excluded.assistant_id,
+                       config_hash = excluded.config_hash, updated_at = excluded.updated_at""",
+                (role, assistant_id, config_hash, now, now)
+            )
+        _verified[role] = (assistant_id, config_hash)
+        return assistant_id
+
+
+def pooled_assistant_ids():
+    """Ids of all pooled assistants (these are never reaped)"""
+    ensure_schema("assistant_pool", SCHEMA)
+    with connect() as conn:
+        return {row["assistant_id"] for row in conn.execute("SELECT assistant_id FROM assistant_pool")}
+
+
+def project_instructions(project_info):
+    """Per-run additional_instructions carrying the project details a dedicated assistant used to hold"""
+    project_info = project_info or {}
+    return (
+        f"Project: {project_info.get('project_name', 'Unknown')} | "
+        f"Company: {project_info.get('company_name', 'Unknown')} | "
+        f"Type: {project_info.get('project_type', 'Unknown')} | "
+        f"Location: {project_info.get('project_location') or 'Not specified'}\n"
+        f"Data file: {project_info.get('file_name', 'Excel File')} (attached to this thread for code interpreter)."
+    )
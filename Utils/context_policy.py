@@ -0,0 +1,107 @@
+"""
+Per-use-case context controls for assistant runs.
+
+Long-lived threads otherwise send their whole history as input on every run.
+CONTEXT_POLICIES bounds each use case with a truncation strategy (last N messages)
+and prompt/completion token caps, passed straight into runs.create/runs.stream via
+run_options(). When a conversation has grown too long to be worth carrying at all,
+start_fresh_thread() opens a new thread seeded with a summary of the old one; the
+summary is generated once per thread state and cached in SQLite.
+"""
+
+import time
+
+from Utils.db import connect, ensure_schema
+from Utils.message_mirror import format_transcript, mirrored_messages, sync_thread
+
+CONTEXT_POLICIES = {
+    # Floating chat on the project thread: recent turns matter, code interpreter output can be long
+    "home_chat": {
+        "truncation_strategy": {"type": "last_messages", "last_messages": 12},
+        "max_prompt_tokens": 40000,
+        "max_completion_tokens": 4000,
+    },
+    # Knowledge-base Q&A: answers come from file_search and pre-retrieved context, not history
+    "chat": {
+        "truncation_strategy": {"type": "last_messages", "last_messages": 8},
+        "max_prompt_tokens": 24000,
+        "max_completion_tokens": 2000,
+    },
+    # Proposals run on a forked thread with a single long prompt and produce a document
+    "proposal": {
+        "truncation_strategy": {"type": "auto"},
+        "max_prompt_tokens": 80000,
+        "max_completion_tokens": 16000,
+    },
+    # Extraction sees one transcript message and returns a definitions list
+    "extraction": {
+        "truncation_strategy": {"type": "auto"},
+        "max_prompt_tokens": 60000,
+        "max_completion_tokens": 4000,
+    },
+}
+
+SUMMARY_MODEL = "gpt-4o-mini"
+SUMMARY_MAX_TRANSCRIPT_CHARS = 60000
+SUMMARY_PREFIX = "SUMMARY OF THE EARLIER CONVERSATION (continue from here):"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS thread_summaries (
+    thread_id TEXT NOT NULL,
+    last_message_id TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (thread_id, last_message_id)
+);
+"""
+
+
+def run_options(use_case):
+    """Keyword arguments bounding a run's context for a use case"""
+    return dict(CONTEXT_POLICIES.get(use_case, {}))
+
+
+def thread_summary(client, thread_id):
+    """Summary of a thread's conversation so far, cached per last message id"""
+    ensure_schema("context_policy", SCHEMA)
+    sync_thread(client, thread_id)
+    messages = mirrored_messages(thread_id)
+    if not messages:
+        return ""
+    last_message_id = messages[-1]["message_id"]
+    with connect() as conn:
+        row = conn.execute(
+            "SELECT summary FROM thread_summaries WHERE thread_id = ? AND last_message_id = ?",
+            (thread_id, last_message_id)
+        ).fetchone()
+    if row:
+        return row["summary"]
+
+    transcript = format_transcript(messages)[-SUMMARY_MAX_TRANSCRIPT_CHARS:]
+    response = client.chat.completions.create(
+        model=SUMMARY_MODEL,
+        messages=[
+            {"role": "system", "content": "Summarize this electrical-estimation conversation for a colleague taking it "
+                                          "over. Keep every figure, decision, open question and file reference; drop "
+                                          "pleasantries. Use short bullet points."},
+            {"role": "user", "content": transcript},
+        ],
+        max_tokens=1200,
+    )
+    summary = response.choices[0].message.content or ""
+    with connect() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO thread_summaries (thread_id, last_message_id, summary, created_at) VALUES (?, ?, ?, ?)",
+            (thread_id, last_message_id, summary, time.time())
+        )
+    return summary
+
+
+def start_fresh_thread(client, thread_id, tool_resources=None):
+    """New thread (same tool resources unless given) seeded with the old thread's summary; returns its id"""
+    if tool_resources is None:
+        existing = client.beta.threads.retrieve(thread_id).tool_resources
+        tool_resources = existing.model_dump(exclude_none=True) if existing else {}
+    summary = thread_summary(client, thread_id)
+    seed = [{"role": "user", "content": f"{SUMMARY_PREFIX}\n\n{summary}"}] if summary else []
+    return client.beta.threads.create(messages=seed, tool_resources=tool_resources).id
@@ -0,0 +1,43 @@
+"""
+Local SQLite storage shared by the Utils modules.
+
+Everything lives in one database file under DATA_DIR (override with the
+DDMAC_DATA_DIR environment variable). Connections are opened per call so the
+helpers are safe to use from Streamlit script threads and background jobs alike.
+"""
+
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+DATA_DIR = os.getenv("DDMAC_DATA_DIR", os.path.join(os.getcwd(), ".ddmac"))
+DB_PATH = os.path.join(DATA_DIR, "ddmac.sqlite3")
+
+_schema_lock = threading.Lock()
+_created_schemas = set()
+
+
+@contextmanager
+def connect():
+    """Open a connection to the local database, committing on success"""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    conn = sqlite3.connect(DB_PATH, timeout=30)
+    conn.row_factory = sqlite3.Row
+    try:
+        yield conn
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def ensure_schema(name, ddl):
+    """Create a module's tables once per process"""
+    if name in _created_schemas:
+        return
+    with _schema_lock:
+        if name in _created_schemas:
+            return
+        with connect() as conn:
+            conn.executescript(ddl)
+        _created_schemas.add(name)
@@ -0,0 +1,213 @@
+"""
+Tenant glossary: extracted definitions merged into one deduplicated term list.
+
+Extraction output ("**Term**: definition" lines) is parsed and merged into a SQLite
+table keyed on a normalized term (case, punctuation, plurals and a parenthetical
+abbreviation folded), so the same term extracted from many conversations is stored
+once and later explanations update it in place. The glossary is published to the
+vector store as a single versioned markdown file per tenant; a new version is only
+rendered when the term list actually changed.
+"""
+
+import re
+import time
+from datetime import datetime
+
+from Utils.db import connect, ensure_schema
+from Utils.projects import slugify
+from Utils.upload_ledger import content_hash
+
+# Per-extraction files written before the glossary existed; folded in once, then retired
+LEGACY_PREFIX = "Technical_Definitions_"
+CHUNK_CHARS = 1000
+
+DEFINITION_LINE = re.compile(
+    r"^\s*(?:[-*+]\s+|\d+[.)]\s+)?\*\*(?P<term>[^*]+?)\*\*\s*[:\-–—]?\s*(?P<definition>.*)$"
+)
+PARENTHETICAL = re.compile(r"\(([^)]*)\)")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS glossary_terms (
+    tenant TEXT NOT NULL,
+    term_key TEXT NOT NULL,
+    alias_key TEXT,
+    term TEXT NOT NULL,
+    definition TEXT NOT NULL,
+    source TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (tenant, term_key)
+);
+CREATE INDEX IF NOT EXISTS idx_glossary_terms_alias ON glossary_terms (tenant, alias_key);
+CREATE TABLE IF NOT EXISTS glossary_versions (
+    tenant TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    terms_hash TEXT NOT NULL,
+    file_id TEXT,
+    published_at REAL NOT NULL
+);
+"""
+
+
+def _key(text):
+    words = re.findall(r"[a-z0-9]+", str(text).lower())
+    if words and words[0] == "the":
+        words = words[1:]
+    return " ".join(word[:-1] if len(word) > 3 and word.endswith("s") else word for word in words)
+
+
+def term_keys(term):
+    """(key, alias key) for a term; 'Direct Labour (DirLb)' -> ('direct labour', 'dirlb')"""
+    alias = PARENTHETICAL.search(term)
+    key = _key(PARENTHETICAL.sub(" ", term)) or _key(term)
+    alias_key = _key(alias.group(1)) if alias else None
+    return key, (alias_key if alias_key and alias_key != key else None)
+
+
+def parse_definitions(text):
+    """[(term, definition)] from '**Term**: definition' lines; indented/continuation lines join the definition"""
+    definitions = []
+    current = None
+    for line in (text or "").splitlines():
+        match = DEFINITION_LINE.match(line)
+        if match:
+            term = match.group("term").strip().rstrip(":").strip()
+            current = [term, match.group("definition").strip()]
+            definitions.append(current)
+        elif current and line.strip() and not line.lstrip().startswith(("#", "---", "<!--")):
+            current[1] = f"{current[1]} {line.strip()}".strip()
+        else:
+            current = None
+    return [(term, definition) for term, definition in definitions if term and definition]
+
+
+def legacy_definitions(markdown):
+    """Definitions section of a legacy Technical_Definitions_*.md file (its header lines are bold too)"""
+    _, found, body = markdown.partition("## Definitions")
+    if not found:
+        return markdown
+    return body.rsplit("---", 1)[0] if "---" in body else body
+
+
+def _same_text(a, b):
+    return " ".join(a.lower().split()) == " ".join(b.lower().split())
+
+
+def merge_definitions(tenant, text, source=None):
+    """Merge parsed definitions into a tenant's glossary; returns {"added", "updated", "unchanged"}"""
+    ensure_schema("glossary", SCHEMA)
+    counts = {"added": 0, "updated": 0, "unchanged": 0}
+    now = time.time()
+    with connect() as conn:
+        for term, definition in parse_definitions(text):
+            key, alias_key = term_keys(term)
+            row = conn.execute(
+                """SELECT * FROM glossary_terms WHERE tenant = ?
+                   AND (term_key = ? OR alias_key = ? OR (? IS NOT NULL AND term_key = ?))
+                   ORDER BY term_key = ? DESC LIMIT 1""",
+                (tenant, key, key, alias_key, alias_key, key)
+            ).fetchone()
+            if row is None:
+                conn.execute(
+                    """INSERT INTO glossary_terms
+                       (tenant, term_key, alias_key, term, definition, source, created_at, updated_at)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                    (tenant, key, alias_key, term, definition, source, now, now)
+                )
+                counts["added"] += 1
+                continue
+            old = row["definition"]
+            # Restatements of what we have are dropped; anything else is a newer explanation
+            if _same_text(old, definition) or " ".join(definition.lower().split()) in " ".join(old.lower().split()):
+                counts["unchanged"] += 1
+                continue
+            # Keep the fuller form of the term ("Direct Labour (DirLb)" over "DirLb")
+            keep_term = term if alias_key and not row["alias_key"] else row["term"]
+            conn.execute(
+                """UPDATE glossary_terms SET term = ?, alias_key = COALESCE(alias_key, ?), definition = ?,
+                   source = ?, updated_at = ? WHERE tenant = ? AND term_key = ?""",
+                (keep_term, alias_key, definition, source, now, tenant, row["term_key"])
+            )
+            counts["updated"] += 1
+    return counts
+
+
+def glossary_terms(tenant):
+    """A tenant's glossary entries as dicts, alphabetical"""
+    ensure_schema("glossary", SCHEMA)
+    with connect() as conn:
+        rows = conn.execute(
+            "SELECT * FROM glossary_terms WHERE tenant = ? ORDER BY term COLLATE NOCASE", (tenant,)
+        ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def published_glossary(tenant):
+    """Latest published version record of a tenant's glossary, or None"""
+    ensure_schema("glossary", SCHEMA)
+    with connect() as conn:
+        row = conn.execute("SELECT * FROM glossary_versions WHERE tenant = ?", (tenant,)).fetchone()
+    return dict(row) if row else None
+
+
+def glossary_revision(tenant):
+    """Vector store revision key shared by every version of a tenant's glossary"""
+    return f"glossary:{tenant}"
+
+
+def glossary_source(tenant):
+    """Stable local index source name of a tenant's glossary"""
+    return f"Glossary_{slugify(tenant)}.md"
+
+
+def render_glossary(tenant, version, terms):
+    """Markdown glossary file with context markers roughly every CHUNK_CHARS"""
+    marker = f"\n<!-- CONTEXT: Technical Glossary | Tenant: {tenant} | Version: {version} -->\n\n"
+    lines = [
+        "# Technical Glossary",
+        "",
+        f"**Tenant:** {tenant}",
+        f"**Version:** {version}",
+        f"**Updated:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+        f"**Terms:** {len(terms)}",
+        "",
+        "---",
+        "",
+        "## Definitions",
+        "",
+        "",
+    ]
+    content = "\n".join(lines)
+    chunk = 0
+    for entry in terms:
+        line = f"- **{entry['term']}**: {entry['definition']}\n"
+        if chunk and chunk + len(line) > CHUNK_CHARS:
+            content += marker
+            chunk = 0
+        content += line
+        chunk += len(line)
+    return content + marker
+
+
+def next_glossary(tenant):
+    """(version, filename, markdown, terms hash) when the glossary changed since it was published, else None"""
+    terms = glossary_terms(tenant)
+    if not terms:
+        return None
+    terms_hash = content_hash(*(f"{entry['term']}\n{entry['definition']}" for entry in terms))
+    published = published_glossary(tenant)
+    if published and published["terms_hash"] == terms_hash:
+        return None
+    version = (published["version"] if published else 0) + 1
+    filename = f"Glossary_{slugify(tenant)}_v{version}.md"
+    return version, filename, render_glossary(tenant, version, terms), terms_hash
+
+
+def record_published(tenant, version, terms_hash, file_id):
+    """Remember which glossary version is live in the vector store"""
+    ensure_schema("glossary", SCHEMA)
+    with connect() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO glossary_versions (tenant, version, terms_hash, file_id, published_at) VALUES (?, ?, ?, ?, ?)",
+            (tenant, version, terms_hash, file_id, time.time())
+        )
@@ -0,0 +1,116 @@
+"""
+Background job table for work that should not block a Streamlit script run.
+
+Jobs run on a small shared thread pool that lives as long as the server process,
+so a job started on one rerun can be inspected on any later rerun (or page) by id.
+Job functions must not call Streamlit APIs - they only talk to OpenAI / local data
+and report progress through report_progress(). The table is shared by every user of
+the process, so jobs started for a browser session carry its session id and the UI
+lists only those; maintenance jobs have no session.
+"""
+
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+MAX_WORKERS = 4
+MAX_FINISHED_JOBS = 200
+
+FINISHED_STATUSES = ("completed", "failed")
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="ddmac-job")
+_jobs = {}
+_lock = threading.Lock()
+_current = threading.local()
+
+
+def submit_job(kind, fn, *args, label=None, session=None, **kwargs):
+    """Run fn(*args, **kwargs) in the background and return its job id
+
+    session tags the job with the browser session that started it (see list_jobs).
+    """
+    job_id = f"job_{uuid.uuid4().hex[:12]}"
+    job = {
+        "id": job_id,
+        "kind": kind,
+        "label": label or kind,
+        "session": session,
+        "status": "queued",
+        "message": "Waiting for a worker...",
+        "result": None,
+        "error": None,
+        "created_at": time.time(),
+        "started_at": None,
+        "finished_at": None,
+    }
+    with _lock:
+        _jobs[job_id] = job
+        _prune_finished()
+    _executor.submit(_run_job, job_id, fn, args, kwargs)
+    return job_id
+
+
+def _run_job(job_id, fn, args, kwargs):
+    """Execute a job and record its outcome in the job table"""
+    _current.job_id = job_id
+    _update_job(job_id, status="running", message="Running...", started_at=time.time())
+    try:
+        result = fn(*args, **kwargs)
+        _update_job(job_id, status="completed", result=result, message="Done", finished_at=time.time())
+    except Exception as e:
+        _update_job(job_id, status="failed", error=str(e), message=f"Failed: {str(e)}", finished_at=time.time())
+    finally:
+        _current.job_id = None
+
+
+def _update_job(job_id, **fields):
+    with _lock:
+        if job_id in _jobs:
+            _jobs[job_id].update(fields)
+
+
+def _prune_finished():
+    """Drop the oldest finished jobs so the table stays small (caller holds the lock)"""
+    finished = [job for job in _jobs.values() if job["status"] in FINISHED_STATUSES]
+    if len(finished) <= MAX_FINISHED_JOBS:
+        return
+    finished.sort(key=lambda job: job["finished_at"] or 0)
+    for job in finished[:len(finished) - MAX_FINISHED_JOBS]:
+        del _jobs[job["id"]]
+
+
+def report_progress(message):
+    """Set the status message of the job running on the current thread (no-op outside a job)"""
+    job_id = getattr(_current, "job_id", None)
+    if job_id:
+        _update_job(job_id, message=message)
+
+
+def get_job(job_id):
+    """Return a snapshot of a job, or None if the id is unknown"""
+    with _lock:
+        job = _jobs.get(job_id)
+        return dict(job) if job else None
+
+
+def list_jobs(kind=None, session=None):
+    """Return snapshots of a session's jobs, newest first; without a session, every job (admin/debug only)"""
+    with _lock:
+        jobs = [
+            dict(job) for job in _jobs.values()
+            if (kind is None or job["kind"] == kind) and (session is None or job["session"] == session)
+        ]
+    return sorted(jobs, key=lambda job: job["created_at"], reverse=True)
+
+
+def is_finished(job):
+    """True once a job snapshot has completed or failed"""
+    return bool(job) and job["status"] in FINISHED_STATUSES
+
+
+def job_duration(job):
+    """Seconds a job has been running (or ran for)"""
+    if not job or not job["started_at"]:
+        return 0.0
+    return (job["finished_at"] or time.time()) - job["started_at"]
@@ -0,0 +1,218 @@
+"""
+Incremental knowledge extraction from chat threads, run as a background job.
+
+Each thread keeps an extraction watermark (the last mirrored message already sent
+for extraction), so a run only covers messages added since then. Several threads
+are packed into one job: their new messages are grouped per thread into batches of
+at most MAX_BATCH_CHARS, and each batch is one run of the extraction assistant on
+an ephemeral thread. Watermarks are only advanced once the user has reviewed the
+result (advance_watermarks), so a failed or abandoned extraction is retried next
+time.
+"""
+
+import time
+
+from Utils.db import connect, ensure_schema
+from Utils.jobs import submit_job, report_progress
+from Utils.message_mirror import sync_thread, mirrored_messages
+from Utils.resource_registry import delete_resource
+from Utils.run_scheduler import fork_thread
+from Utils.run_waiter import wait_for_run
+from Utils.context_policy import run_options
+
+MAX_BATCH_CHARS = 150000
+MAX_THREADS_PER_JOB = 10
+NO_DEFINITIONS = "No technical definitions found"
+# Chat questions are sent as QUESTION_PREFIX + question, then instructions starting with INSTRUCTIONS_MARKER
+# and pre-retrieved context; only the question is extracted
+QUESTION_PREFIX = "USER'S QUESTION: "
+INSTRUCTIONS_MARKER = "Before answering any question, first check your knowledge base"
+
+EXTRACTION_PROMPT = """
+Please analyze the following conversations and extract all technical terms, concepts, and definitions that were explained or defined in them.
+
+IMPORTANT: Only return technical definitions that were actually explained or defined in these conversations. Do not include general knowledge or terms that weren't specifically discussed.
+
+Please format your response as a clean list of definitions like this:
+
+**Term 1**: Definition as explained in the conversation
+**Term 2**: Definition as explained in the conversation
+**Term 3**: Definition as explained in the conversation
+
+If no technical definitions were found, simply respond with "No technical definitions found in this conversation."
+
+Here are the conversations to analyze (only messages added since the last extraction):
+
+{conversations}
+"""
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS extraction_watermarks (
+    thread_id TEXT PRIMARY KEY,
+    last_message_id TEXT NOT NULL,
+    last_created_at REAL NOT NULL,
+    extracted_at REAL NOT NULL
+);
+"""
+
+
+def _watermarks(thread_ids):
+    ensure_schema("knowledge_extraction", SCHEMA)
+    thread_ids = list(thread_ids)
+    if not thread_ids:
+        return {}
+    with connect() as conn:
+        rows = conn.execute(
+            f"SELECT * FROM extraction_watermarks WHERE thread_id IN ({','.join('?' * len(thread_ids))})", thread_ids
+        ).fetchall()
+    return {row["thread_id"]: dict(row) for row in rows}
+
+
+def pending_messages(thread_id, watermark=None):
+    """Mirrored messages of a thread added after its extraction watermark"""
+    messages = mirrored_messages(thread_id)
+    if not watermark:
+        return messages
+    ids = [message["message_id"] for message in messages]
+    if watermark["last_message_id"] in ids:
+        return messages[ids.index(watermark["last_message_id"]) + 1:]
+    return [message for message in messages if message["created_at"] > watermark["last_created_at"]]
+
+
+def threads_needing_extraction(threads):
+    """Catalog rows (from Utils.thread_catalog) active since their last extraction"""
+    watermarks = _watermarks(thread["thread_id"] for thread in threads)
+    return [
+        thread for thread in threads
+        if thread["message_count"] and (
+            thread["thread_id"] not in watermarks
+            or thread["last_active_at"] > watermarks[thread["thread_id"]]["extracted_at"]
+        )
+    ]
+
+
+def question_text(text):
+    """The user's question from a Chat message, without the instructions and context sent along with it"""
+    if not text.startswith(QUESTION_PREFIX):
+        return text
+    # Split on the instructions, not on a blank line: questions can have several paragraphs
+    question, _, _ = text[len(QUESTION_PREFIX):].partition(INSTRUCTIONS_MARKER)
+    return question.rstrip()
+
+
+def _message_body(message):
+    return question_text(message["text"]) if message["role"] == "user" else message["text"]
+
+
+def _batches(sections):
+    """Pack (thread name, message lines) sections into prompt-sized batches, splitting long threads"""
+    batches, current, size = [], [], 0
+    for name, lines in sections:
+        chunk = []
+        for line in lines:
+            if size + len(line) > MAX_BATCH_CHARS and (current or chunk):
+                if chunk:
+                    current.append((name, chunk))
+                batches.append(current)
+                current, chunk, size = [], [], 0
+            chunk.append(line[:MAX_BATCH_CHARS])
+            size += len(chunk[-1])
+        if chunk:
+            current.append((name, chunk))
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _run_extraction(client, assistant_id, batch):
+    conversations = "\n\n".join(f"### Conversation: {name}\n\n" + "".join(lines) for name, lines in batch)
+    extraction_thread_id = fork_thread(client, [], owner="extraction")
+    try:
+        client.beta.threads.messages.create(
+            thread_id=extraction_thread_id,
+            role="user",
+            content=EXTRACTION_PROMPT.format(conversations=conversations)
+        )
+        run = client.beta.threads.runs.create(
+            thread_id=extraction_thread_id,
+            assistant_id=assistant_id,
+            **run_options("extraction")
+        )
+        run = wait_for_run(client, extraction_thread_id, run.id, operation="extraction")
+        if run.status != "completed":
+            raise RuntimeError(f"Knowledge extraction ended with status: {run.status}")
+        messages = client.beta.threads.messages.list(thread_id=extraction_thread_id, limit=1)
+        return messages.data[0].content[0].text.value
+    finally:
+        # The reaper retries if this fails
+        try:
+            delete_resource(client, extraction_thread_id, "thread")
+        except Exception:
+            pass
+
+
+def extract_knowledge(client, assistant_id, threads):
+    """Extract definitions from new messages of [(thread_id, name)]
+
+    Returns {"definitions", "watermarks", "threads", "messages"}; definitions is empty
+    when nothing was found. Pass watermarks to advance_watermarks once reviewed.
+    """
+    threads = list(threads)[:MAX_THREADS_PER_JOB]
+    watermarks = _watermarks(thread_id for thread_id, _ in threads)
+    sections, new_watermarks, message_count = [], {}, 0
+    for position, (thread_id, name) in enumerate(threads, start=1):
+        report_progress(f"Syncing thread {position}/{len(threads)}...")
+        sync_thread(client, thread_id)
+        synced_at = time.time()
+        messages = pending_messages(thread_id, watermarks.get(thread_id))
+        if not messages:
+            continue
+        sections.append((name, [f"{message['role'].capitalize()}: {_message_body(message)}\n\n" for message in messages]))
+        new_watermarks[thread_id] = {
+            "last_message_id": messages[-1]["message_id"],
+            "last_created_at": messages[-1]["created_at"],
+            "extracted_at": synced_at,
+        }
+        message_count += len(messages)
+
+    results = []
+    batches = _batches(sections)
+    for position, batch in enumerate(batches, start=1):
+        report_progress(f"Extracting batch {position}/{len(batches)}...")
+        text = _run_extraction(client, assistant_id, batch)
+        if NO_DEFINITIONS not in text:
+            results.append(text.strip())
+    return {
+        "definitions": "\n\n".join(results),
+        "watermarks": new_watermarks,
+        "threads": len(new_watermarks),
+        "messages": message_count,
+    }
+
+
+def start_extraction(client, assistant_id, threads, label="Knowledge extraction", session=None):
+    """Run extract_knowledge as a background job for a browser session; returns the job id"""
+    return submit_job(
+        "knowledge_extraction", extract_knowledge, client, assistant_id, list(threads), label=label, session=session
+    )
+
+
+def advance_watermarks(watermarks):
+    """Mark the messages covered by an extraction as processed"""
+    if not watermarks:
+        return
+    ensure_schema("knowledge_extraction", SCHEMA)
+    with connect() as conn:
+        conn.executemany(
+            """INSERT OR REPLACE INTO extraction_watermarks (thread_id, last_message_id, last_created_at, extracted_at)
+               VALUES (?, ?, ?, ?)""",
+            [(thread_id, mark["last_message_id"], mark["last_created_at"], mark["extracted_at"])
+             for thread_id, mark in watermarks.items()]
+        )
+
+
+def forget_watermark(thread_id):
+    """Drop a deleted thread's watermark"""
+    ensure_schema("knowledge_extraction", SCHEMA)
+    with connect() as conn:
+        conn.execute("DELETE FROM extraction_watermarks WHERE thread_id = ?", (thread_id,))
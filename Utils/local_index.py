@@ -0,0 +1,231 @@
+"""
+Local BM25 retrieval index over the same chunk records we upload to vector stores.
+
+Markdown is split on the <!-- CONTEXT: ... --> markers the generators already emit,
+and each scope (a project key, or SHARED_SCOPE for tenant-wide knowledge) keeps a
+sparse document x term matrix of precomputed BM25 weights on disk. A query is then a
+single sparse mat-vec, which answers lookup-style questions in milliseconds and
+gives the assistant pre-retrieved context.
+
+NumPy/SciPy are optional: without them LOCAL_INDEX_AVAILABLE is False and search
+returns no hits.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import Counter
+
+try:
+    import numpy as np
+    from scipy import sparse
+    LOCAL_INDEX_AVAILABLE = True
+except ImportError:
+    np = None
+    sparse = None
+    LOCAL_INDEX_AVAILABLE = False
+
+from Utils.db import DATA_DIR
+from Utils.projects import slugify
+
+INDEX_DIR = os.path.join(DATA_DIR, "index")
+SHARED_SCOPE = "shared"
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# A hit is "strong" when it covers most query terms with a decent BM25 score per term
+STRONG_COVERAGE = 0.75
+STRONG_MIN_SCORE_PER_TERM = 0.8
+
+CONTEXT_MARKER = re.compile(r"<!--\s*CONTEXT:(.*?)-->", re.S)
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "how", "i", "in", "is", "it",
+    "me", "much", "of", "on", "or", "show", "tell", "that", "the", "this", "to", "was", "what",
+    "whats", "when", "where", "which", "who", "with", "s",
+}
+
+_lock = threading.Lock()
+_loaded = {}
+
+
+def tokenize(text):
+    """Lowercased word/number tokens without stopwords"""
+    return [token for token in TOKEN_PATTERN.findall(str(text).lower()) if token not in STOPWORDS]
+
+
+def split_chunks(markdown_content, source):
+    """Split generated markdown into chunk records at its context markers"""
+    records = []
+    position = 0
+    for match in CONTEXT_MARKER.finditer(markdown_content):
+        text = markdown_content[position:match.start()].strip()
+        if text:
+            records.append({"source": source, "text": text, "context": match.group(1).strip()})
+        position = match.end()
+    tail = markdown_content[position:].strip()
+    if tail:
+        records.append({"source": source, "text": tail, "context": ""})
+    for number, record in enumerate(records):
+        record["id"] = f"{source}#{number}"
+    return records
+
+
+def _scope_dir(scope):
+    # Different scope keys can slugify alike ("ACME / Tower" and "acme-tower"), so the raw key's hash keeps them apart
+    digest = hashlib.sha256(str(scope).encode("utf-8")).hexdigest()[:10]
+    return os.path.join(INDEX_DIR, f"{slugify(scope) or SHARED_SCOPE}-{digest}")
+
+
+def _load_records(scope):
+    path = os.path.join(_scope_dir(scope), "chunks.json")
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _build(records):
+    """BM25 weight matrix (documents x vocabulary) and vocabulary for chunk records"""
+    vocabulary = {}
+    rows, cols, term_counts = [], [], []
+    lengths = []
+    for row, record in enumerate(records):
+        counts = Counter(tokenize(record["text"] + " " + record.get("context", "")))
+        lengths.append(sum(counts.values()))
+        for term, count in counts.items():
+            rows.append(row)
+            cols.append(vocabulary.setdefault(term, len(vocabulary)))
+            term_counts.append(count)
+
+    shape = (len(records), max(len(vocabulary), 1))
+    tf = sparse.csr_matrix((np.array(term_counts, dtype=np.float32), (rows, cols)), shape=shape)
+    doc_freq = np.bincount(np.array(cols, dtype=np.int64), minlength=shape[1]).astype(np.float32)
+    idf = np.log(1.0 + (len(records) - doc_freq + 0.5) / (doc_freq + 0.5)).astype(np.float32)
+
+    lengths = np.array(lengths, dtype=np.float32)
+    avg_length = float(lengths.mean()) if len(records) else 1.0
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / max(avg_length, 1.0))
+    tf = tf.tocoo()
+    weights = idf[tf.col] * tf.data * (BM25_K1 + 1) / (tf.data + norm[tf.row])
+    matrix = sparse.csr_matrix((weights.astype(np.float32), (tf.row, tf.col)), shape=shape)
+    return matrix, vocabulary
+
+
+def _save(scope, records):
+    """Rebuild and store a scope's index (caller holds the lock)"""
+    matrix, vocabulary = _build(records)
+    directory = _scope_dir(scope)
+    os.makedirs(directory, exist_ok=True)
+    sparse.save_npz(os.path.join(directory, "bm25.npz"), matrix)
+    with open(os.path.join(directory, "vocabulary.json"), "w", encoding="utf-8") as f:
+        json.dump(vocabulary, f)
+    with open(os.path.join(directory, "chunks.json"), "w", encoding="utf-8") as f:
+        json.dump(records, f)
+    _loaded[scope] = (matrix, vocabulary, records)
+
+
+def index_source(scope, source, markdown_content):
+    """(Re)index one source document in a scope, replacing its previous chunks"""
+    if not LOCAL_INDEX_AVAILABLE:
+        return 0
+    new_records = split_chunks(markdown_content, source)
+    with _lock:
+        records = [record for record in _load_records(scope) if record["source"] != source] + new_records
+        _save(scope, records)
+    return len(new_records)
+
+
+def source_texts(scope, prefix=""):
+    """{source: chunk text} for the indexed sources of a scope whose name starts with prefix"""
+    texts = {}
+    with _lock:
+        for record in _load_records(scope):
+            if record["source"].startswith(prefix):
+                texts[record["source"]] = (texts.get(record["source"], "") + "\n\n" + record["text"]).strip()
+    return texts
+
+
+def remove_sources(scope, sources):
+    """Drop the chunks of the given sources from a scope's index"""
+    sources = set(sources)
+    if not LOCAL_INDEX_AVAILABLE or not sources:
+        return
+    with _lock:
+        records = _load_records(scope)
+        remaining = [record for record in records if record["source"] not in sources]
+        if len(remaining) != len(records):
+            _save(scope, remaining)
+
+
+def _get_index(scope):
+    with _lock:
+        if scope not in _loaded:
+            directory = _scope_dir(scope)
+            matrix_path = os.path.join(directory, "bm25.npz")
+            if not os.path.exists(matrix_path):
+                return None
+            with open(os.path.join(directory, "vocabulary.json"), encoding="utf-8") as f:
+                vocabulary = json.load(f)
+            _loaded[scope] = (sparse.load_npz(matrix_path).tocsr(), vocabulary, _load_records(scope))
+        return _loaded[scope]
+
+
+def search(scopes, query, k=5):
+    """Top-k chunk records across scopes as dicts with score and query-term coverage"""
+    if not LOCAL_INDEX_AVAILABLE:
+        return []
+    terms = sorted(set(tokenize(query)))
+    if not terms:
+        return []
+    hits = []
+    for scope in scopes:
+        if not scope:
+            continue
+        index = _get_index(scope)
+        if index is None:
+            continue
+        matrix, vocabulary, records = index
+        columns = [vocabulary[term] for term in terms if term in vocabulary]
+        if not columns or not records:
+            continue
+        sub_matrix = matrix[:, columns]
+        scores = np.asarray(sub_matrix.sum(axis=1)).ravel()
+        matched_terms = np.asarray((sub_matrix > 0).sum(axis=1)).ravel()
+        top = np.argsort(-scores)[:k]
+        for row in top:
+            if scores[row] <= 0:
+                break
+            hits.append({
+                **records[row],
+                "scope": scope,
+                "score": float(scores[row]),
+                "coverage": float(matched_terms[row]) / len(terms),
+                "query_terms": len(terms),
+            })
+    hits.sort(key=lambda hit: hit["score"], reverse=True)
+    return hits[:k]
+
+
+def is_strong(hits):
+    """True when the best local hit is good enough to skip the remote file_search"""
+    if not hits:
+        return False
+    best = hits[0]
+    return best["coverage"] >= STRONG_COVERAGE and best["score"] >= STRONG_MIN_SCORE_PER_TERM * best["query_terms"]
+
+
+def format_context(hits, max_chars=6000):
+    """Pre-retrieved context block for an assistant message"""
+    sections = []
+    used = 0
+    for hit in hits:
+        section = f"[Source: {hit['source']}]\n{hit['text']}"
+        if used + len(section) > max_chars:
+            break
+        sections.append(section)
+        used += len(section)
+    return "\n\n---\n\n".join(sections)
@@ -0,0 +1,107 @@
+"""
+Local SQLite mirror of thread messages, synced incrementally.
+
+sync_thread pages through messages.list in ascending order starting after the last
+mirrored message id, so long threads are read completely and each sync only fetches
+what is new. Messages still being written by a run (status in_progress) stop the
+cursor, so they are picked up complete on the next sync. Knowledge extraction,
+thread switching and exports read from the mirror.
+"""
+
+import time
+
+from Utils.db import connect, ensure_schema
+
+PAGE_SIZE = 100
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS thread_messages (
+    thread_id TEXT NOT NULL,
+    message_id TEXT NOT NULL,
+    role TEXT NOT NULL,
+    text TEXT NOT NULL,
+    run_id TEXT,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (thread_id, message_id)
+);
+CREATE INDEX IF NOT EXISTS idx_thread_messages_order ON thread_messages (thread_id, created_at);
+CREATE TABLE IF NOT EXISTS thread_sync (
+    thread_id TEXT PRIMARY KEY,
+    last_message_id TEXT,
+    synced_at REAL NOT NULL
+);
+"""
+
+
+def message_text(message):
+    """Plain text of a message's content blocks (images become placeholders)"""
+    parts = []
+    for block in message.content:
+        if block.type == "text":
+            parts.append(block.text.value)
+        elif block.type == "image_file":
+            parts.append(f"[Generated Image: file-{block.image_file.file_id}]")
+    return "\n".join(parts)
+
+
+def _cursor(thread_id):
+    with connect() as conn:
+        row = conn.execute("SELECT last_message_id FROM thread_sync WHERE thread_id = ?", (thread_id,)).fetchone()
+    return row["last_message_id"] if row else None
+
+
+def sync_thread(client, thread_id):
+    """Fetch messages newer than the mirror's cursor; returns how many were added"""
+    ensure_schema("message_mirror", SCHEMA)
+    cursor = _cursor(thread_id)
+    added = 0
+    while True:
+        options = {"after": cursor} if cursor else {}
+        page = client.beta.threads.messages.list(thread_id=thread_id, order="asc", limit=PAGE_SIZE, **options)
+        complete = []
+        for message in page.data:
+            if getattr(message, "status", "completed") == "in_progress":
+                break
+            complete.append(message)
+        if complete:
+            with connect() as conn:
+                conn.executemany(
+                    """INSERT OR REPLACE INTO thread_messages (thread_id, message_id, role, text, run_id, created_at)
+                       VALUES (?, ?, ?, ?, ?, ?)""",
+                    [(thread_id, message.id, message.role, message_text(message), message.run_id, message.created_at)
+                     for message in complete]
+                )
+                cursor = complete[-1].id
+                conn.execute(
+                    """INSERT INTO thread_sync (thread_id, last_message_id, synced_at) VALUES (?, ?, ?)
+                       ON CONFLICT (thread_id) DO UPDATE SET last_message_id = excluded.last_message_id,
+                           synced_at = excluded.synced_at""",
+                    (thread_id, cursor, time.time())
+                )
+            added += len(complete)
+        if len(complete) < len(page.data) or not page.has_more:
+            return added
+
+
+def mirrored_messages(thread_id):
+    """Mirrored messages of a thread, oldest first, as dicts"""
+    ensure_schema("message_mirror", SCHEMA)
+    with connect() as conn:
+        rows = conn.execute(
+            "SELECT message_id, role, text, run_id, created_at FROM thread_messages WHERE thread_id = ? ORDER BY created_at, rowid",
+            (thread_id,)
+        ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def format_transcript(messages):
+    """'Role: text' transcript of mirrored messages"""
+    return "".join(f"{message['role'].capitalize()}: {message['text']}\n\n" for message in messages)
+
+
+def forget_thread(thread_id):
+    """Drop a thread's mirror"""
+    ensure_schema("message_mirror", SCHEMA)
+    with connect() as conn:
+        conn.execute("DELETE FROM thread_messages WHERE thread_id = ?", (thread_id,))
+        conn.execute("DELETE FROM thread_sync WHERE thread_id = ?", (thread_id,))
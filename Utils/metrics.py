@@ -0,0 +1,58 @@
+"""
+Lightweight latency/usage metrics recorded to SQLite.
+
+Callers record one numeric sample per event (e.g. "chat.first_token_seconds") with
+optional string tags; metric_summary() aggregates them for display.
+"""
+
+import json
+import time
+
+from Utils.db import connect, ensure_schema
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS metrics (
+    name TEXT NOT NULL,
+    value REAL NOT NULL,
+    tags TEXT,
+    recorded_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_metrics_name ON metrics (name, recorded_at);
+"""
+
+
+def record_metric(name, value, **tags):
+    """Store one sample; metrics must never break the caller, so failures are swallowed"""
+    try:
+        ensure_schema("metrics", SCHEMA)
+        with connect() as conn:
+            conn.execute(
+                "INSERT INTO metrics (name, value, tags, recorded_at) VALUES (?, ?, ?, ?)",
+                (name, float(value), json.dumps(tags, sort_keys=True) if tags else None, time.time())
+            )
+    except Exception:
+        pass
+
+
+def metric_summary(prefix="", since=None):
+    """Count, mean, p50, p95 and max per metric name (optionally only names starting with prefix)"""
+    ensure_schema("metrics", SCHEMA)
+    with connect() as conn:
+        rows = conn.execute(
+            "SELECT name, value FROM metrics WHERE name LIKE ? AND recorded_at >= ? ORDER BY name, value",
+            (f"{prefix}%", since or 0)
+        ).fetchall()
+    values = {}
+    for row in rows:
+        values.setdefault(row["name"], []).append(row["value"])
+    summary = []
+    for name, samples in values.items():
+        summary.append({
+            "name": name,
+            "count": len(samples),
+            "mean": sum(samples) / len(samples),
+            "p50": samples[len(samples) // 2],
+            "p95": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+            "max": samples[-1],
+        })
+    return summary
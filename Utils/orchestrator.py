@@ -0,0 +1,97 @@
+"""
+Concurrent stage orchestrator for multi-step processing flows.
+
+A flow is a list of stage dicts: {"name", "label", "fn", "after"}. Each stage's fn
+receives the results of the stages listed in "after" as keyword arguments. Every
+stage whose dependencies are done runs at once on a thread pool, so total time
+approaches the slowest dependency chain instead of the sum of all stages.
+
+Stage functions run on worker threads and must not touch Streamlit; on_update is
+called on the caller's thread after every state change so the page can redraw.
+"""
+
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+MAX_WORKERS = 4
+
+STATUS_ICONS = {"pending": "⏳", "running": "🔄", "completed": "✅", "failed": "❌", "skipped": "⏭️"}
+
+
+class StageFailed(Exception):
+    """Raised by run_stages when a stage fails; carries the stage statuses"""
+
+    def __init__(self, stage_name, error, statuses):
+        super().__init__(f"{stage_name}: {error}")
+        self.stage_name = stage_name
+        self.error = error
+        self.statuses = statuses
+
+
+def _new_status(stage):
+    return {"label": stage.get("label", stage["name"]), "status": "pending",
+            "started_at": None, "finished_at": None, "error": None}
+
+
+def stage_duration(status):
+    """Seconds a stage has been running (or ran for)"""
+    if not status["started_at"]:
+        return 0.0
+    return (status["finished_at"] or time.time()) - status["started_at"]
+
+
+def run_stages(stages, on_update=None, max_workers=MAX_WORKERS):
+    """Run stages concurrently respecting their dependencies; returns {name: result}"""
+    by_name = {stage["name"]: stage for stage in stages}
+    statuses = {stage["name"]: _new_status(stage) for stage in stages}
+    results = {}
+    running = {}
+    failure = None
+
+    def notify():
+        if on_update:
+            on_update(statuses)
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ddmac-stage") as executor:
+        while True:
+            if failure is None:
+                for name, stage in by_name.items():
+                    if statuses[name]["status"] != "pending":
+                        continue
+                    if all(dependency in results for dependency in stage.get("after", [])):
+                        kwargs = {dependency: results[dependency] for dependency in stage.get("after", [])}
+                        statuses[name].update(status="running", started_at=time.time())
+                        running[executor.submit(stage["fn"], **kwargs)] = name
+            notify()
+            if not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                statuses[name]["finished_at"] = time.time()
+                try:
+                    results[name] = future.result()
+                    statuses[name]["status"] = "completed"
+                except Exception as e:
+                    statuses[name].update(status="failed", error=str(e))
+                    failure = failure or (name, str(e))
+
+    if failure:
+        for status in statuses.values():
+            if status["status"] == "pending":
+                status["status"] = "skipped"
+        notify()
+        raise StageFailed(failure[0], failure[1], statuses)
+    return results
+
+
+def format_stage_statuses(statuses):
+    """Markdown lines describing each stage's state"""
+    lines = []
+    for status in statuses.values():
+        icon = STATUS_ICONS.get(status["status"], "❔")
+        timing = f" ({stage_duration(status):.1f}s)" if status["started_at"] else ""
+        error = f" - {status['error']}" if status["error"] else ""
+        lines.append(f"{icon} {status['label']}{timing}{error}")
+    return "  \n".join(lines)
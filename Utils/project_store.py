@@ -0,0 +1,98 @@
+"""
+Persistent store of processed projects so a refresh or restart doesn't redo processing.
+
+Each project key maps to one row holding a zlib-compressed JSON snapshot of the
+session fields listed in PERSISTED_KEYS (thread/assistant/file ids, generated
+markdown, sheet info, proposal customizations, chat history). Saving merges into
+the existing snapshot, so a page can persist just the fields it owns. Restoring
+is a single local read - no OpenAI calls.
+"""
+
+import json
+import time
+import zlib
+
+from Utils.db import connect, ensure_schema
+
+PERSISTED_KEYS = (
+    "project_info",
+    "thread_id",
+    "assistant_id",
+    "file_id",
+    "markdown_content",
+    "sheet_info",
+    "sheet_names",
+    "conversion_results",
+    "vector_upload_success",
+    "proposal_customizations",
+    "floating_chat_messages",
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS projects (
+    project_key TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    payload BLOB NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_projects_updated ON projects (updated_at);
+"""
+
+
+def _pack(state):
+    return zlib.compress(json.dumps(state, separators=(",", ":")).encode("utf-8"))
+
+
+def _unpack(payload):
+    return json.loads(zlib.decompress(payload).decode("utf-8"))
+
+
+def _title(state):
+    project_info = state.get("project_info") or {}
+    return f"{project_info.get('company_name', 'Unknown')} - {project_info.get('project_name', 'Unknown')}"
+
+
+def load_project(project_key):
+    """Saved snapshot of a project (dict of PERSISTED_KEYS fields), or None"""
+    if not project_key:
+        return None
+    ensure_schema("project_store", SCHEMA)
+    with connect() as conn:
+        row = conn.execute("SELECT payload FROM projects WHERE project_key = ?", (project_key,)).fetchone()
+    return _unpack(row["payload"]) if row else None
+
+
+def save_project(project_key, state):
+    """Merge the given session fields into a project's snapshot"""
+    if not project_key:
+        return
+    ensure_schema("project_store", SCHEMA)
+    updates = {key: value for key, value in state.items() if key in PERSISTED_KEYS}
+    merged = {**(load_project(project_key) or {}), **updates}
+    now = time.time()
+    with connect() as conn:
+        conn.execute(
+            """INSERT INTO projects (project_key, title, payload, created_at, updated_at)
+               VALUES (?, ?, ?, ?, ?)
+               ON CONFLICT (project_key) DO UPDATE SET title = excluded.title,
+                   payload = excluded.payload, updated_at = excluded.updated_at""",
+            (project_key, _title(merged), _pack(merged), now, now)
+        )
+
+
+def list_projects(limit=20):
+    """Most recently updated projects as dicts with project_key, title and updated_at"""
+    ensure_schema("project_store", SCHEMA)
+    with connect() as conn:
+        rows = conn.execute(
+            "SELECT project_key, title, updated_at FROM projects ORDER BY updated_at DESC LIMIT ?", (limit,)
+        ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def delete_project(project_key):
+    """Forget a project's snapshot (remote resources are left to the resource registry)"""
+    ensure_schema("project_store", SCHEMA)
+    with connect() as conn:
+        conn.execute("DELETE FROM projects WHERE project_key = ?", (project_key,))
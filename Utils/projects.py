@@ -0,0 +1,19 @@
+"""Project identity helpers shared by the pages and the Utils modules"""
+
+import re
+
+
+def slugify(value):
+    """Lowercase, dash-separated form of a name for keys and attributes"""
+    return re.sub(r"[^a-z0-9]+", "-", str(value or "").strip().lower()).strip("-")
+
+
+def project_key(project_info):
+    """Stable key for a project (normalized company/project name), or None without project info"""
+    if not project_info:
+        return None
+    company = slugify(project_info.get('company_name'))
+    project = slugify(project_info.get('project_name'))
+    if not company and not project:
+        return None
+    return f"{company or 'unknown'}/{project or 'unknown'}"
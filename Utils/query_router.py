@@ -0,0 +1,177 @@
+"""
+Local router for numeric questions over a project's cached sheets.
+
+route_question recognizes simple aggregate ("total DirLb hours", "average QtMat
+price", "how many Subs lines") and lookup ("largest subcontractor line", "top 5
+equipment items") intents, resolves the sheet and column from the question, and
+computes the answer with vectorized pandas operations in milliseconds. It is
+deliberately conservative: whenever the sheet, column or intent is ambiguous, or the
+question carries a qualifier it can't apply (a row value, "excluding ...", "floor 2"),
+it returns None and the question falls through to the assistant.
+"""
+
+import re
+
+import pandas as pd
+
+AGGREGATE_PATTERNS = [
+    ("count", r"\bhow many\b|\bnumber of\b|\bcount\b"),
+    ("mean", r"\baverage\b|\bavg\b|\bmean\b"),
+    ("max", r"\bmax(?:imum)?\b|\blargest\b|\bbiggest\b|\bhighest\b|\bmost expensive\b|\btop\b"),
+    ("min", r"\bmin(?:imum)?\b|\bsmallest\b|\blowest\b|\bcheapest\b|\bbottom\b"),
+    ("sum", r"\bsum\b|\btotal\b|\badd up\b|\boverall\b"),
+]
+AGGREGATE_LABELS = {"sum": "Total", "mean": "Average", "max": "Largest", "min": "Smallest"}
+ROW_WORDS = r"\b(?:line|lines|item|items|row|rows|entry|entries|record|records)\b"
+TOP_N = re.compile(r"\b(?:top|bottom)\s+(\d{1,2})\b")
+
+# Question words that hint at the kind of column being asked about
+COLUMN_HINTS = [
+    (r"\bhours?\b|\bhrs\b|\blabou?r\b", ("hour", "hrs", "labour", "labor")),
+    (r"\bcost\b|\bprice\b|\bamount\b|\$|\bdollars?\b|\bvalue\b", ("total", "amount", "ext", "cost", "price", "value")),
+    (r"\bquantity\b|\bqty\b|\bunits?\b", ("qty", "quantity", "units")),
+]
+
+TOTAL_ROW = re.compile(r"^\s*(?:grand\s+|sub\s*)?totals?\b", re.I)
+WORD = re.compile(r"[a-z0-9]+")
+IGNORED_WORDS = {
+    "the", "a", "an", "of", "in", "on", "for", "is", "are", "what", "whats", "which", "show", "me", "give",
+    "all", "sheet", "tab", "and", "to", "from", "with", "by", "per", "much", "how", "many", "number",
+}
+
+
+def _stem(word):
+    return word[:-1] if len(word) > 3 and word.endswith("s") else word
+
+
+def _words(text):
+    return {_stem(word) for word in WORD.findall(str(text).lower())} - IGNORED_WORDS
+
+
+# Words the router understands; any other word left in a question is a qualifier it can't
+# apply ("for lighting", "excluding conduit", "floor 2"), so the question falls through
+ROUTER_WORDS = _words(
+    "count average avg mean max maximum largest biggest highest most expensive top min minimum smallest lowest "
+    "cheapest bottom sum total add up overall hours hrs labour labor cost price amount dollars value quantity qty "
+    "units line lines item items row rows entry entries record records "
+    "do did does we our there have has had take took taken spend spent use used it its this that be was were been"
+)
+
+
+def _intent(question):
+    lowered = question.lower()
+    for aggregate, pattern in AGGREGATE_PATTERNS:
+        if re.search(pattern, lowered):
+            return aggregate
+    return None
+
+
+def _resolve_sheet(question_words, sheet_data, sheet_info):
+    if len(sheet_data) == 1:
+        return next(iter(sheet_data))
+    matches = []
+    for sheet_name in sheet_data:
+        if _stem(sheet_name.lower()) in question_words:
+            matches.append(sheet_name)
+            continue
+        meaning_words = _words((sheet_info or {}).get(sheet_name, {}).get("meaning", ""))
+        if meaning_words and meaning_words <= question_words:
+            matches.append(sheet_name)
+    return matches[0] if len(matches) == 1 else None
+
+
+def _resolve_column(question, question_words, df, sheet_words, explicit=False):
+    """Numeric column named or hinted at by the question; explicit=True never falls back to a sole column"""
+    numeric_columns = list(df.select_dtypes("number").columns)
+    if not numeric_columns:
+        return None
+    wanted = question_words - sheet_words
+    scored = [(len(_words(column) & wanted), column) for column in numeric_columns]
+    best = max(score for score, _ in scored)
+    if best > 0:
+        top = [column for score, column in scored if score == best]
+        return top[0] if len(top) == 1 else None
+    lowered = question.lower()
+    for pattern, column_words in COLUMN_HINTS:
+        if re.search(pattern, lowered):
+            for column_word in column_words:
+                candidates = [column for column in numeric_columns if column_word in str(column).lower()]
+                if len(candidates) == 1:
+                    return candidates[0]
+            return None
+    return numeric_columns[0] if len(numeric_columns) == 1 and not explicit else None
+
+
+def _without_total_rows(df):
+    text_columns = df.select_dtypes(exclude="number")
+    if text_columns.empty:
+        return df
+    is_total = text_columns.apply(lambda column: column.astype(str).str.match(TOTAL_ROW)).any(axis=1)
+    return df[~is_total]
+
+
+def _format_value(value):
+    if pd.isna(value):
+        return "n/a"
+    return f"{value:,.0f}" if float(value).is_integer() else f"{value:,.2f}"
+
+
+def _rows_table(rows):
+    columns = [column for column in rows.columns if not str(column).startswith("Unnamed") or rows[column].notna().any()]
+    header = "| " + " | ".join(str(column) for column in columns) + " |"
+    divider = "| " + " | ".join("---" for _ in columns) + " |"
+    body = [
+        "| " + " | ".join("" if pd.isna(row[column]) else str(row[column]) for column in columns) + " |"
+        for _, row in rows.iterrows()
+    ]
+    return "\n".join([header, divider, *body])
+
+
+def route_question(question, sheet_data, sheet_info=None):
+    """Answer a numeric question locally; returns {"content", "sheet", "column"} or None to fall through"""
+    if not question or not sheet_data:
+        return None
+    aggregate = _intent(question)
+    if aggregate is None:
+        return None
+    question_words = _words(question)
+    sheet_name = _resolve_sheet(question_words, sheet_data, sheet_info)
+    if sheet_name is None:
+        return None
+    df = _without_total_rows(sheet_data[sheet_name].dropna(how="all"))
+    sheet_words = {_stem(sheet_name.lower())} | _words((sheet_info or {}).get(sheet_name, {}).get("meaning", ""))
+    wants_rows = re.search(ROW_WORDS, question.lower()) is not None
+    meaning = (sheet_info or {}).get(sheet_name, {}).get("meaning")
+    sheet_label = f"{sheet_name} ({meaning})" if meaning else sheet_name
+
+    # For "how many"/"count" questions the noun decides: rows ("how many lines") are counted,
+    # a measure ("how many hours") is totalled, and both or neither is ambiguous
+    column = _resolve_column(question, question_words, df, sheet_words, explicit=aggregate == "count")
+    top_n = TOP_N.search(question.lower())
+    understood = ROUTER_WORDS | sheet_words | _words(sheet_name) | _words(column if column is not None else "")
+    if question_words - understood - ({top_n.group(1)} if top_n else set()):
+        return None
+    if aggregate == "count":
+        if wants_rows and column is None:
+            return {"content": f"**{sheet_label}** has **{len(df):,}** lines.\n\n_Computed locally from the cached sheet (total rows excluded)._",
+                    "sheet": sheet_name, "column": None}
+        if wants_rows:
+            return None
+        aggregate = "sum"
+    if column is None:
+        return None
+    values = pd.to_numeric(df[column], errors="coerce")
+    valid = values.notna()
+
+    if aggregate in ("max", "min") and wants_rows:
+        count = int(top_n.group(1)) if top_n else 1
+        ranked = values[valid].nlargest(count) if aggregate == "max" else values[valid].nsmallest(count)
+        rows = df.loc[ranked.index]
+        return {"content": f"**{AGGREGATE_LABELS[aggregate]} {'line' if count == 1 else f'{count} lines'} by `{column}` "
+                           f"in {sheet_label}:**\n\n{_rows_table(rows)}\n\n_Computed locally from {int(valid.sum()):,} lines._",
+                "sheet": sheet_name, "column": column}
+
+    result = getattr(values[valid], aggregate)()
+    return {"content": f"**{AGGREGATE_LABELS[aggregate]} of `{column}` in {sheet_label}: {_format_value(result)}**\n\n"
+                       f"_Computed locally from {int(valid.sum()):,} lines (total rows excluded)._",
+            "sheet": sheet_name, "column": column}
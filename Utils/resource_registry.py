@@ -0,0 +1,198 @@
+"""
+Local registry of every remote OpenAI resource the app creates, plus a reaper.
+
+Threads and files are registered with an owner (what created them: "project",
+"chat", "extraction", "template", ...), the project they belong to, and timestamps.
+Resources are touched when used and released when their project is closed; the
+reaper deletes released resources after a grace period and anything idle past its
+owner's limit, keeping account-level listings small. Pooled assistants are never
+registered here and therefore never reaped; vector store files are handled by
+Utils.vector_lifecycle.
+"""
+
+import time
+
+from openai import NotFoundError
+
+from Utils.db import connect, ensure_schema
+from Utils.jobs import submit_job, report_progress
+from Utils.upload_ledger import forget_file
+
+HOUR_SECONDS = 60 * 60
+DAY_SECONDS = 24 * HOUR_SECONDS
+
+# Maximum idle time per owner before the reaper deletes a resource
+IDLE_LIMITS = {
+    "extraction": HOUR_SECONDS,
+    "prewarm": HOUR_SECONDS,
+    "chat": 30 * DAY_SECONDS,
+    "project": 30 * DAY_SECONDS,
+    "proposal": 7 * DAY_SECONDS,
+    "template": 90 * DAY_SECONDS,
+}
+DEFAULT_IDLE_LIMIT = 30 * DAY_SECONDS
+RELEASED_GRACE_SECONDS = DAY_SECONDS
+
+REAPER_INTERVAL_SECONDS = 6 * HOUR_SECONDS
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS openai_resources (
+    resource_id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    owner TEXT NOT NULL,
+    project_key TEXT,
+    created_at REAL NOT NULL,
+    last_used_at REAL NOT NULL,
+    released_at REAL,
+    deleted_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_openai_resources_project ON openai_resources (project_key);
+CREATE INDEX IF NOT EXISTS idx_openai_resources_live ON openai_resources (deleted_at, owner);
+"""
+
+_last_reap = {"started_at": 0.0, "job_id": None}
+
+
+def register_resource(resource_id, kind, owner, project_key=None):
+    """Record a remote resource the app just created (or re-used)"""
+    ensure_schema("resource_registry", SCHEMA)
+    now = time.time()
+    with connect() as conn:
+        conn.execute(
+            """INSERT INTO openai_resources (resource_id, kind, owner, project_key, created_at, last_used_at)
+               VALUES (?, ?, ?, ?, ?, ?)
+               ON CONFLICT (resource_id) DO UPDATE SET last_used_at = excluded.last_used_at,
+                   project_key = COALESCE(excluded.project_key, project_key), released_at = NULL""",
+            (resource_id, kind, owner, project_key, now, now)
+        )
+
+
+def touch_resource(resource_id):
+    """Mark a resource as just used (and no longer released)"""
+    if not resource_id:
+        return
+    ensure_schema("resource_registry", SCHEMA)
+    with connect() as conn:
+        conn.execute(
+            "UPDATE openai_resources SET last_used_at = ?, released_at = NULL WHERE resource_id = ?",
+            (time.time(), resource_id)
+        )
+
+
+def claim_resource(resource_id, owner, project_key=None):
+    """Hand a resource over to a new owner (e.g. a prewarmed thread adopted by a project)"""
+    ensure_schema("resource_registry", SCHEMA)
+    with connect() as conn:
+        conn.execute(
+            """UPDATE openai_resources SET owner = ?, project_key = COALESCE(?, project_key),
+                   last_used_at = ?, released_at = NULL WHERE resource_id = ?""",
+            (owner, project_key, time.time(), resource_id)
+        )
+
+
+def resource_live(resource_id):
+    """False once the registry has deleted a resource (unknown resources count as live)"""
+    ensure_schema("resource_registry", SCHEMA)
+    with connect() as conn:
+        row = conn.execute("SELECT deleted_at FROM openai_resources WHERE resource_id = ?", (resource_id,)).fetchone()
+    return row is None or row["deleted_at"] is None
+
+
+def release_project(project_key, owner="project"):
+    """Mark a closed project's resources as no longer needed; the reaper deletes them after a grace period
+
+    Only resources held by the given owner are released - Chat threads tagged with the
+    same project belong to the Chat page and outlive a Home reset. Shared content (e.g.
+    the same workbook re-used by a later project) is re-keyed to the latest project on
+    registration, so it is not released here.
+    """
+    if not project_key:
+        return
+    ensure_schema("resource_registry", SCHEMA)
+    with connect() as conn:
+        conn.execute(
+            """UPDATE openai_resources SET released_at = ?
+               WHERE project_key = ? AND owner = ? AND deleted_at IS NULL AND released_at IS NULL""",
+            (time.time(), project_key, owner)
+        )
+
+
+def _delete_remote(client, kind, resource_id):
+    try:
+        if kind == "thread":
+            client.beta.threads.delete(resource_id)
+        elif kind == "file":
+            client.files.delete(resource_id)
+            forget_file(resource_id)
+        elif kind == "assistant":
+            client.beta.assistants.delete(resource_id)
+    except NotFoundError:
+        if kind == "file":
+            forget_file(resource_id)
+
+
+def delete_resource(client, resource_id, kind):
+    """Delete a remote resource now and record it as deleted"""
+    _delete_remote(client, kind, resource_id)
+    ensure_schema("resource_registry", SCHEMA)
+    with connect() as conn:
+        conn.execute(
+            """INSERT INTO openai_resources (resource_id, kind, owner, created_at, last_used_at, deleted_at)
+               VALUES (?, ?, 'unknown', ?, ?, ?)
+               ON CONFLICT (resource_id) DO UPDATE SET deleted_at = excluded.deleted_at""",
+            (resource_id, kind, time.time(), time.time(), time.time())
+        )
+
+
+def reapable_resources(now=None):
+    """Live resources that are released past the grace period or idle past their owner's limit"""
+    ensure_schema("resource_registry", SCHEMA)
+    now = now or time.time()
+    with connect() as conn:
+        rows = conn.execute("SELECT * FROM openai_resources WHERE deleted_at IS NULL").fetchall()
+    reapable = []
+    for row in rows:
+        idle_limit = IDLE_LIMITS.get(row["owner"], DEFAULT_IDLE_LIMIT)
+        if row["released_at"] is not None and now - row["released_at"] > RELEASED_GRACE_SECONDS:
+            reapable.append({**dict(row), "reason": "released"})
+        elif now - row["last_used_at"] > idle_limit:
+            reapable.append({**dict(row), "reason": "idle"})
+    return reapable
+
+
+def reap_resources(client):
+    """Delete every reapable resource; returns (deleted_count, message)"""
+    reapable = reapable_resources()
+    deleted = 0
+    errors = []
+    for index, resource in enumerate(reapable, start=1):
+        report_progress(f"Deleting {resource['kind']} {resource['resource_id']} ({index}/{len(reapable)}, {resource['reason']})")
+        try:
+            delete_resource(client, resource["resource_id"], resource["kind"])
+            deleted += 1
+        except Exception as e:
+            errors.append(f"{resource['resource_id']}: {str(e)}")
+    if errors:
+        return deleted, f"Deleted {deleted} of {len(reapable)} resources; errors: {'; '.join(errors[:3])}"
+    return deleted, f"Deleted {deleted} idle or released resources"
+
+
+def schedule_reaper(client, force=False):
+    """Start a background reaper job unless one ran recently; returns the job id or None"""
+    now = time.time()
+    if not force and now - _last_reap["started_at"] < REAPER_INTERVAL_SECONDS:
+        return None
+    _last_reap["started_at"] = now
+    _last_reap["job_id"] = submit_job("resource_reaper", reap_resources, client, label="Resource cleanup")
+    return _last_reap["job_id"]
+
+
+def registry_summary():
+    """Live resource counts per kind and owner"""
+    ensure_schema("resource_registry", SCHEMA)
+    with connect() as conn:
+        rows = conn.execute(
+            """SELECT kind, owner, COUNT(*) AS live, SUM(released_at IS NOT NULL) AS released
+               FROM openai_resources WHERE deleted_at IS NULL GROUP BY kind, owner ORDER BY kind, owner"""
+        ).fetchall()
+    return [dict(row) for row in rows]
@@ -0,0 +1,93 @@
+"""
+Per-thread run scheduling.
+
+The Assistants API allows one active run per thread and rejects new messages while
+a run is active. run_slot() gives each thread a FIFO queue inside this process:
+callers wait for their turn, then for any run still active remotely (started from
+another tab or process), and only then post their message and start a run.
+
+Work that doesn't need the conversation's context (proposals, extractions) should
+not queue at all - fork_thread() creates an ephemeral thread with just the files it
+needs, registered with the resource registry so the reaper cleans it up.
+"""
+
+import itertools
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+from Utils.resource_registry import register_resource
+from Utils.run_waiter import ACTIVE_STATUSES, wait_for_run
+
+QUEUE_POLL_SECONDS = 0.5
+
+_lock = threading.Lock()
+_queues = {}
+_tickets = itertools.count()
+
+
+def _queue(thread_id):
+    with _lock:
+        if thread_id not in _queues:
+            _queues[thread_id] = (threading.Condition(), deque())
+        return _queues[thread_id]
+
+
+def queue_length(thread_id):
+    """Number of runs active or waiting on a thread in this process"""
+    return len(_queue(thread_id)[1])
+
+
+def wait_for_active_run(client, thread_id, operation="queued"):
+    """Block until the thread's latest run (if any) is no longer active
+
+    That run may belong to another session or page, so it is only polled: a deadline
+    raises RunTimeout without cancelling it.
+    """
+    runs = client.beta.threads.runs.list(thread_id=thread_id, limit=1)
+    if runs.data and runs.data[0].status in ACTIVE_STATUSES:
+        wait_for_run(client, thread_id, runs.data[0].id, operation=operation, cancel_on_timeout=False)
+
+
+@contextmanager
+def run_slot(client, thread_id, on_wait=None):
+    """Hold the thread's run slot: post the message and run the assistant inside the block
+
+    on_wait(position) is called while queued behind other runs from this process
+    (position 1 = next in line).
+    """
+    condition, queue = _queue(thread_id)
+    ticket = next(_tickets)
+    with condition:
+        queue.append(ticket)
+    try:
+        while True:
+            with condition:
+                if queue[0] == ticket:
+                    break
+                position = queue.index(ticket)
+                condition.wait(QUEUE_POLL_SECONDS)
+            if on_wait:
+                on_wait(position)
+        wait_for_active_run(client, thread_id)
+        yield
+    finally:
+        with condition:
+            queue.remove(ticket)
+            condition.notify_all()
+
+
+def post_exchange(client, thread_id, question, answer):
+    """Add a question answered without a run (e.g. from the answer cache) to the thread's history"""
+    with run_slot(client, thread_id):
+        client.beta.threads.messages.create(thread_id=thread_id, role="user", content=question)
+        client.beta.threads.messages.create(thread_id=thread_id, role="assistant", content=answer)
+
+
+def fork_thread(client, file_ids, owner, project_key=None, tool_resources=None):
+    """Create an ephemeral thread carrying only the given code interpreter files; returns its id"""
+    file_ids = [file_id for file_id in file_ids if file_id]
+    resources = {"code_interpreter": {"file_ids": file_ids}} if file_ids else {}
+    thread = client.beta.threads.create(tool_resources={**resources, **(tool_resources or {})})
+    register_resource(thread.id, "thread", owner, project_key)
+    return thread.id
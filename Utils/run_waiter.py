@@ -0,0 +1,144 @@
+"""
+One way to wait for assistant runs: adaptive polling, deadlines and cancellation.
+
+wait_for_run polls quickly at first (most short runs finish within a couple of
+seconds) and backs off toward MAX_POLL_INTERVAL for long ones. Every operation has
+a deadline; when it passes the run is cancelled so it doesn't keep working and
+billing in the background. Anything else escaping the wait - errors, or Streamlit's
+stop/rerun control flow when the user interacts with the page - leaves the run
+alone: a wait spanning reruns polls for a short budget per rerun and picks the run
+up again on the next one. stream_run_text/stream_run apply the same deadline to
+streamed runs and also cancel a stream whose consumer went away, since its output
+can't be delivered. Wait time, poll count, timeouts and token usage are recorded
+through Utils.metrics.
+"""
+
+import time
+
+from Utils.metrics import record_metric
+
+ACTIVE_STATUSES = ("queued", "in_progress", "cancelling", "requires_action")
+
+# Per-operation deadlines in seconds
+RUN_DEADLINES = {
+    "chat": 120,
+    "extraction": 180,
+    "proposal": 600,
+}
+DEFAULT_DEADLINE = 300
+
+INITIAL_POLL_INTERVAL = 0.25
+MAX_POLL_INTERVAL = 5.0
+POLL_BACKOFF = 1.5
+
+
+class RunTimeout(Exception):
+    """Raised when a run misses its deadline (cancelled unless the waiter doesn't own it)"""
+
+    def __init__(self, operation, run_id, elapsed, cancelled=True):
+        super().__init__(f"{operation} run {run_id} timed out after {elapsed:.0f}s"
+                         + (" and was cancelled" if cancelled else ""))
+        self.operation = operation
+        self.run_id = run_id
+        self.elapsed = elapsed
+        self.cancelled = cancelled
+
+
+def poll_interval(poll_count):
+    """Delay before the next poll: fast early polls, slower later"""
+    return min(MAX_POLL_INTERVAL, INITIAL_POLL_INTERVAL * (POLL_BACKOFF ** poll_count))
+
+
+def run_deadline(operation):
+    """Deadline in seconds for an operation"""
+    return RUN_DEADLINES.get(operation, DEFAULT_DEADLINE)
+
+
+def record_run_usage(operation, run):
+    """Record a finished run's prompt and completion tokens"""
+    usage = getattr(run, "usage", None)
+    if usage is None:
+        return
+    record_metric(f"run.{operation}.prompt_tokens", usage.prompt_tokens)
+    record_metric(f"run.{operation}.completion_tokens", usage.completion_tokens)
+
+
+def cancel_run(client, thread_id, run_id):
+    """Best-effort runs.cancel; returns True if the request was accepted"""
+    try:
+        client.beta.threads.runs.cancel(thread_id=thread_id, run_id=run_id)
+        return True
+    except Exception:
+        return False
+
+
+def wait_for_run(client, thread_id, run_id, operation="run", deadline_seconds=None, started_at=None, on_poll=None,
+                 budget_seconds=None, cancel_on_timeout=True):
+    """Poll a run until it leaves the active statuses and return it
+
+    started_at lets a wait that spans several Streamlit reruns keep one deadline;
+    budget_seconds bounds this call only, returning the still-active run once spent.
+    on_poll(run, elapsed) is called after every poll that finds the run still active.
+    Raises RunTimeout when the deadline passes, after cancelling the run unless
+    cancel_on_timeout is False (for waiters that don't own the run).
+    """
+    deadline_seconds = deadline_seconds or run_deadline(operation)
+    started_at = started_at or time.time()
+    call_started = time.time()
+    polls = 0
+    while True:
+        run = client.beta.threads.runs.retrieve(thread_id=thread_id, run_id=run_id)
+        polls += 1
+        elapsed = time.time() - started_at
+        if run.status not in ACTIVE_STATUSES:
+            record_metric(f"run.{operation}.wait_seconds", elapsed, status=run.status)
+            record_metric(f"run.{operation}.polls", polls)
+            record_run_usage(operation, run)
+            return run
+        if elapsed > deadline_seconds:
+            if cancel_on_timeout:
+                cancel_run(client, thread_id, run_id)
+            record_metric(f"run.{operation}.timeouts", 1)
+            raise RunTimeout(operation, run_id, elapsed, cancelled=cancel_on_timeout)
+        if budget_seconds is not None and time.time() - call_started >= budget_seconds:
+            return run
+        if on_poll:
+            on_poll(run, elapsed)
+        time.sleep(min(poll_interval(polls), max(0.0, deadline_seconds - elapsed) + 0.1))
+
+
+def stream_run_text(client, handler, operation="run", deadline_seconds=None, **stream_kwargs):
+    """Stream a run (client.beta.threads.runs.stream) and yield its text deltas
+
+    The deadline is checked on every streamed event. When it passes, or when the
+    consumer stops iterating early, the run is cancelled; timeouts raise RunTimeout.
+    The final run is available as handler.current_run afterwards.
+    """
+    deadline_seconds = deadline_seconds or run_deadline(operation)
+    started_at = time.time()
+    thread_id = stream_kwargs["thread_id"]
+    try:
+        with client.beta.threads.runs.stream(event_handler=handler, **stream_kwargs) as stream:
+            for event in stream:
+                elapsed = time.time() - started_at
+                if elapsed > deadline_seconds:
+                    record_metric(f"run.{operation}.timeouts", 1)
+                    raise RunTimeout(operation, handler.current_run.id if handler.current_run else None, elapsed)
+                if event.event == "thread.message.delta":
+                    for block in event.data.delta.content or []:
+                        if block.type == "text" and block.text and block.text.value:
+                            yield block.text.value
+        record_run_usage(operation, handler.current_run)
+    except BaseException as e:
+        if handler.current_run is not None and handler.current_run.status in ACTIVE_STATUSES:
+            cancel_run(client, thread_id, handler.current_run.id)
+            if not isinstance(e, RunTimeout):
+                record_metric(f"run.{operation}.abandoned", 1)
+        raise
+
+
+def stream_run(client, handler, operation="run", deadline_seconds=None, **stream_kwargs):
+    """Stream a run to completion with the same deadline/cancellation; returns the final run"""
+    for _ in stream_run_text(client, handler, operation, deadline_seconds, **stream_kwargs):
+        pass
+    return handler.current_run
@@ -0,0 +1,64 @@
+"""
+Local cache of a project's parsed workbook sheets.
+
+Home parses every sheet into a DataFrame before processing; saving them per project
+(pickled under DATA_DIR/sheets, plus an in-process copy) lets the query router and
+the SQL engine answer questions from the data without re-reading the xlsx or
+calling the assistant.
+"""
+
+import hashlib
+import os
+import shutil
+import threading
+
+import pandas as pd
+
+from Utils.db import DATA_DIR
+from Utils.projects import slugify
+
+SHEET_DIR = os.path.join(DATA_DIR, "sheets")
+
+_lock = threading.Lock()
+_loaded = {}
+
+
+def _project_dir(project_key):
+    # Different project keys can slugify alike ("acme-tower/x" and "acme/tower-x"), so the raw key's hash keeps them apart
+    digest = hashlib.sha256(str(project_key).encode("utf-8")).hexdigest()[:10]
+    return os.path.join(SHEET_DIR, f"{slugify(project_key) or 'project'}-{digest}")
+
+
+def save_sheets(project_key, sheet_data):
+    """Replace a project's cached sheets with {sheet_name: DataFrame}"""
+    if not project_key:
+        return
+    directory = _project_dir(project_key)
+    with _lock:
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory, exist_ok=True)
+        for position, (sheet_name, df) in enumerate(sheet_data.items()):
+            df.to_pickle(os.path.join(directory, f"{position:03d}_{slugify(sheet_name) or 'sheet'}.pkl"))
+        with open(os.path.join(directory, "names.txt"), "w", encoding="utf-8") as f:
+            f.write("\n".join(sheet_data))
+        _loaded[project_key] = dict(sheet_data)
+
+
+def load_sheets(project_key):
+    """{sheet_name: DataFrame} for a project, or {} if nothing is cached"""
+    if not project_key:
+        return {}
+    with _lock:
+        if project_key not in _loaded:
+            directory = _project_dir(project_key)
+            names_path = os.path.join(directory, "names.txt")
+            if not os.path.exists(names_path):
+                return {}
+            with open(names_path, encoding="utf-8") as f:
+                names = f.read().split("\n")
+            files = sorted(name for name in os.listdir(directory) if name.endswith(".pkl"))
+            _loaded[project_key] = {
+                sheet_name: pd.read_pickle(os.path.join(directory, filename))
+                for sheet_name, filename in zip(names, files)
+            }
+        return _loaded[project_key]
@@ -0,0 +1,196 @@
+"""
+Embedded DuckDB SQL engine over a project's cached sheets.
+
+Each project's sheets (Utils.sheet_cache) are loaded as tables into an in-memory
+DuckDB database, one table per sheet with identifier-safe table and column names.
+Questions are turned into a single read-only SELECT by a small chat model that only
+sees the schema, and the SQL runs locally, so joins and group-bys across sheets
+finish in milliseconds instead of a code interpreter run re-reading the xlsx.
+Queries are checked with DuckDB's parser (exactly one SELECT) and run on their own
+cursor inside a transaction that is always rolled back, and external file access is
+disabled once a database's tables are loaded, so the shared tables stay intact.
+
+DuckDB is optional: without it SQL_ENGINE_AVAILABLE is False and the pages hide
+the SQL explorer.
+"""
+
+import re
+import threading
+import time
+
+try:
+    import duckdb
+    SQL_ENGINE_AVAILABLE = True
+except ImportError:
+    duckdb = None
+    SQL_ENGINE_AVAILABLE = False
+
+from Utils.metrics import record_metric
+from Utils.sheet_cache import load_sheets
+
+SQL_MODEL = "gpt-4o-mini"
+MAX_RESULT_ROWS = 5000
+MAX_CHART_ROWS = 50
+
+SQL_FENCE = re.compile(r"```(?:sql)?\s*(.*?)```", re.S | re.I)
+
+_lock = threading.Lock()
+_databases = {}
+
+
+class QueryRejected(ValueError):
+    """Raised for SQL that is not a single read-only SELECT"""
+
+
+def identifier(name, taken=()):
+    """Lowercase snake_case SQL identifier for a sheet or column name, unique among taken"""
+    base = re.sub(r"[^a-z0-9]+", "_", str(name).strip().lower()).strip("_") or "col"
+    if base[0].isdigit():
+        base = f"t_{base}"
+    candidate, suffix = base, 2
+    while candidate in taken:
+        candidate, suffix = f"{base}_{suffix}", suffix + 1
+    return candidate
+
+
+def _build_database(sheet_data):
+    conn = duckdb.connect(database=":memory:")
+    tables = {}
+    for sheet_name, df in sheet_data.items():
+        table = identifier(sheet_name, tables.values())
+        columns = []
+        for column in df.columns:
+            columns.append(identifier(column, columns))
+        frame = df.dropna(how="all").set_axis(columns, axis=1)
+        conn.register("incoming_sheet", frame)
+        conn.execute(f'CREATE TABLE "{table}" AS SELECT * FROM incoming_sheet')
+        conn.unregister("incoming_sheet")
+        tables[sheet_name] = table
+    conn.execute("SET enable_external_access = false")
+    return {"conn": conn, "tables": tables, "sheets": sheet_data}
+
+
+def _database(project_key):
+    sheet_data = load_sheets(project_key)
+    if not sheet_data:
+        return None
+    with _lock:
+        database = _databases.get(project_key)
+        # save_sheets replaces the cached dict, so a new identity means the workbook changed
+        if database is None or database["sheets"] is not sheet_data:
+            if database is not None:
+                database["conn"].close()
+            database = _databases[project_key] = _build_database(sheet_data)
+        return database
+
+
+def project_schema(project_key, sheet_info=None):
+    """Text description of a project's tables and columns for prompts and display"""
+    if not SQL_ENGINE_AVAILABLE:
+        return ""
+    database = _database(project_key)
+    if database is None:
+        return ""
+    lines = []
+    cursor = database["conn"].cursor()
+    try:
+        for sheet_name, table in database["tables"].items():
+            meaning = (sheet_info or {}).get(sheet_name, {}).get("meaning")
+            row_count = cursor.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+            columns = cursor.execute(
+                "SELECT column_name, data_type FROM information_schema.columns WHERE table_name = ? ORDER BY ordinal_position",
+                [table]
+            ).fetchall()
+            lines.append(f"TABLE {table} -- sheet '{sheet_name}'{f' ({meaning})' if meaning else ''}, {row_count} rows")
+            lines += [f"  {column} {data_type}" for column, data_type in columns]
+    finally:
+        cursor.close()
+    return "\n".join(lines)
+
+
+def check_sql(sql):
+    """The single SELECT statement in sql, or QueryRejected
+
+    Uses DuckDB's own parser, so "WITH ... DELETE" is seen as a DELETE and
+    semicolons inside literals or comments don't count as statement breaks.
+    """
+    if not SQL_ENGINE_AVAILABLE:
+        raise RuntimeError("DuckDB is not installed")
+    if not (sql or "").strip():
+        raise QueryRejected("Empty query")
+    try:
+        statements = duckdb.extract_statements(sql)
+    except duckdb.Error as e:
+        raise QueryRejected(f"Invalid SQL: {e}")
+    if len(statements) != 1:
+        raise QueryRejected("Only a single statement is allowed")
+    if statements[0].type != duckdb.StatementType.SELECT:
+        raise QueryRejected("Only SELECT queries are allowed")
+    return statements[0].query.strip()
+
+
+def run_sql(project_key, sql):
+    """Run a read-only query against a project's sheets; returns a DataFrame (at most MAX_RESULT_ROWS rows)"""
+    if not SQL_ENGINE_AVAILABLE:
+        raise RuntimeError("DuckDB is not installed")
+    statement = check_sql(sql)
+    database = _database(project_key)
+    if database is None:
+        raise RuntimeError("No cached sheets for this project - process the workbook on the Home page first")
+    started = time.time()
+    # Own cursor per query, inside a transaction that is always rolled back: even a statement
+    # that slipped past check_sql cannot change the tables every session shares
+    cursor = database["conn"].cursor()
+    try:
+        cursor.execute("BEGIN TRANSACTION")
+        relation = cursor.sql(statement)
+        if relation is None:
+            raise QueryRejected("Only SELECT queries are allowed")
+        result = relation.limit(MAX_RESULT_ROWS).df()
+    finally:
+        try:
+            cursor.execute("ROLLBACK")
+        finally:
+            cursor.close()
+    record_metric("sql.query_seconds", time.time() - started, rows=str(len(result)))
+    return result
+
+
+def generate_sql(client, question, project_key, sheet_info=None):
+    """Ask a small model for one DuckDB SELECT answering a question over the project's tables"""
+    schema = project_schema(project_key, sheet_info)
+    if not schema:
+        raise RuntimeError("No cached sheets for this project - process the workbook on the Home page first")
+    response = client.chat.completions.create(
+        model=SQL_MODEL,
+        messages=[
+            {"role": "system", "content": "You write DuckDB SQL over electrical estimate (AccuBid) sheets. Reply with "
+                                          "exactly one SELECT statement in a ```sql block and nothing else. Use only "
+                                          "the tables and columns listed. Exclude subtotal/total rows when aggregating "
+                                          "if a description column marks them. Label computed columns clearly.\n\n"
+                                          f"SCHEMA:\n{schema}"},
+            {"role": "user", "content": question},
+        ],
+        max_tokens=800,
+        temperature=0,
+    )
+    reply = response.choices[0].message.content or ""
+    fenced = SQL_FENCE.search(reply)
+    return check_sql(fenced.group(1) if fenced else reply)
+
+
+def answer_with_sql(client, question, project_key, sheet_info=None):
+    """Generate and run SQL for a question; returns {"sql", "result"}"""
+    sql = generate_sql(client, question, project_key, sheet_info)
+    return {"sql": sql, "result": run_sql(project_key, sql)}
+
+
+def chart_columns(result):
+    """(label column, numeric columns) when a result is worth charting as bars, else None"""
+    if result is None or not 1 < len(result) <= MAX_CHART_ROWS:
+        return None
+    numeric = list(result.select_dtypes("number").columns)
+    labels = [column for column in result.columns if column not in numeric]
+    if not numeric or len(labels) != 1:
+        return None
+    return labels[0], numeric
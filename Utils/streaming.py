@@ -0,0 +1,92 @@
+"""
+Event handler for streamed assistant runs.
+
+RunStreamHandler collects what a streamed run produces - text (with file_path
+annotations), code interpreter input/log output and generated images - and calls
+on_update(handler) after every change so a page can re-render placeholders as
+tokens arrive. It records only two timings per run: time to first token and total
+run time.
+"""
+
+import time
+
+from openai import AssistantEventHandler
+
+from Utils.metrics import record_metric
+
+
+class RunStreamHandler(AssistantEventHandler):
+    """Accumulates a streamed run's output and reports progress through on_update"""
+
+    def __init__(self, on_update=None, metric_prefix="assistant"):
+        super().__init__()
+        self.on_update = on_update
+        self.metric_prefix = metric_prefix
+        self.text = ""
+        self.code = ""
+        self.code_output = ""
+        self.images = []
+        self.files = []
+        self.run_id = None
+        self.started_at = time.time()
+        self.first_token_at = None
+
+    def _changed(self):
+        if self.on_update:
+            self.on_update(self)
+
+    def _first_token(self):
+        if self.first_token_at is None:
+            self.first_token_at = time.time()
+            record_metric(f"{self.metric_prefix}.first_token_seconds", self.first_token_at - self.started_at)
+
+    def on_run_step_created(self, run_step):
+        self.run_id = run_step.run_id
+
+    def on_text_created(self, text):
+        if self.text:
+            self.text += "\n\n"
+
+    def on_text_delta(self, delta, snapshot):
+        self._first_token()
+        self.text += delta.value or ""
+        self._changed()
+
+    def on_text_done(self, text):
+        for annotation in text.annotations or []:
+            file_path = getattr(annotation, "file_path", None)
+            if file_path and all(item["file_id"] != file_path.file_id for item in self.files):
+                self.files.append({
+                    "file_id": file_path.file_id,
+                    "filename": f"generated_file_{file_path.file_id}.csv"  # Default name, will be updated
+                })
+        self._changed()
+
+    def on_image_file_done(self, image_file):
+        self._first_token()
+        self.images.append(image_file.file_id)
+        self.text += f"\n[Generated Image: file-{image_file.file_id}]\n"
+        self._changed()
+
+    def on_tool_call_delta(self, delta, snapshot):
+        if delta.type != "code_interpreter" or not delta.code_interpreter:
+            return
+        self._first_token()
+        if delta.code_interpreter.input:
+            self.code += delta.code_interpreter.input
+        for output in delta.code_interpreter.outputs or []:
+            if output.type == "logs" and output.logs:
+                self.code_output += output.logs
+        self._changed()
+
+    def on_end(self):
+        record_metric(f"{self.metric_prefix}.total_seconds", time.time() - self.started_at)
+
+    def message_data(self):
+        """Chat history entry in the shape the pages store"""
+        return {
+            "role": "assistant",
+            "content": self.text.strip(),
+            "images": self.images or None,
+            "files": self.files or None,
+        }
@@ -0,0 +1,142 @@
+"""
+Durable catalog of Chat page conversation threads.
+
+One indexed SQLite row per thread (id, name, project, created/last-active times,
+message count) replaces the per-session threads dict, so the thread list survives
+refreshes and restarts. The sidebar reads it a page at a time with optional search
+by name or project; deletes remove the remote threads in concurrent batches through
+the resource registry, and threads the registry's reaper deleted after idling are
+dropped by forget_deleted_threads().
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from Utils.db import connect, ensure_schema
+from Utils.message_mirror import forget_thread
+from Utils.knowledge_extraction import forget_watermark
+from Utils.resource_registry import delete_resource, SCHEMA as REGISTRY_SCHEMA
+
+THREAD_PAGE_SIZE = 20
+DELETE_WORKERS = 4
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chat_threads (
+    thread_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    project_key TEXT,
+    created_at REAL NOT NULL,
+    last_active_at REAL NOT NULL,
+    message_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_chat_threads_active ON chat_threads (last_active_at);
+CREATE INDEX IF NOT EXISTS idx_chat_threads_project ON chat_threads (project_key, last_active_at);
+CREATE INDEX IF NOT EXISTS idx_chat_threads_name ON chat_threads (name COLLATE NOCASE);
+"""
+
+
+def add_thread(thread_id, name, project_key=None):
+    """Catalog a newly created thread"""
+    ensure_schema("thread_catalog", SCHEMA)
+    now = time.time()
+    with connect() as conn:
+        conn.execute(
+            """INSERT OR IGNORE INTO chat_threads (thread_id, name, project_key, created_at, last_active_at)
+               VALUES (?, ?, ?, ?, ?)""",
+            (thread_id, name, project_key, now, now)
+        )
+
+
+def get_thread(thread_id):
+    """Catalog row for a thread as a dict, or None"""
+    if not thread_id:
+        return None
+    ensure_schema("thread_catalog", SCHEMA)
+    with connect() as conn:
+        row = conn.execute("SELECT * FROM chat_threads WHERE thread_id = ?", (thread_id,)).fetchone()
+    return dict(row) if row else None
+
+
+def record_activity(thread_id, messages_added=0):
+    """Bump a thread's last-active time and message count"""
+    ensure_schema("thread_catalog", SCHEMA)
+    with connect() as conn:
+        conn.execute(
+            "UPDATE chat_threads SET last_active_at = ?, message_count = message_count + ? WHERE thread_id = ?",
+            (time.time(), messages_added, thread_id)
+        )
+
+
+def _filter(search, project_key=None):
+    conditions, params = [], []
+    if search:
+        pattern = f"%{search.strip()}%"
+        conditions.append("(name LIKE ? OR project_key LIKE ?)")
+        params += [pattern, pattern]
+    if project_key:
+        conditions.append("project_key = ?")
+        params.append(project_key)
+    return (f"WHERE {' AND '.join(conditions)}" if conditions else ""), tuple(params)
+
+
+def list_threads(search=None, offset=0, limit=THREAD_PAGE_SIZE, project_key=None):
+    """One page of threads, most recently active first, optionally searched by name or project or limited to one project"""
+    ensure_schema("thread_catalog", SCHEMA)
+    where, params = _filter(search, project_key)
+    with connect() as conn:
+        rows = conn.execute(
+            f"SELECT * FROM chat_threads {where} ORDER BY last_active_at DESC LIMIT ? OFFSET ?",
+            (*params, limit, offset)
+        ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def count_threads(search=None):
+    """Number of threads matching a search"""
+    ensure_schema("thread_catalog", SCHEMA)
+    where, params = _filter(search)
+    with connect() as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM chat_threads {where}", params).fetchone()[0]
+
+
+def delete_remote_threads(client, thread_ids):
+    """Delete threads remotely in a concurrent batch and drop them from the catalog and mirror
+
+    Returns {thread_id: error message} for threads whose remote delete failed; those
+    stay in the catalog so the delete can be retried.
+    """
+    ensure_schema("thread_catalog", SCHEMA)
+    thread_ids = list(thread_ids)
+    if not thread_ids:
+        return {}
+    failures = {}
+    with ThreadPoolExecutor(max_workers=min(DELETE_WORKERS, len(thread_ids)), thread_name_prefix="ddmac-delete") as executor:
+        futures = {thread_id: executor.submit(delete_resource, client, thread_id, "thread") for thread_id in thread_ids}
+    for thread_id, future in futures.items():
+        try:
+            future.result()
+        except Exception as e:
+            failures[thread_id] = str(e)
+    deleted = [thread_id for thread_id in thread_ids if thread_id not in failures]
+    with connect() as conn:
+        conn.executemany("DELETE FROM chat_threads WHERE thread_id = ?", [(thread_id,) for thread_id in deleted])
+    for thread_id in deleted:
+        forget_thread(thread_id)
+        forget_watermark(thread_id)
+    return failures
+
+
+def forget_deleted_threads():
+    """Drop catalogued threads the resource registry has deleted (e.g. reaped when idle); returns their ids"""
+    ensure_schema("thread_catalog", SCHEMA)
+    ensure_schema("resource_registry", REGISTRY_SCHEMA)
+    with connect() as conn:
+        thread_ids = [row["thread_id"] for row in conn.execute(
+            """SELECT thread_id FROM chat_threads WHERE thread_id IN
+               (SELECT resource_id FROM openai_resources WHERE deleted_at IS NOT NULL)"""
+        )]
+        conn.executemany("DELETE FROM chat_threads WHERE thread_id = ?", [(thread_id,) for thread_id in thread_ids])
+    for thread_id in thread_ids:
+        forget_thread(thread_id)
+        forget_watermark(thread_id)
+    return thread_ids
@@ -0,0 +1,44 @@
+"""
+In-memory request bodies for OpenAI file uploads.
+
+The SDK accepts (filename, content) tuples, so uploads can go straight from memory
+without a tempfile round-trip. Bodies larger than SPOOL_THRESHOLD_BYTES (or built
+from a generator of chunks that grows past it) spill into a private, uniquely
+named spool file that is removed as soon as the upload finishes.
+"""
+
+import tempfile
+from contextlib import contextmanager
+
+SPOOL_THRESHOLD_BYTES = 16 * 1024 * 1024
+
+
+def _to_bytes(chunk):
+    return chunk.encode("utf-8") if isinstance(chunk, str) else bytes(chunk)
+
+
+@contextmanager
+def upload_body(filename, content):
+    """Yield a (filename, body) tuple for files.create / upload_and_poll
+
+    content may be str, bytes, or an iterable of str/bytes chunks.
+    """
+    if isinstance(content, (str, bytes, bytearray, memoryview)):
+        data = _to_bytes(content)
+        if len(data) <= SPOOL_THRESHOLD_BYTES:
+            yield (filename, data)
+            return
+        chunks = [data]
+    else:
+        chunks = content
+
+    # SpooledTemporaryFile stays in memory until the threshold, then rolls over to an
+    # anonymous per-request temp file; closing it always removes the disk copy
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_THRESHOLD_BYTES, prefix="ddmac-upload-")
+    try:
+        for chunk in chunks:
+            spool.write(_to_bytes(chunk))
+        spool.seek(0)
+        yield (filename, spool)
+    finally:
+        spool.close()
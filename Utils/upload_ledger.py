@@ -0,0 +1,72 @@
+"""
+Content-hash ledger of everything uploaded to OpenAI.
+
+Before any upload, callers hash the content and look it up for the upload target
+('files' for plain assistant file uploads, or a vector store id). A hit returns the
+existing OpenAI file id so the upload becomes a no-op.
+"""
+
+import hashlib
+import time
+
+from Utils.db import connect, ensure_schema
+
+FILES_TARGET = "files"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS upload_ledger (
+    content_hash TEXT NOT NULL,
+    target TEXT NOT NULL,
+    file_id TEXT NOT NULL,
+    vector_store_file_id TEXT,
+    filename TEXT,
+    size_bytes INTEGER,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (content_hash, target)
+);
+CREATE INDEX IF NOT EXISTS idx_upload_ledger_file_id ON upload_ledger (file_id);
+"""
+
+
+def content_hash(*parts):
+    """SHA-256 over one or more str/bytes parts"""
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode("utf-8")
+        digest.update(len(part).to_bytes(8, "big"))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+def find_upload(digest, target=FILES_TARGET):
+    """Return the ledger entry for this content and target, or None"""
+    ensure_schema("upload_ledger", SCHEMA)
+    with connect() as conn:
+        row = conn.execute(
+            "SELECT * FROM upload_ledger WHERE content_hash = ? AND target = ?",
+            (digest, target)
+        ).fetchone()
+    return dict(row) if row else None
+
+
+def record_upload(digest, file_id, filename, size_bytes, target=FILES_TARGET, vector_store_file_id=None):
+    """Remember that this content now exists remotely under file_id"""
+    ensure_schema("upload_ledger", SCHEMA)
+    with connect() as conn:
+        conn.execute(
+            """INSERT OR REPLACE INTO upload_ledger
+               (content_hash, target, file_id, vector_store_file_id, filename, size_bytes, created_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            (digest, target, file_id, vector_store_file_id, filename, size_bytes, time.time())
+        )
+
+
+def forget_file(file_id, target=None):
+    """Drop ledger entries for a remote file that was deleted (optionally for one target only)"""
+    ensure_schema("upload_ledger", SCHEMA)
+    with connect() as conn:
+        if target is None:
+            conn.execute("DELETE FROM upload_ledger WHERE file_id = ?", (file_id,))
+        else:
+            conn.execute("DELETE FROM upload_ledger WHERE file_id = ? AND target = ?", (file_id, target))
@@ -0,0 +1,133 @@
+"""
+Resumable upload pipeline for vector store ingestion.
+
+Each upload is split into steps (upload file -> attach to store -> wait for indexing)
+and every finished step is checkpointed in SQLite under a pipeline id. Transient
+failures (429, timeouts, connection errors, 5xx) are retried with jittered
+exponential backoff; if a pipeline still fails, running it again with the same id
+resumes from the last good step instead of starting over.
+"""
+
+import json
+import random
+import time
+
+from openai import APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+
+from Utils.db import connect, ensure_schema
+from Utils.jobs import report_progress
+from Utils.upload_bodies import upload_body
+
+RETRYABLE_ERRORS = (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError)
+
+MAX_ATTEMPTS = 5
+BASE_DELAY_SECONDS = 1.0
+MAX_DELAY_SECONDS = 30.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS upload_checkpoints (
+    pipeline_id TEXT NOT NULL,
+    item_key TEXT NOT NULL,
+    step TEXT NOT NULL,
+    result TEXT,
+    completed_at REAL NOT NULL,
+    PRIMARY KEY (pipeline_id, item_key, step)
+);
+"""
+
+
+def backoff_delay(attempt, base_delay=BASE_DELAY_SECONDS, max_delay=MAX_DELAY_SECONDS):
+    """Full-jitter exponential backoff delay for a 0-based attempt number"""
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+
+def with_retries(fn, *args, attempts=MAX_ATTEMPTS, description=None, **kwargs):
+    """Call fn, retrying transient OpenAI errors with jittered exponential backoff"""
+    for attempt in range(attempts):
+        try:
+            return fn(*args, **kwargs)
+        except RETRYABLE_ERRORS as e:
+            if attempt == attempts - 1:
+                raise
+            delay = backoff_delay(attempt)
+            report_progress(f"{description or 'Request'} failed ({type(e).__name__}), retrying in {delay:.1f}s "
+                            f"(attempt {attempt + 2}/{attempts})...")
+            time.sleep(delay)
+
+
+def get_checkpoint(pipeline_id, item_key, step):
+    """Stored result of a finished step, or None if the step has not completed"""
+    ensure_schema("upload_pipeline", SCHEMA)
+    with connect() as conn:
+        row = conn.execute(
+            "SELECT result FROM upload_checkpoints WHERE pipeline_id = ? AND item_key = ? AND step = ?",
+            (pipeline_id, item_key, step)
+        ).fetchone()
+    return json.loads(row["result"]) if row else None
+
+
+def save_checkpoint(pipeline_id, item_key, step, result):
+    """Record that a step finished with a JSON-serializable result"""
+    ensure_schema("upload_pipeline", SCHEMA)
+    with connect() as conn:
+        conn.execute(
+            """INSERT OR REPLACE INTO upload_checkpoints (pipeline_id, item_key, step, result, completed_at)
+               VALUES (?, ?, ?, ?, ?)""",
+            (pipeline_id, item_key, step, json.dumps(result), time.time())
+        )
+
+
+def clear_checkpoints(pipeline_id, item_key=None, step=None):
+    """Forget checkpoints of a pipeline (or of one item / step)"""
+    ensure_schema("upload_pipeline", SCHEMA)
+    with connect() as conn:
+        conn.execute(
+            """DELETE FROM upload_checkpoints WHERE pipeline_id = ?
+               AND (? IS NULL OR item_key = ?) AND (? IS NULL OR step = ?)""",
+            (pipeline_id, item_key, item_key, step, step)
+        )
+
+
+def checkpointed(pipeline_id, item_key, step, fn, *args, **kwargs):
+    """Run a step with retries unless a checkpoint says it already finished"""
+    done = get_checkpoint(pipeline_id, item_key, step)
+    if done is not None:
+        return done
+    result = with_retries(fn, *args, description=f"{step} {item_key}", **kwargs)
+    save_checkpoint(pipeline_id, item_key, step, result)
+    return result
+
+
+def run_upload_pipeline(client, pipeline_id, vector_store_id, items):
+    """Upload a batch of (filename, content, attributes) items into a vector store, resumably
+
+    Returns {filename: (file_id, status)}; status is the vector store file status.
+    """
+    results = {}
+    for index, (filename, content, attributes) in enumerate(items, start=1):
+        report_progress(f"Uploading {filename} ({index}/{len(items)})...")
+
+        def upload_file():
+            with upload_body(filename, content) as body:
+                return client.files.create(file=body, purpose='assistants').id
+
+        file_id = checkpointed(pipeline_id, filename, "upload_file", upload_file)
+
+        report_progress(f"Attaching {filename} to vector store ({index}/{len(items)})...")
+        checkpointed(
+            pipeline_id, filename, "attach",
+            lambda: client.vector_stores.files.create(
+                vector_store_id=vector_store_id, file_id=file_id, attributes=attributes or {}
+            ).id
+        )
+
+        report_progress(f"Indexing {filename} ({index}/{len(items)})...")
+        vector_store_file = with_retries(
+            client.vector_stores.files.poll, file_id, vector_store_id=vector_store_id,
+            description=f"indexing {filename}"
+        )
+        if vector_store_file.status == "failed":
+            # Indexing failures are not transient for the attached copy; re-attach on the next run
+            clear_checkpoints(pipeline_id, filename, "attach")
+        results[filename] = (file_id, vector_store_file.status)
+    return results
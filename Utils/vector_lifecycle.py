@@ -0,0 +1,262 @@
+"""
+Vector store lifecycle: which files belong to which project, when they were last
+used, and which of them retention policy says can go.
+
+Every file added to a vector store is registered here with a kind and an optional
+revision key. Registering a new file under an existing revision key supersedes the
+older ones. Compaction jobs then delete superseded revisions after a grace period
+and everything belonging to projects nobody has touched for a while.
+"""
+
+import time
+
+from openai import NotFoundError
+
+from Utils.db import connect, ensure_schema
+from Utils.jobs import submit_job, report_progress
+from Utils.upload_ledger import forget_file
+from Utils.vector_routing import drop_project_store
+
+DAY_SECONDS = 24 * 60 * 60
+
+# Retention policy (days). Definitions are shared knowledge and never expire by age.
+RETENTION_POLICY = {
+    "superseded_grace_days": 1,
+    "abandoned_project_days": 60,
+    "document_idle_days": 120,
+}
+EXPIRING_KINDS = ("project_data", "document")
+
+# Run the automatic compaction at most this often per server process
+COMPACTION_INTERVAL_SECONDS = 6 * 60 * 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS vector_store_files (
+    file_id TEXT NOT NULL,
+    vector_store_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    project_key TEXT,
+    revision_key TEXT,
+    filename TEXT,
+    created_at REAL NOT NULL,
+    last_used_at REAL NOT NULL,
+    superseded_at REAL,
+    deleted_at REAL,
+    PRIMARY KEY (file_id, vector_store_id)
+);
+CREATE INDEX IF NOT EXISTS idx_vector_store_files_project ON vector_store_files (project_key);
+CREATE INDEX IF NOT EXISTS idx_vector_store_files_revision ON vector_store_files (vector_store_id, revision_key);
+"""
+
+_last_compaction = {"started_at": 0.0, "job_id": None}
+
+
+def register_file(vector_store_id, file_id, kind, project_key=None, revision_key=None, filename=None):
+    """Track a file added to a vector store, superseding older files with the same revision key"""
+    ensure_schema("vector_lifecycle", SCHEMA)
+    now = time.time()
+    with connect() as conn:
+        if revision_key:
+            conn.execute(
+                """UPDATE vector_store_files SET superseded_at = ?
+                   WHERE vector_store_id = ? AND revision_key = ? AND file_id != ?
+                   AND superseded_at IS NULL AND deleted_at IS NULL""",
+                (now, vector_store_id, revision_key, file_id)
+            )
+        conn.execute(
+            """INSERT INTO vector_store_files
+               (file_id, vector_store_id, kind, project_key, revision_key, filename, created_at, last_used_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT (file_id, vector_store_id) DO UPDATE SET
+                   last_used_at = excluded.last_used_at, superseded_at = NULL, deleted_at = NULL""",
+            (file_id, vector_store_id, kind, project_key, revision_key, filename, now, now)
+        )
+
+
+def touch_project(project_key):
+    """Mark all live files of a project as just used"""
+    if not project_key:
+        return
+    ensure_schema("vector_lifecycle", SCHEMA)
+    with connect() as conn:
+        conn.execute(
+            "UPDATE vector_store_files SET last_used_at = ? WHERE project_key = ? AND deleted_at IS NULL",
+            (time.time(), project_key)
+        )
+
+
+def touch_file(file_id):
+    """Mark a single file as just used (e.g. a duplicate upload that was skipped)"""
+    ensure_schema("vector_lifecycle", SCHEMA)
+    with connect() as conn:
+        conn.execute(
+            "UPDATE vector_store_files SET last_used_at = ? WHERE file_id = ? AND deleted_at IS NULL",
+            (time.time(), file_id)
+        )
+
+
+def expired_files(vector_store_id=None, policy=None, now=None):
+    """Return the live file records that retention policy says should be removed"""
+    ensure_schema("vector_lifecycle", SCHEMA)
+    policy = {**RETENTION_POLICY, **(policy or {})}
+    now = now or time.time()
+    superseded_before = now - policy["superseded_grace_days"] * DAY_SECONDS
+    idle_before = now - policy["document_idle_days"] * DAY_SECONDS
+    abandoned_before = now - policy["abandoned_project_days"] * DAY_SECONDS
+    kinds = ",".join("?" for _ in EXPIRING_KINDS)
+
+    with connect() as conn:
+        # A project is abandoned when none of its files was used recently
+        abandoned = {
+            row["project_key"] for row in conn.execute(
+                """SELECT project_key FROM vector_store_files
+                   WHERE project_key IS NOT NULL AND deleted_at IS NULL
+                   GROUP BY project_key HAVING MAX(last_used_at) < ?""",
+                (abandoned_before,)
+            )
+        }
+        rows = conn.execute(
+            f"""SELECT * FROM vector_store_files
+                WHERE deleted_at IS NULL AND (? IS NULL OR vector_store_id = ?)
+                AND (
+                    (superseded_at IS NOT NULL AND superseded_at < ?)
+                    OR (kind IN ({kinds}) AND project_key IS NULL AND last_used_at < ?)
+                    OR (kind IN ({kinds}) AND project_key IS NOT NULL)
+                )""",
+            (vector_store_id, vector_store_id, superseded_before, *EXPIRING_KINDS, idle_before, *EXPIRING_KINDS)
+        ).fetchall()
+
+    expired = []
+    for row in rows:
+        row = dict(row)
+        if row["superseded_at"] is not None and row["superseded_at"] < superseded_before:
+            row["reason"] = "superseded"
+        elif row["project_key"] is None:
+            row["reason"] = "idle"
+        elif row["project_key"] in abandoned:
+            row["reason"] = "abandoned project"
+        else:
+            continue
+        expired.append(row)
+    return expired
+
+
+def _mark_deleted(file_id, vector_store_id):
+    with connect() as conn:
+        conn.execute(
+            "UPDATE vector_store_files SET deleted_at = ? WHERE file_id = ? AND vector_store_id = ?",
+            (time.time(), file_id, vector_store_id)
+        )
+
+
+def _remove_file(client, vector_store_id, file_id):
+    """Delete a file from its vector store and from file storage, then record it as gone"""
+    try:
+        client.vector_stores.files.delete(vector_store_id=vector_store_id, file_id=file_id)
+    except NotFoundError:
+        pass
+    try:
+        client.files.delete(file_id)
+    except NotFoundError:
+        pass
+    _mark_deleted(file_id, vector_store_id)
+    forget_file(file_id)
+
+
+def live_files(vector_store_id, kind=None):
+    """Records of files still in a vector store (including superseded ones), optionally of one kind"""
+    ensure_schema("vector_lifecycle", SCHEMA)
+    with connect() as conn:
+        rows = conn.execute(
+            """SELECT * FROM vector_store_files
+               WHERE vector_store_id = ? AND deleted_at IS NULL AND (? IS NULL OR kind = ?)""",
+            (vector_store_id, kind, kind)
+        ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def retire_files(client, vector_store_id, file_ids):
+    """Delete files from a vector store right away, skipping the superseded grace period
+
+    Returns {file_id: error message} for deletes that failed; those are left to compaction.
+    """
+    ensure_schema("vector_lifecycle", SCHEMA)
+    file_ids = list(file_ids)
+    # Marked superseded first, so compaction retries whichever deletes fail here
+    with connect() as conn:
+        conn.executemany(
+            """UPDATE vector_store_files SET superseded_at = COALESCE(superseded_at, ?)
+               WHERE file_id = ? AND vector_store_id = ?""",
+            [(time.time(), file_id, vector_store_id) for file_id in file_ids]
+        )
+    failures = {}
+    for file_id in file_ids:
+        try:
+            _remove_file(client, vector_store_id, file_id)
+        except Exception as e:
+            failures[file_id] = str(e)
+    return failures
+
+
+def _live_file_count(project_key):
+    with connect() as conn:
+        row = conn.execute(
+            "SELECT COUNT(*) AS live FROM vector_store_files WHERE project_key = ? AND deleted_at IS NULL",
+            (project_key,)
+        ).fetchone()
+    return row["live"]
+
+
+def compact_vector_store(client, vector_store_id=None, policy=None):
+    """Delete expired files from their vector stores and from file storage"""
+    expired = expired_files(vector_store_id, policy)
+    removed = 0
+    errors = []
+    for index, record in enumerate(expired, start=1):
+        report_progress(f"Removing {record['filename'] or record['file_id']} ({index}/{len(expired)}, {record['reason']})")
+        try:
+            _remove_file(client, record["vector_store_id"], record["file_id"])
+            removed += 1
+        except Exception as e:
+            errors.append(f"{record['file_id']}: {str(e)}")
+
+    # Abandoned projects also lose their (now empty) per-project store
+    for key in {record["project_key"] for record in expired if record["reason"] == "abandoned project"}:
+        if not _live_file_count(key):
+            try:
+                drop_project_store(client, key)
+            except Exception as e:
+                errors.append(f"{key}: {str(e)}")
+
+    if errors:
+        return removed, f"Removed {removed} of {len(expired)} expired files; errors: {'; '.join(errors[:3])}"
+    return removed, f"Removed {removed} expired files"
+
+
+def schedule_compaction(client, vector_store_id=None, force=False):
+    """Start a background compaction job unless one ran recently; returns the job id or None"""
+    now = time.time()
+    if not force and now - _last_compaction["started_at"] < COMPACTION_INTERVAL_SECONDS:
+        return None
+    _last_compaction["started_at"] = now
+    _last_compaction["job_id"] = submit_job(
+        "vector_compaction", compact_vector_store, client, vector_store_id,
+        label="Vector store compaction"
+    )
+    return _last_compaction["job_id"]
+
+
+def lifecycle_summary(vector_store_id=None):
+    """Counts of live, superseded and deleted files per kind"""
+    ensure_schema("vector_lifecycle", SCHEMA)
+    with connect() as conn:
+        rows = conn.execute(
+            """SELECT kind,
+                      SUM(deleted_at IS NULL AND superseded_at IS NULL) AS live,
+                      SUM(deleted_at IS NULL AND superseded_at IS NOT NULL) AS superseded,
+                      SUM(deleted_at IS NOT NULL) AS deleted
+               FROM vector_store_files WHERE (? IS NULL OR vector_store_id = ?)
+               GROUP BY kind""",
+            (vector_store_id, vector_store_id)
+        ).fetchall()
+    return {row["kind"]: {"live": row["live"], "superseded": row["superseded"], "deleted": row["deleted"]} for row in rows}
@@ -0,0 +1,114 @@
+"""
+Per-project vector store routing.
+
+Each project gets its own vector store so file_search only ever looks at that
+project's data, no matter how many projects exist. The shared store passed in by
+the pages (VECTOR_STORE_ID) keeps tenant-wide knowledge such as extracted
+definitions. Every file is also tagged with project/company/kind attributes.
+"""
+
+import threading
+import time
+
+from openai import NotFoundError
+
+from Utils.db import connect, ensure_schema
+from Utils.projects import project_key, slugify
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS project_vector_stores (
+    project_key TEXT PRIMARY KEY,
+    company TEXT,
+    project_name TEXT,
+    vector_store_id TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_project_vector_stores_company ON project_vector_stores (company);
+"""
+
+_create_lock = threading.Lock()
+
+
+def project_store_id(key):
+    """Vector store id already routed to a project key, or None"""
+    if not key:
+        return None
+    ensure_schema("vector_routing", SCHEMA)
+    with connect() as conn:
+        row = conn.execute(
+            "SELECT vector_store_id FROM project_vector_stores WHERE project_key = ?", (key,)
+        ).fetchone()
+    return row["vector_store_id"] if row else None
+
+
+def get_project_vector_store(client, project_info, create=True):
+    """Return the project's own vector store id, creating the store on first use"""
+    key = project_key(project_info)
+    if not key:
+        return None
+    existing = project_store_id(key)
+    if existing or not create:
+        return existing
+
+    with _create_lock:
+        existing = project_store_id(key)
+        if existing:
+            return existing
+        company = project_info.get('company_name', '')
+        project_name = project_info.get('project_name', '')
+        vector_store = client.vector_stores.create(
+            name=f"DDMac - {company} - {project_name}"[:256],
+            metadata={"project": key[:512], "company": slugify(company)[:512]}
+        )
+        with connect() as conn:
+            conn.execute(
+                """INSERT INTO project_vector_stores (project_key, company, project_name, vector_store_id, created_at)
+                   VALUES (?, ?, ?, ?, ?)""",
+                (key, slugify(company), project_name, vector_store.id, time.time())
+            )
+        return vector_store.id
+
+
+def route_vector_store(client, project_info, shared_vector_store_id):
+    """Store to upload project material to: the project's own store, or the shared one without a project"""
+    return get_project_vector_store(client, project_info) or shared_vector_store_id
+
+
+def file_attributes(project_info, kind):
+    """Attributes attached to every vector store file so searches can be filtered by project"""
+    attributes = {"kind": kind}
+    key = project_key(project_info)
+    if key:
+        attributes["project"] = key
+        attributes["company"] = slugify(project_info.get('company_name'))
+    return attributes
+
+
+def file_search_resources(vector_store_id):
+    """tool_resources block that scopes file_search on a thread to one vector store"""
+    if not vector_store_id:
+        return {}
+    return {"file_search": {"vector_store_ids": [vector_store_id]}}
+
+
+def add_file_to_store(client, vector_store_id, file_id, attributes=None):
+    """Attach an uploaded file to a vector store with attributes and wait for indexing"""
+    return client.vector_stores.files.create_and_poll(
+        vector_store_id=vector_store_id,
+        file_id=file_id,
+        attributes=attributes or {}
+    )
+
+
+def drop_project_store(client, key):
+    """Delete a project's vector store and its routing entry"""
+    vector_store_id = project_store_id(key)
+    if not vector_store_id:
+        return False
+    try:
+        client.vector_stores.delete(vector_store_id)
+    except NotFoundError:
+        pass
+    with connect() as conn:
+        conn.execute("DELETE FROM project_vector_stores WHERE project_key = ?", (key,))
+    return True
@@ -21,10 +21,33 @@ when available (from Home.py processing), otherwise falls back to default assist
 
 import streamlit as st
 import os
+import uuid
 from datetime import datetime
 from openai import OpenAI
-import tempfile
 import pandas as pd
+from Utils.upload_ledger import content_hash, find_upload, record_upload
+from Utils.projects import project_key
+from Utils.vector_lifecycle import register_file, touch_file, touch_project, schedule_compaction, lifecycle_summary, live_files, retire_files
+from Utils.jobs import get_job, is_finished, job_duration
+from Utils.vector_routing import route_vector_store, get_project_vector_store, file_attributes, file_search_resources
+from Utils.upload_pipeline import run_upload_pipeline, clear_checkpoints
+from Utils.resource_registry import register_resource, touch_resource, schedule_reaper, registry_summary
+from Utils.streaming import RunStreamHandler
+from Utils.run_waiter import stream_run_text
+from Utils.run_scheduler import run_slot, post_exchange
+from Utils.context_policy import run_options, start_fresh_thread
+from Utils.answer_cache import lookup_answer, store_answer, data_version, bump_data_version
+from Utils.sheet_cache import load_sheets
+from Utils.query_router import route_question
+from Utils.sql_engine import answer_with_sql, chart_columns, SQL_ENGINE_AVAILABLE
+from Utils.message_mirror import sync_thread, mirrored_messages, format_transcript
+from Utils.thread_catalog import (add_thread, get_thread, record_activity, list_threads, count_threads, delete_remote_threads,
+                                  forget_deleted_threads, THREAD_PAGE_SIZE)
+from Utils.knowledge_extraction import (start_extraction, advance_watermarks, threads_needing_extraction, question_text,
+                                        MAX_THREADS_PER_JOB, QUESTION_PREFIX, INSTRUCTIONS_MARKER)
+from Utils.local_index import index_source, search as search_local_index, is_strong, format_context, source_texts, remove_sources, SHARED_SCOPE
+from Utils.glossary import (merge_definitions, legacy_definitions, next_glossary, record_published, published_glossary,
+                            glossary_terms, glossary_revision, glossary_source, LEGACY_PREFIX)
 
 # Set page configuration
 st.set_page_config(
@@ -34,8 +57,8 @@ st.set_page_config(
 )
 
 # Initialize session state
-if 'threads' not in st.session_state:
-    st.session_state.threads = {}
+if 'thread_page' not in st.session_state:
+    st.session_state.thread_page = 0
 if 'current_thread_id' not in st.session_state:
     st.session_state.current_thread_id = None
 if 'current_thread_name' not in st.session_state:
@@ -46,18 +69,26 @@ if 'extracted_definitions' not in st.session_state:
     st.session_state.extracted_definitions = None
 if 'show_knowledge_preview' not in st.session_state:
     st.session_state.show_knowledge_preview = False
-
-# Vector Store ID (same as Home.py)
+if 'extraction_job_id' not in st.session_state:
+    st.session_state.extraction_job_id = None
+if 'extraction_watermarks' not in st.session_state:
+    st.session_state.extraction_watermarks = None
+if 'extraction_label' not in st.session_state:
+    st.session_state.extraction_label = None
+if 'compaction_job_id' not in st.session_state:
+    st.session_state.compaction_job_id = None
+if 'job_session' not in st.session_state:
+    st.session_state.job_session = uuid.uuid4().hex
+if 'reaper_job_id' not in st.session_state:
+    st.session_state.reaper_job_id = None
+
+# Shared Vector Store ID (same as Home.py) for tenant-wide knowledge; project files are routed to per-project stores
 VECTOR_STORE_ID = 'vs_qUspcB7VllWXM4z7aAEdIK9L'
 
 # Assistant IDs
 MAIN_ASSISTANT_ID = "asst_Wk1Ue0iDYkhbdiXXDPPJsvAV"
 KNOWLEDGE_EXTRACTION_ASSISTANT_ID = "asst_eroB2BdDIRXlR7SikvVV7OgP"
 
-# Create upload directory
-UPLOAD_FOLDER = os.path.join(os.getcwd(), "temp")
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-
 def get_client():
     """Get or create OpenAI client"""
     if 'openai_client' not in st.session_state:
@@ -83,40 +114,64 @@ def create_thread(name=""):
         if not name or name.strip() == '':
             name = f"Thread {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
         
-        # Create thread using OpenAI API
-        thread = client.beta.threads.create()
+        # Create thread using OpenAI API; with an active project, file_search on this
+        # thread also covers that project's own vector store
+        project_info = st.session_state.get('project_info')
+        project_vector_store_id = get_project_vector_store(client, project_info, create=False)
+        thread = client.beta.threads.create(
+            tool_resources=file_search_resources(project_vector_store_id)
+        )
         
-        # Store thread info
-        st.session_state.threads[thread.id] = {
-            'thread': thread,
-            'name': name
-        }
+        register_resource(thread.id, "thread", "chat", project_key(project_info))
+        
+        # Store thread info in the durable catalog
+        add_thread(thread.id, name, project_key(project_info))
         
         return thread.id, name
     except Exception as e:
         st.error(f"Error creating thread: {str(e)}")
         return None, None
 
-def delete_thread(thread_id):
-    """Delete a thread"""
+def continue_in_fresh_thread(thread_id, name):
+    """Start a catalogued thread seeded with a summary of an existing one; returns (id, name)"""
     try:
-        if thread_id in st.session_state.threads:
-            del st.session_state.threads[thread_id]
-            if st.session_state.current_thread_id == thread_id:
-                st.session_state.current_thread_id = None
-                st.session_state.current_thread_name = None
-                st.session_state.messages = []
-            return True
-        return False
+        client = get_client()
+        if not client:
+            return None, None
+        catalog_entry = get_thread(thread_id) or {}
+        fresh_thread_id = start_fresh_thread(client, thread_id)
+        fresh_name = f"{name} (continued)"
+        register_resource(fresh_thread_id, "thread", "chat", catalog_entry.get('project_key'))
+        add_thread(fresh_thread_id, fresh_name, catalog_entry.get('project_key'))
+        return fresh_thread_id, fresh_name
+    except Exception as e:
+        st.error(f"Error starting a fresh thread: {str(e)}")
+        return None, None
+
+def delete_threads(thread_ids):
+    """Delete threads remotely (in one concurrent batch) and from the catalog; returns success"""
+    try:
+        client = get_client()
+        if not client:
+            return False
+        failures = delete_remote_threads(client, thread_ids)
+        if st.session_state.current_thread_id in thread_ids and st.session_state.current_thread_id not in failures:
+            st.session_state.current_thread_id = None
+            st.session_state.current_thread_name = None
+            st.session_state.messages = []
+        for thread_id, error in failures.items():
+            st.error(f"Could not delete thread {thread_id}: {error}")
+        return not failures
     except Exception as e:
         st.error(f"Error deleting thread: {str(e)}")
         return False
 
-def get_threads():
-    """Get list of all threads"""
+def get_threads(search=None):
+    """One sidebar page of catalogued threads (most recently active first)"""
     return [
-        {'id': thread_id, 'name': info['name']} 
-        for thread_id, info in st.session_state.threads.items()
+        {'id': thread['thread_id'], 'name': thread['name'], 'project_key': thread['project_key'],
+         'message_count': thread['message_count']}
+        for thread in list_threads(search, offset=st.session_state.thread_page * THREAD_PAGE_SIZE, limit=THREAD_PAGE_SIZE)
     ]
 
 def process_excel_to_markdown(uploaded_file):
@@ -266,6 +321,16 @@ def process_uploaded_file(uploaded_file):
         if not client:
             return False
         
+        # Streamlit reruns this on every interaction while the file sits in the uploader,
+        # so identical content already in the vector store is a no-op
+        project_info = st.session_state.get('project_info')
+        vector_store_id = route_vector_store(client, project_info, VECTOR_STORE_ID)
+        file_digest = content_hash(uploaded_file.getvalue())
+        existing = find_upload(file_digest, vector_store_id)
+        if existing:
+            touch_file(existing['file_id'])
+            return True
+        
         # Check if it's an Excel/CSV file that needs conversion
         if uploaded_file.name.endswith(('.xlsx', '.xls', '.csv')):
             # Convert to markdown first
@@ -273,226 +338,275 @@ def process_uploaded_file(uploaded_file):
             if not markdown_content:
                 return False
             
-            # Save markdown temporarily
-            temp_path = os.path.join(UPLOAD_FOLDER, f"{uploaded_file.name}.md")
-            with open(temp_path, "w", encoding='utf-8') as f:
-                f.write(markdown_content)
-            
-            # Upload markdown to vector store
-            with open(temp_path, "rb") as f:
-                file_batch = client.vector_stores.file_batches.upload_and_poll(
-                    vector_store_id=VECTOR_STORE_ID,
-                    files=[f]
-                )
+            upload_name = f"{uploaded_file.name}.md"
+            upload_content = markdown_content
+            local_text = markdown_content
         else:
             # Handle other file types (PDF, TXT, MD) directly
-            temp_path = os.path.join(UPLOAD_FOLDER, uploaded_file.name)
-            with open(temp_path, "wb") as f:
-                f.write(uploaded_file.getbuffer())
-
-            # Upload to vector store
-            with open(temp_path, "rb") as f:
-                file_batch = client.vector_stores.file_batches.upload_and_poll(
-                    vector_store_id=VECTOR_STORE_ID,
-                    files=[f]
-                )
-
-        # Clean up
-        os.remove(temp_path)
+            upload_name = uploaded_file.name
+            upload_content = uploaded_file.getvalue()
+            local_text = upload_content.decode('utf-8', errors='ignore') if uploaded_file.name.endswith(('.txt', '.md')) else None
         
-        if file_batch.status == "completed":
-            return True
-        return False
+        # Keep the local retrieval index in step with what goes to the vector store
+        if local_text:
+            index_source(project_key(project_info) or SHARED_SCOPE, upload_name, local_text)
+
+        # A new version of a document with the same name supersedes the old one, but only
+        # within the same project and vector store - another project's file is never retired
+        revision_key = f"document:{project_key(project_info) or SHARED_SCOPE}:{vector_store_id}:{uploaded_file.name}"
+        return upload_to_store(client, vector_store_id, upload_name, upload_content, file_digest,
+                               kind="document", revision_key=revision_key)
 
     except Exception as e:
         st.error(f"Error uploading file: {str(e)}")
-        if 'temp_path' in locals() and os.path.exists(temp_path):
-            os.remove(temp_path)
         return False
 
-def ask_question(question, thread_id):
-    """Send question to assistant and get response"""
+def upload_to_store(client, vector_store_id, upload_name, upload_content, digest, kind, revision_key=None, tenant_wide=False):
+    """Upload content from memory into a vector store, tagged and tracked in the ledger and lifecycle tracker
+
+    tenant_wide content is not attributed to the project open in this session.
+    """
+    project_info = None if tenant_wide else st.session_state.get('project_info')
+    # Checkpointed, so uploading the same content again after a failure resumes where it stopped
+    pipeline_id = f"chat_upload:{vector_store_id}:{digest}"
+    results = run_upload_pipeline(
+        client, pipeline_id, vector_store_id,
+        [(upload_name, upload_content, file_attributes(project_info, kind))]
+    )
+    file_id, status = results[upload_name]
+    if status != "completed":
+        return False
+    size_bytes = len(upload_content.encode('utf-8')) if isinstance(upload_content, str) else len(upload_content)
+    record_upload(digest, file_id, upload_name, size_bytes,
+                  target=vector_store_id, vector_store_file_id=file_id)
+    register_file(vector_store_id, file_id, kind, project_key=project_key(project_info),
+                  revision_key=revision_key, filename=upload_name)
+    clear_checkpoints(pipeline_id)
+    # New knowledge invalidates cached answers for the scope it landed in
+    bump_data_version(SHARED_SCOPE if vector_store_id == VECTOR_STORE_ID else project_key(project_info))
+    return True
+
+def find_local_matches(question):
+    """Local BM25 hits for a question across the current project and shared knowledge"""
+    return search_local_index(
+        [project_key(st.session_state.get('project_info')), SHARED_SCOPE], question
+    )
+
+SQL_COMMAND = "/sql "
+
+
+def ask_sql_question(question):
+    """Answer a question with SQL over the current project's sheets; returns a message dict"""
+    project = project_key(st.session_state.get('project_info'))
+    if not SQL_ENGINE_AVAILABLE:
+        return {"role": "assistant", "content": "SQL answers need DuckDB, which is not installed on this server."}
+    if not project:
+        return {"role": "assistant", "content": "Process a workbook on the Home page first - SQL answers run over its sheets."}
+    client = get_client()
+    if not client:
+        return {"role": "assistant", "content": "OpenAI client is not configured."}
     try:
-        if not question or not thread_id:
-            return None
-        if thread_id not in st.session_state.threads:
-            return None
+        with st.spinner("Writing SQL..."):
+            answer = answer_with_sql(client, question, project, st.session_state.get('sheet_info'))
+    except Exception as e:
+        return {"role": "assistant", "content": f"Sorry, I couldn't answer that with SQL: {str(e)}"}
+    return {"role": "assistant", "content": f"```sql\n{answer['sql']}\n```", "table": answer['result']}
 
-        client = get_client()
-        if not client:
-            return None
 
-        thread = st.session_state.threads[thread_id]['thread']
-        additional_instructions = """
-        Before answering any question, first check your knowledge base for any technical definitions, 
+def render_sql_result(result):
+    """Result table plus a bar chart when the shape suits one"""
+    st.dataframe(result, use_container_width=True)
+    chart = chart_columns(result)
+    if chart:
+        label_column, value_columns = chart
+        st.bar_chart(result, x=label_column, y=value_columns)
+
+
+def ask_question(question, thread_id, local_hits=None):
+    """Send question to assistant and stream the response text as it is generated
+    
+    Meant for st.write_stream. The full answer is appended to the message history once
+    the run completes; if the stream is abandoned midway (rerun, navigation, stop) or
+    misses its deadline, the run is cancelled instead.
+    """
+    if not question or not thread_id:
+        return
+    if get_thread(thread_id) is None:
+        return
+
+    client = get_client()
+    if not client:
+        return
+
+    try:
+        project = project_key(st.session_state.get('project_info'))
+        touch_project(project)
+        touch_resource(thread_id)
+        
+        # Numeric questions about the current project's sheets are computed locally without a run
+        routed = route_question(question, load_sheets(project), st.session_state.get('sheet_info'))
+        if routed:
+            # Posted to the thread too, so follow-ups and knowledge extraction see the exchange
+            post_exchange(client, thread_id, question, routed['content'])
+            yield routed['content']
+            st.session_state.messages.append({"role": "assistant", "content": routed['content']})
+            record_activity(thread_id, messages_added=2)
+            sync_thread(client, thread_id)
+            return
+        
+        # Repeated questions against unchanged project data are answered from the cache; without a
+        # project there is nothing to scope the entry to, so nothing is cached across sessions
+        cache_scope = f"chat:{project}" if project else None
+        cache_version = data_version(project, SHARED_SCOPE)
+        cached = cache_scope and lookup_answer(cache_scope, cache_version, question)
+        if cached:
+            # Posted to the thread too, so follow-ups and knowledge extraction see the exchange
+            post_exchange(client, thread_id, question, cached['content'])
+            yield cached['content']
+            st.session_state.messages.append({"role": "assistant", "content": cached['content']})
+            record_activity(thread_id, messages_added=2)
+            sync_thread(client, thread_id)
+            return
+        additional_instructions = f"""
+        {INSTRUCTIONS_MARKER} for any technical definitions, 
         AccuBid terminology, or previously explained concepts that might be relevant to the user's question. 
         Use these definitions to provide more accurate and contextually appropriate responses.
         """
         
-        # Create message
-        message = client.beta.threads.messages.create(
-            thread_id=thread.id,
-            role="user",
-            content=str("USER'S QUESTION: ") + question + str("\n\n" + additional_instructions)
-        )
-
-        # Run assistant with enhanced instructions for knowledge-aware responses
-      
-        
-        run = client.beta.threads.runs.create_and_poll(
-            thread_id=thread.id,
-            assistant_id=MAIN_ASSISTANT_ID,
-        )
-
-        # Get final response
-        messages = client.beta.threads.messages.list(
-            thread_id=thread.id
-        )
+        # Local BM25 hits give the assistant pre-retrieved context
+        content = QUESTION_PREFIX + question + "\n\n" + additional_instructions
+        if local_hits:
+            content += "\n\nPRE-RETRIEVED CONTEXT (from the project knowledge base):\n\n" + format_context(local_hits)
+        
+        # Run assistant with enhanced instructions for knowledge-aware responses;
+        # strong local hits already carry the answer, so skip the remote file_search
+        context_options = run_options("chat")
+        if is_strong(local_hits):
+            context_options["tool_choice"] = "none"
+        
+        handler = RunStreamHandler(metric_prefix="chat")
+        # One run at a time per thread: wait for our turn, then post and run
+        with run_slot(client, thread_id):
+            client.beta.threads.messages.create(
+                thread_id=thread_id,
+                role="user",
+                content=content
+            )
+            yield from stream_run_text(
+                client,
+                handler,
+                operation="chat",
+                thread_id=thread_id,
+                assistant_id=MAIN_ASSISTANT_ID,
+                **context_options
+            )
         
-        return messages.data[0].content[0].text.value
+        run = handler.current_run
+        # "incomplete" means the completion token cap was hit - keep the partial answer
+        if run is not None and run.status not in ('completed', 'incomplete'):
+            st.error(f"Assistant run ended with status: {run.status}")
+        else:
+            st.session_state.messages.append({"role": "assistant", "content": handler.text.strip()})
+            if cache_scope:
+                store_answer(cache_scope, cache_version, question, {"content": handler.text.strip()})
+            record_activity(thread_id, messages_added=2)
+            # Mirror the new question and answer (an incremental fetch after the cursor)
+            sync_thread(client, thread_id)
 
     except Exception as e:
         st.error(f"Error processing question: {str(e)}")
-        return None
-
-def extract_thread_history(thread_id):
-    """Extract full conversation history from a thread"""
-    try:
-        if thread_id not in st.session_state.threads:
-            return None
-            
-        client = get_client()
-        if not client:
-            return None
-            
-        thread = st.session_state.threads[thread_id]['thread']
-        
-        # Get all messages from the thread
-        messages = client.beta.threads.messages.list(
-            thread_id=thread.id,
-            order="asc"  # Get in chronological order
-        )
-        
-        # Format conversation history
-        conversation_text = ""
-        for message in messages.data:
-            role = message.role.capitalize()
-            content = message.content[0].text.value
-            conversation_text += f"{role}: {content}\n\n"
-        
-        return conversation_text
-        
-    except Exception as e:
-        st.error(f"Error extracting thread history: {str(e)}")
-        return None
 
-def extract_technical_knowledge(chat_history, thread_name):
-    """Send chat history to knowledge extraction assistant"""
-    try:
-        client = get_client()
-        if not client:
-            return None
-            
-        # Create a new thread for knowledge extraction
-        extraction_thread = client.beta.threads.create()
-        
-        # Craft the extraction prompt
-        extraction_prompt = f"""
-        Please analyze the following conversation and extract all technical terms, concepts, and definitions that were explained or defined during this chat.
-
-        IMPORTANT: Only return technical definitions that were actually explained or defined in this conversation. Do not include general knowledge or terms that weren't specifically discussed.
-
-        Please format your response as a clean list of definitions like this:
-
-        **Term 1**: Definition as explained in the conversation
-        **Term 2**: Definition as explained in the conversation
-        **Term 3**: Definition as explained in the conversation
-
-        If no technical definitions were found, simply respond with "No technical definitions found in this conversation."
-
-        Here is the conversation to analyze:
-
-        {chat_history}
-        """
-        
-        # Send the extraction request
-        client.beta.threads.messages.create(
-            thread_id=extraction_thread.id,
-            role="user",
-            content=extraction_prompt
-        )
-        
-        # Run the knowledge extraction assistant
-        run = client.beta.threads.runs.create_and_poll(
-            thread_id=extraction_thread.id,
-            assistant_id=KNOWLEDGE_EXTRACTION_ASSISTANT_ID
-        )
-        
-        # Get the extracted definitions
-        messages = client.beta.threads.messages.list(
-            thread_id=extraction_thread.id
-        )
-        
-        extracted_definitions = messages.data[0].content[0].text.value
-        
-        # Clean up the extraction thread (optional)
-        # client.beta.threads.delete(extraction_thread.id)
-        
-        return extracted_definitions
-        
-    except Exception as e:
-        st.error(f"Error extracting technical knowledge: {str(e)}")
-        return None
+def load_thread_messages(thread_id):
+    """Chat history for display from the local mirror, after syncing any new messages"""
+    client = get_client()
+    if client:
+        try:
+            sync_thread(client, thread_id)
+        except Exception as e:
+            st.warning(f"Showing cached history - could not sync thread: {str(e)}")
+    messages = []
+    for message in mirrored_messages(thread_id):
+        content = message['text']
+        if message['role'] == 'user':
+            # Show the question, not the instructions and context sent along with it
+            content = question_text(content)
+        messages.append({"role": message['role'], "content": content})
+    return messages
+
+def start_knowledge_extraction(threads, label):
+    """Extract definitions from the new messages of [(thread_id, name)] in the background"""
+    client = get_client()
+    if not client:
+        return
+    st.session_state.extraction_job_id = start_extraction(
+        client, KNOWLEDGE_EXTRACTION_ASSISTANT_ID, threads, label=label, session=st.session_state.job_session
+    )
+    st.session_state.extraction_label = label
+
+@st.fragment(run_every=2)
+def render_extraction_status():
+    """Progress of the background extraction; opens the preview once it finishes"""
+    job = get_job(st.session_state.extraction_job_id) if st.session_state.extraction_job_id else None
+    if job is None:
+        return
+    if not is_finished(job):
+        st.info(f"🔍 {job['message']} ({job_duration(job):.0f}s)")
+        return
+    st.session_state.extraction_job_id = None
+    if job['status'] == 'failed':
+        st.error(f"Knowledge extraction failed: {job['error']}")
+        return
+    result = job['result']
+    if result['definitions']:
+        st.session_state.extracted_definitions = result['definitions']
+        st.session_state.extraction_watermarks = result['watermarks']
+        st.session_state.show_knowledge_preview = True
+    else:
+        # Nothing to learn from these messages - don't send them again
+        advance_watermarks(result['watermarks'])
+        st.toast("No new technical definitions found." if result['messages'] else "No new messages since the last extraction.")
+    st.rerun()
 
 def upload_definitions_to_vector_store(definitions, thread_name):
-    """Upload extracted definitions to vector store as markdown"""
+    """Merge extracted definitions into the tenant glossary and publish it as the store's single glossary file"""
     try:
         client = get_client()
         if not client:
             return False
-            
-        # Create markdown content
-        timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
-        markdown_content = f"""# Technical Definitions from Conversation
-
-**Source Thread:** {thread_name}
-**Extracted Date:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-**Type:** Conversational Knowledge Extraction
-
----
-
-## Definitions
-
-{definitions}
-
----
-
-*This document contains technical definitions and terminology extracted from user conversations to build persistent knowledge for the AccuBid AI assistant.*
-"""
-        
-        # Save to temporary file
-        temp_filename = f"Technical_Definitions_{timestamp}.md"
-        temp_path = os.path.join(UPLOAD_FOLDER, temp_filename)
-        
-        with open(temp_path, "w", encoding='utf-8') as f:
-            f.write(markdown_content)
         
-        # Upload to vector store
-        with open(temp_path, "rb") as f:
-            file_batch = client.vector_stores.file_batches.upload_and_poll(
-                vector_store_id=VECTOR_STORE_ID,
-                files=[f]
-            )
-        
-        # Clean up
-        os.remove(temp_path)
-        
-        return file_batch.status == "completed"
+        # Definitions are tenant-wide knowledge; per-extraction files from before the glossary are folded in once
+        legacy_sources = source_texts(SHARED_SCOPE, LEGACY_PREFIX)
+        for source, text in legacy_sources.items():
+            merge_definitions(SHARED_SCOPE, legacy_definitions(text), source=source)
+        merge_definitions(SHARED_SCOPE, definitions, source=thread_name)
+        
+        glossary = next_glossary(SHARED_SCOPE)
+        if glossary:
+            version, upload_name, markdown_content, terms_hash = glossary
+            glossary_digest = content_hash(markdown_content)
+            index_source(SHARED_SCOPE, glossary_source(SHARED_SCOPE), markdown_content)
+            if not upload_to_store(client, VECTOR_STORE_ID, upload_name, markdown_content, glossary_digest,
+                                   kind="definitions", revision_key=glossary_revision(SHARED_SCOPE), tenant_wide=True):
+                return False
+            record_published(SHARED_SCOPE, version, terms_hash, find_upload(glossary_digest, VECTOR_STORE_ID)['file_id'])
+        
+        # The new version is in the store before the old ones go, so file_search always sees one glossary.
+        # Legacy per-extraction files are retired by name even when they are missing from the local index
+        # (e.g. uploaded from another machine) - their content can't be read back, so it isn't merged
+        published = published_glossary(SHARED_SCOPE)
+        stale_files = [
+            record['file_id'] for record in live_files(VECTOR_STORE_ID, kind="definitions")
+            if published and record['file_id'] != published['file_id']
+            and (record['revision_key'] == glossary_revision(SHARED_SCOPE)
+                 or (record['filename'] or '').startswith(LEGACY_PREFIX))
+        ]
+        retire_files(client, VECTOR_STORE_ID, stale_files)
+        if published:
+            remove_sources(SHARED_SCOPE, legacy_sources)
+        return True
         
     except Exception as e:
         st.error(f"Error uploading definitions to vector store: {str(e)}")
-        if 'temp_path' in locals() and os.path.exists(temp_path):
-            os.remove(temp_path)
         return False
 
 # Page UI
@@ -515,47 +629,110 @@ with st.sidebar:
             st.success(f"Created thread: {thread_name}")
             st.session_state.messages = []
 
-    # Display existing threads
-    threads = get_threads()
+    # Display existing threads, a page at a time from the durable catalog, minus threads
+    # the resource reaper deleted after idling past the chat limit
+    forget_deleted_threads()
+    if st.session_state.current_thread_id and get_thread(st.session_state.current_thread_id) is None:
+        st.session_state.current_thread_id = None
+        st.session_state.current_thread_name = None
+        st.session_state.messages = []
+    thread_search = st.text_input("🔍 Search threads", placeholder="Name or project", key="thread_search")
+    total_threads = count_threads(thread_search)
+    last_page = max(0, (total_threads - 1) // THREAD_PAGE_SIZE)
+    st.session_state.thread_page = min(st.session_state.thread_page, last_page)
+    threads = get_threads(thread_search)
     if threads:
         st.subheader("Select Thread")
-        thread_options = {thread['name']: thread['id'] for thread in threads}
-        selected_thread = st.selectbox(
+        thread_labels = {
+            thread['id']: f"{thread['name']}" + (f" · {thread['project_key']}" if thread['project_key'] else "") + f" ({thread['message_count']} msgs)"
+            for thread in threads
+        }
+        thread_ids = list(thread_labels)
+        selected_thread_id = st.selectbox(
             "Choose a thread",
-            options=list(thread_options.keys()),
+            options=thread_ids,
+            format_func=thread_labels.get,
+            index=thread_ids.index(st.session_state.current_thread_id) if st.session_state.current_thread_id in thread_ids else 0,
             key="thread_selector"
         )
         
-        if selected_thread:
-            st.session_state.current_thread_id = thread_options[selected_thread]
-            st.session_state.current_thread_name = selected_thread
+        if selected_thread_id:
+            if st.session_state.current_thread_id != selected_thread_id:
+                # Switching threads: restore that thread's history from the local mirror; opening
+                # a thread counts as use, so the reaper doesn't delete conversations still being read
+                touch_resource(selected_thread_id)
+                st.session_state.messages = load_thread_messages(selected_thread_id)
+            st.session_state.current_thread_id = selected_thread_id
+            st.session_state.current_thread_name = next(thread['name'] for thread in threads if thread['id'] == selected_thread_id)
+        
+        if last_page > 0:
+            col_prev, col_page, col_next = st.columns([1, 2, 1])
+            with col_prev:
+                if st.button("◀", disabled=st.session_state.thread_page == 0, key="threads_prev"):
+                    st.session_state.thread_page -= 1
+                    st.rerun()
+            with col_page:
+                st.caption(f"Page {st.session_state.thread_page + 1} of {last_page + 1} · {total_threads} threads")
+            with col_next:
+                if st.button("▶", disabled=st.session_state.thread_page >= last_page, key="threads_next"):
+                    st.session_state.thread_page += 1
+                    st.rerun()
 
         if st.button("🗑️ Delete Current Thread", use_container_width=True):
             if st.session_state.current_thread_id:
-                if delete_thread(st.session_state.current_thread_id):
+                if delete_threads([st.session_state.current_thread_id]):
                     st.success("Thread deleted")
                     st.rerun()
+        
+        if st.session_state.current_thread_id and len(st.session_state.messages) > 0:
+            if st.button("🧹 Continue in Fresh Thread", use_container_width=True, help="Start a new thread seeded with a summary of this one, so long conversations stay fast"):
+                with st.spinner("Summarizing the conversation..."):
+                    thread_id, thread_name = continue_in_fresh_thread(st.session_state.current_thread_id, st.session_state.current_thread_name)
+                if thread_id:
+                    st.session_state.current_thread_id = thread_id
+                    st.session_state.current_thread_name = thread_name
+                    st.session_state.messages = []
+                    st.rerun()
+        
+        with st.expander("🗑️ Delete several threads"):
+            threads_to_delete = st.multiselect("Threads on this page", options=thread_ids, format_func=thread_labels.get)
+            if st.button("Delete selected", disabled=not threads_to_delete, use_container_width=True):
+                with st.spinner(f"Deleting {len(threads_to_delete)} threads..."):
+                    if delete_threads(threads_to_delete):
+                        st.success(f"Deleted {len(threads_to_delete)} threads")
+                        st.rerun()
+
+        if st.session_state.current_thread_id and st.session_state.messages:
+            st.download_button(
+                "⬇️ Export Conversation",
+                data=format_transcript(mirrored_messages(st.session_state.current_thread_id)),
+                file_name=f"{st.session_state.current_thread_name or 'conversation'}.txt",
+                mime="text/plain",
+                use_container_width=True
+            )
 
         # Knowledge Extraction Button
         st.markdown("---")
+        # Extraction runs in the background over messages added since each thread's last extraction
+        extraction_running = bool(st.session_state.extraction_job_id)
         if st.session_state.current_thread_id and len(st.session_state.messages) > 0:
-            if st.button("🧠 Update Bot's Knowledge", use_container_width=True, help="Extract technical definitions from this conversation"):
-                with st.spinner("🔍 Extracting technical knowledge from conversation..."):
-                    # Extract thread history
-                    chat_history = extract_thread_history(st.session_state.current_thread_id)
-                    
-                    if chat_history:
-                        # Extract technical definitions
-                        definitions = extract_technical_knowledge(chat_history, st.session_state.current_thread_name)
-                        
-                        if definitions and "No technical definitions found" not in definitions:
-                            st.session_state.extracted_definitions = definitions
-                            st.session_state.show_knowledge_preview = True
-                            st.rerun()
-                        else:
-                            st.info("No technical definitions found in this conversation.")
-                    else:
-                        st.error("Failed to extract conversation history.")
+            if st.button("🧠 Update Bot's Knowledge", use_container_width=True, disabled=extraction_running,
+                         help="Extract technical definitions from the new messages in this conversation"):
+                start_knowledge_extraction([(st.session_state.current_thread_id, st.session_state.current_thread_name)],
+                                           st.session_state.current_thread_name)
+                st.rerun()
+        # Batched learning only covers the open project's threads, never other users' conversations
+        current_project = project_key(st.session_state.get('project_info'))
+        stale_threads = threads_needing_extraction(
+            list_threads(limit=THREAD_PAGE_SIZE, project_key=current_project)
+        )[:MAX_THREADS_PER_JOB] if current_project else []
+        if len(stale_threads) > 1:
+            if st.button(f"🧠 Learn from {len(stale_threads)} active threads", use_container_width=True, disabled=extraction_running,
+                         help="One batched extraction over the new messages of recently active threads"):
+                start_knowledge_extraction([(thread['thread_id'], thread['name']) for thread in stale_threads],
+                                           f"{len(stale_threads)} conversations")
+                st.rerun()
+        render_extraction_status()
 
     # File Upload
     st.markdown("---")
@@ -567,6 +744,47 @@ with st.sidebar:
         else:
             st.error("Failed to upload file")
 
+    # Knowledge base maintenance
+    st.markdown("---")
+    with st.expander("🧹 Knowledge Base Maintenance"):
+        summary = lifecycle_summary()
+        if summary:
+            for kind, counts in summary.items():
+                st.write(f"**{kind}:** {counts['live']} live, {counts['superseded']} superseded, {counts['deleted']} removed")
+        else:
+            st.caption("No tracked files yet.")
+        glossary = published_glossary(SHARED_SCOPE)
+        if glossary:
+            st.caption(f"📖 Glossary v{glossary['version']}: {len(glossary_terms(SHARED_SCOPE))} terms in one file")
+        compaction_job = get_job(st.session_state.compaction_job_id) if st.session_state.compaction_job_id else None
+        if compaction_job and not is_finished(compaction_job):
+            st.info(f"🔄 {compaction_job['message']}")
+        elif compaction_job and compaction_job['status'] == 'completed':
+            st.success(compaction_job['result'][1])
+        elif compaction_job:
+            st.error(compaction_job['error'])
+        if st.button("Run cleanup now", use_container_width=True):
+            client = get_client()
+            if client:
+                st.session_state.compaction_job_id = schedule_compaction(client, force=True)
+                st.rerun()
+        
+        st.markdown("**OpenAI resources**")
+        for row in registry_summary():
+            st.write(f"{row['kind']} ({row['owner']}): {row['live']} live, {row['released']} released")
+        reaper_job = get_job(st.session_state.reaper_job_id) if st.session_state.reaper_job_id else None
+        if reaper_job and not is_finished(reaper_job):
+            st.info(f"🔄 {reaper_job['message']}")
+        elif reaper_job and reaper_job['status'] == 'completed':
+            st.success(reaper_job['result'][1])
+        elif reaper_job:
+            st.error(reaper_job['error'])
+        if st.button("Delete idle threads and files", use_container_width=True):
+            client = get_client()
+            if client:
+                st.session_state.reaper_job_id = schedule_reaper(client, force=True)
+                st.rerun()
+
 # Main chat interface
 if st.session_state.current_thread_id:
     st.write(f"**Current Thread:** {st.session_state.current_thread_name}")
@@ -575,7 +793,7 @@ if st.session_state.current_thread_id:
     if st.session_state.show_knowledge_preview and st.session_state.extracted_definitions:
         st.markdown("---")
         st.markdown("### 🧠 Knowledge Extraction Preview")
-        st.info("📋 Review the technical definitions extracted from your conversation:")
+        st.info(f"📋 Review the technical definitions extracted from the new messages in {st.session_state.extraction_label or 'your conversation'}:")
         
         with st.expander("📖 Extracted Definitions", expanded=True):
             st.markdown(st.session_state.extracted_definitions)
@@ -584,7 +802,9 @@ if st.session_state.current_thread_id:
         with col1:
             if st.button("✅ Save to Knowledge Base", type="primary", use_container_width=True):
                 with st.spinner("💾 Uploading definitions to knowledge base..."):
-                    if upload_definitions_to_vector_store(st.session_state.extracted_definitions, st.session_state.current_thread_name):
+                    if upload_definitions_to_vector_store(st.session_state.extracted_definitions,
+                                                          st.session_state.extraction_label or st.session_state.current_thread_name):
+                        advance_watermarks(st.session_state.extraction_watermarks)
                         st.success("🎉 Knowledge successfully added to bot's memory!")
                         st.balloons()
                     else:
@@ -597,6 +817,8 @@ if st.session_state.current_thread_id:
         
         with col2:
             if st.button("❌ Cancel", use_container_width=True):
+                # Reviewed and rejected - the next extraction starts after these messages
+                advance_watermarks(st.session_state.extraction_watermarks)
                 st.session_state.show_knowledge_preview = False
                 st.session_state.extracted_definitions = None
                 st.rerun()
@@ -611,6 +833,8 @@ if st.session_state.current_thread_id:
     for message in st.session_state.messages:
         with st.chat_message(message["role"]):
             st.write(message["content"])
+            if message.get("table") is not None:
+                render_sql_result(message["table"])
 
     # Chat input
     if prompt := st.chat_input("Ask about your AccuBid files or upload documents..."):
@@ -619,12 +843,26 @@ if st.session_state.current_thread_id:
             st.write(prompt)
         st.session_state.messages.append({"role": "user", "content": prompt})
 
-        # Get and show assistant response
-        with st.spinner("🤖 AI is thinking..."):
-            if response := ask_question(prompt, st.session_state.current_thread_id):
-                with st.chat_message("assistant"):
-                    st.write(response)
-                st.session_state.messages.append({"role": "assistant", "content": response})
+        # "/sql <question>" answers from the project's sheets with locally run SQL
+        sql_question = prompt[len(SQL_COMMAND):].strip() if prompt.lower().startswith(SQL_COMMAND) else None
+        if sql_question:
+            with st.chat_message("assistant"):
+                answer = ask_sql_question(sql_question)
+                st.write(answer["content"])
+                if answer.get("table") is not None:
+                    render_sql_result(answer["table"])
+            st.session_state.messages.append(answer)
+            st.stop()
+        
+        # Stream the assistant response; ask_question stores it in the history when done
+        with st.chat_message("assistant"):
+            local_hits = find_local_matches(prompt)
+            if local_hits:
+                with st.expander(f"⚡ {len(local_hits)} local matches", expanded=False):
+                    for hit in local_hits:
+                        st.caption(f"{hit['source']} · score {hit['score']:.2f}")
+                        st.markdown(hit['text'][:800])
+            st.write_stream(ask_question(prompt, st.session_state.current_thread_id, local_hits))
 else:
     st.info("👈 Please select or create a thread to start chatting.")
     
@@ -641,6 +879,7 @@ else:
     - Ask questions about uploaded documents
     - Get cost breakdowns and project insights
     - Analyze electrical estimation data
+    - Type `/sql <question>` to query the project's sheets with locally run SQL
     - Upload additional files to expand the knowledge base
     
     💡 **Tip:** Upload documents here to add them to your knowledge base for AI analysis!
@@ -1,6 +1,8 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime
+from Utils.projects import project_key
+from Utils.project_store import save_project
 
 # Set page configuration
 st.set_page_config(
@@ -326,6 +328,12 @@ col1, col2, col3 = st.columns(3)
 
 with col1:
     if st.button("💾 Save Customizations", type="primary", use_container_width=True):
+        # Persist with the project so a refresh or a later resume keeps them
+        save_project(
+            project_key(st.session_state.get('project_info')),
+            {'project_info': st.session_state.get('project_info'),
+             'proposal_customizations': st.session_state.proposal_customizations}
+        )
         st.success("✅ Customizations saved successfully!")
         st.balloons()
 
@@ -4,11 +4,23 @@ from datetime import datetime, timedelta
 import time
 import os
 import tempfile
-from openai import OpenAI
+from openai import OpenAI, NotFoundError
+from Utils.upload_ledger import content_hash, find_upload, record_upload, forget_file
+from Utils.assistant_pool import get_pooled_assistant, project_instructions
+from Utils.resource_registry import register_resource, touch_resource
+from Utils.run_waiter import wait_for_run, cancel_run, RunTimeout, run_deadline
+from Utils.run_scheduler import fork_thread
+from Utils.context_policy import run_options
+from Utils.artifact_cache import get_artifact
+from Utils.projects import project_key
+from Utils.sql_engine import answer_with_sql, run_sql, chart_columns, project_schema, SQL_ENGINE_AVAILABLE
 
 # Initialize OpenAI client
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
+# Seconds of polling per rerun while a proposal is generating
+PROPOSAL_POLL_BUDGET_SECONDS = 10
+
 # Set page configuration
 st.set_page_config(
     page_title="Document Generation - DDMac Bot",
@@ -21,7 +33,7 @@ def generate_proposal_document():
     """Generate a proposal document using the assistant with code interpreter and template"""
     try:
         if not st.session_state.assistant_id or not st.session_state.thread_id:
-            return None, "No assistant found. Please upload an Excel file first on the Home page."
+            return None, None, "No assistant found. Please upload an Excel file first on the Home page."
         
         # Get project and sheet info from session state
         project_info = st.session_state.get('project_info', {})
@@ -86,28 +98,30 @@ CUSTOM INSTRUCTIONS:
         
         # Upload proposal template DOCX file for this session
         template_file_obj = None
+        template_file_id = None
         template_path = "/Users/ritviksingh/Desktop/Ace148/DDMacBot/resources/prompts/ddmac_template.docx"
         if os.path.exists(template_path):
             try:
                 with open(template_path, "rb") as f:
+                    template_bytes = f.read()
+                
+                # The template rarely changes, so reuse the copy already uploaded
+                template_digest = content_hash(template_bytes)
+                existing = find_upload(template_digest)
+                if existing:
+                    try:
+                        template_file_obj = client.files.retrieve(existing['file_id'])
+                    except NotFoundError:
+                        # Deleted since it was recorded (reaper or by hand) - upload it again
+                        forget_file(existing['file_id'])
+                if template_file_obj is None:
                     template_file_obj = client.files.create(
-                        file=f,
+                        file=(os.path.basename(template_path), template_bytes),
                         purpose='assistants'
                     )
-                
-                # Update assistant with the template file
-                current_assistant = client.beta.assistants.retrieve(st.session_state.assistant_id)
-                current_file_ids = current_assistant.tool_resources.code_interpreter.file_ids
-                updated_file_ids = list(current_file_ids) + [template_file_obj.id]
-                
-                client.beta.assistants.update(
-                    assistant_id=st.session_state.assistant_id,
-                    tool_resources={
-                        "code_interpreter": {
-                            "file_ids": updated_file_ids
-                        }
-                    }
-                )
+                    record_upload(template_digest, template_file_obj.id, os.path.basename(template_path), len(template_bytes))
+                register_resource(template_file_obj.id, "file", "template")
+                template_file_id = template_file_obj.id
                 
             except Exception as template_error:
                 st.warning(f"Could not upload proposal template: {str(template_error)}")
@@ -298,85 +312,115 @@ else:
 
 CRITICAL: You MUST save the file with the exact filename "DDMac_Proposal_Final.docx" for download."""
 
+        # Proposals don't need the chat's context, so they run on a forked thread carrying just
+        # the Excel file and template - the project thread stays free for the floating chat
+        touch_resource(st.session_state.thread_id)
+        proposal_thread_id = fork_thread(
+            client,
+            [st.session_state.get('file_id'), template_file_id],
+            owner="proposal",
+            project_key=project_key(project_info)
+        )
+        
         # Send the message to the assistant
         message = client.beta.threads.messages.create(
-            thread_id=st.session_state.thread_id,
+            thread_id=proposal_thread_id,
             role="user",
             content=prompt
         )
         
-        # Create and run the assistant
+        # Run the pooled proposal writer on the proposal thread
         run = client.beta.threads.runs.create(
-            thread_id=st.session_state.thread_id,
-            assistant_id=st.session_state.assistant_id
+            thread_id=proposal_thread_id,
+            assistant_id=get_pooled_assistant(client, "proposal_writer"),
+            additional_instructions=project_instructions(project_info),
+            **run_options("proposal")
         )
         
-        return run.id, "Proposal generation started successfully"
+        return proposal_thread_id, run.id, "Proposal generation started successfully"
         
     except Exception as e:
-        return None, f"Error generating proposal: {str(e)}"
+        return None, None, f"Error generating proposal: {str(e)}"
+
+def latest_proposal_output(run_id):
+    """(file id or None, response text or None) of the run's latest assistant message; (None, None) if it wrote none"""
+    messages = client.beta.threads.messages.list(
+        thread_id=st.session_state.proposal_thread_id,
+        run_id=run_id,
+        limit=1
+    )
+    # A run that stopped before writing anything must not hand back the user's own prompt
+    replies = [message for message in messages.data if message.role == "assistant" and message.run_id == run_id]
+    if not replies:
+        return None, None
+    message = replies[0]
+    
+    # Check for file annotations in the message content
+    files_found = []
+    for content_block in message.content:
+        if hasattr(content_block, 'text') and hasattr(content_block.text, 'annotations'):
+            for annotation in content_block.text.annotations:
+                if hasattr(annotation, 'file_path'):
+                    files_found.append(annotation.file_path.file_id)
+                elif hasattr(annotation, 'file_download'):
+                    files_found.append(annotation.file_download.file_id)
+    
+    # Also check for any file attachments in the run steps
+    if not files_found:
+        try:
+            run_steps = client.beta.threads.runs.steps.list(
+                thread_id=st.session_state.proposal_thread_id,
+                run_id=run_id
+            )
+            
+            for step in run_steps.data:
+                if hasattr(step, 'step_details') and hasattr(step.step_details, 'tool_calls'):
+                    for tool_call in step.step_details.tool_calls:
+                        if hasattr(tool_call, 'code_interpreter') and hasattr(tool_call.code_interpreter, 'outputs'):
+                            for output in tool_call.code_interpreter.outputs:
+                                if hasattr(output, 'logs'):
+                                    # Check logs for file creation messages
+                                    if "Document saved as:" in output.logs or ".docx" in output.logs:
+                                        # Try to find file IDs in the logs
+                                        continue
+        except Exception as step_error:
+            print(f"Error checking run steps: {step_error}")
+    
+    content = message.content[0].text.value if message.content and hasattr(message.content[0], 'text') else None
+    return (files_found[0] if files_found else None), content
 
 def check_proposal_generation_status(run_id):
     """Check the status of proposal generation and retrieve the document if ready"""
     try:
         run = client.beta.threads.runs.retrieve(
-            thread_id=st.session_state.thread_id,
+            thread_id=st.session_state.proposal_thread_id,
             run_id=run_id
         )
         
         if run.status == "completed":
-            # Retrieve the latest message from the assistant
-            messages = client.beta.threads.messages.list(
-                thread_id=st.session_state.thread_id,
-                limit=1
-            )
-            
-            if messages.data:
-                message = messages.data[0]
-                
-                # Check for file annotations in the message content
-                files_found = []
-                for content_block in message.content:
-                    if hasattr(content_block, 'text') and hasattr(content_block.text, 'annotations'):
-                        for annotation in content_block.text.annotations:
-                            if hasattr(annotation, 'file_path'):
-                                files_found.append(annotation.file_path.file_id)
-                            elif hasattr(annotation, 'file_download'):
-                                files_found.append(annotation.file_download.file_id)
-                
-                # Also check for any file attachments in the run steps
-                if not files_found:
-                    try:
-                        run_steps = client.beta.threads.runs.steps.list(
-                            thread_id=st.session_state.thread_id,
-                            run_id=run_id
-                        )
-                        
-                        for step in run_steps.data:
-                            if hasattr(step, 'step_details') and hasattr(step.step_details, 'tool_calls'):
-                                for tool_call in step.step_details.tool_calls:
-                                    if hasattr(tool_call, 'code_interpreter') and hasattr(tool_call.code_interpreter, 'outputs'):
-                                        for output in tool_call.code_interpreter.outputs:
-                                            if hasattr(output, 'logs'):
-                                                # Check logs for file creation messages
-                                                if "Document saved as:" in output.logs or ".docx" in output.logs:
-                                                    # Try to find file IDs in the logs
-                                                    continue
-                    except Exception as step_error:
-                        print(f"Error checking run steps: {step_error}")
-                
-                if files_found:
-                    return "completed", files_found[0], "Proposal document generated successfully"
-                else:
-                    # Check message content for any useful info
-                    content = message.content[0].text.value if message.content else "No response"
-                    return "completed", None, f"Generation completed but no file found. Response: {content[:300]}..."
+            file_id, content = latest_proposal_output(run_id)
+            if file_id:
+                return "completed", file_id, "Proposal document generated successfully"
+            elif content is not None:
+                return "completed", None, f"Generation completed but no file found. Response: {content[:300]}..."
             else:
                 return "completed", None, "No response from assistant"
+        
+        elif run.status == "incomplete":
+            # The run hit a token cap (max_completion_tokens / max_prompt_tokens); whatever it wrote
+            # or saved before stopping is kept and offered instead of being reported as a failure
+            reason = getattr(run.incomplete_details, 'reason', None) or 'unknown reason'
+            file_id, content = latest_proposal_output(run_id)
+            st.session_state.proposal_partial_text = content
+            return "incomplete", file_id, f"Proposal generation stopped early ({reason.replace('_', ' ')})"
                 
         elif run.status == "failed":
             error_msg = run.last_error.message if run.last_error else 'Unknown error'
             return "failed", None, f"Proposal generation failed: {error_msg}"
+        elif run.status in ["cancelled", "cancelling"] and st.session_state.get('proposal_cancelled_run_id') == run_id:
+            return "failed", None, "Proposal generation was cancelled at your request"
+        elif run.status in ["cancelled", "cancelling", "expired"]:
+            return "failed", None, f"Proposal generation was {run.status} (time limit {run_deadline('proposal') // 60} minutes)"
         elif run.status in ["queued", "in_progress", "requires_action"]:
             return "in_progress", None, "Proposal generation in progress..."
         else:
@@ -386,20 +430,10 @@ def check_proposal_generation_status(run_id):
         return "error", None, f"Error checking status: {str(e)}"
 
 def download_generated_file(file_id, default_filename="DDMac_Proposal.docx"):
-    """Download the generated file from OpenAI"""
+    """Download the generated file from OpenAI (cached locally, so status reruns don't re-fetch)"""
     try:
-        # Get file content from OpenAI
-        file_content = client.files.content(file_id)
-        file_bytes = file_content.read()
-        
-        # Try to get original filename, fallback to default
-        try:
-            file_info = client.files.retrieve(file_id)
-            filename = file_info.filename or default_filename
-        except:
-            filename = default_filename
-            
-        return file_bytes, filename
+        file_bytes, filename = get_artifact(client, file_id)
+        return file_bytes, filename or default_filename
         
     except Exception as e:
         st.error(f"Error downloading file: {str(e)}")
@@ -599,9 +633,11 @@ if st.session_state.get('generating_proposal', False):
     # Initialize the generation if not already started
     if 'proposal_run_id' not in st.session_state:
         with st.spinner("🚀 Starting proposal generation..."):
-            run_id, message = generate_proposal_document()
+            proposal_thread_id, run_id, message = generate_proposal_document()
             if run_id:
+                st.session_state.proposal_thread_id = proposal_thread_id
                 st.session_state.proposal_run_id = run_id
+                st.session_state.proposal_run_started_at = time.time()
                 st.success(f"✅ {message}")
                 st.info(f"📋 Run ID: {run_id}")
                 st.markdown("""
@@ -683,6 +719,46 @@ if st.session_state.get('generating_proposal', False):
                         del st.session_state.proposal_run_id
                     st.rerun()
                     
+        elif status == "incomplete":
+            st.markdown("""
+            <div class="generation-status status-pending">
+                <h4>⚠️ Generation Stopped Early</h4>
+                <p>The assistant reached its output limit before finishing. What it produced so far is kept below.</p>
+            </div>
+            """, unsafe_allow_html=True)
+            
+            st.warning(message)
+            if file_id:
+                file_content, filename = download_generated_file(file_id, "DDMac_Proposal.docx")
+                if file_content:
+                    st.download_button(
+                        label="📥 Download Partial Proposal Document",
+                        data=file_content,
+                        file_name=filename,
+                        mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+                        use_container_width=True,
+                        key="download_partial_document"
+                    )
+            partial_text = st.session_state.get('proposal_partial_text')
+            if partial_text:
+                with st.expander("🔍 View Partial Response", expanded=not file_id):
+                    st.markdown(partial_text)
+                st.download_button(
+                    label="📄 Download Partial Response (Markdown)",
+                    data=partial_text,
+                    file_name="DDMac_Proposal_Partial.md",
+                    mime="text/markdown",
+                    use_container_width=True,
+                    key="download_partial_text"
+                )
+            
+            if st.button("🔄 Try Again", use_container_width=True, key="try_again_incomplete"):
+                st.session_state.generating_proposal = False
+                if 'proposal_run_id' in st.session_state:
+                    del st.session_state.proposal_run_id
+                st.session_state.proposal_partial_text = None
+                st.rerun()
+                
         elif status == "failed":
             st.markdown("""
             <div class="generation-status status-error">
@@ -707,14 +783,27 @@ if st.session_state.get('generating_proposal', False):
             </div>
             """, unsafe_allow_html=True)
             
-            # Progress indicator
-            progress_bar = st.progress(0)
-            for i in range(100):
-                progress_bar.progress(i + 1)
-                time.sleep(0.02)
+            if st.button("⏹️ Cancel generation", use_container_width=True, key="cancel_proposal"):
+                # Remembered per run, so the status message tells a user cancel from a missed deadline
+                st.session_state.proposal_cancelled_run_id = st.session_state.proposal_run_id
+                cancel_run(client, st.session_state.proposal_thread_id, st.session_state.proposal_run_id)
+                st.rerun()
             
-            # Auto-refresh every 3 seconds
-            time.sleep(1)
+            # Poll for a short budget per rerun so widget clicks and page switches never cancel the
+            # run; it is only cancelled when it misses its deadline or the user cancels it
+            wait_status = st.empty()
+            try:
+                wait_for_run(
+                    client,
+                    st.session_state.proposal_thread_id,
+                    st.session_state.proposal_run_id,
+                    operation="proposal",
+                    started_at=st.session_state.get('proposal_run_started_at'),
+                    budget_seconds=PROPOSAL_POLL_BUDGET_SECONDS,
+                    on_poll=lambda run, elapsed: wait_status.caption(f"⏳ {run.status.replace('_', ' ')} · {elapsed:.0f}s elapsed")
+                )
+            except RunTimeout:
+                pass
             st.rerun()
             
         else:
@@ -733,6 +822,45 @@ if st.session_state.get('generating_proposal', False):
                     del st.session_state.proposal_run_id
                 st.rerun()
 
+# Data Explorer Section: SQL over the cached sheets, run locally
+sql_project = project_key(st.session_state.get('project_info'))
+if SQL_ENGINE_AVAILABLE and sql_project:
+    st.markdown("---")
+    st.markdown("""
+    <div class="document-card">
+        <h3>📊 Data Explorer</h3>
+        <p>Ask a question about the estimate; it is answered with SQL over your workbook sheets, locally and in milliseconds.</p>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    sql_question = st.text_input("Question", key="sql_question", placeholder="e.g., Total labour hours and material cost per system")
+    if st.button("🔎 Answer with SQL", key="sql_answer") and sql_question.strip():
+        try:
+            with st.spinner("Writing SQL..."):
+                st.session_state.sql_answer = answer_with_sql(client, sql_question, sql_project, st.session_state.get('sheet_info'))
+        except Exception as e:
+            st.error(f"Query failed: {str(e)}")
+    
+    with st.expander("🗂️ Tables"):
+        st.code(project_schema(sql_project, st.session_state.get('sheet_info')), language="sql")
+    
+    sql_answer = st.session_state.get('sql_answer')
+    if sql_answer:
+        # Keyed on the SQL itself so a newly generated query replaces the editor contents
+        edited_sql = st.text_area("SQL", value=sql_answer['sql'], height=120, key=f"sql_text_{hash(sql_answer['sql'])}")
+        if st.button("▶️ Run SQL", key="sql_run"):
+            try:
+                st.session_state.sql_answer = {"sql": edited_sql, "result": run_sql(sql_project, edited_sql)}
+                st.rerun()
+            except Exception as e:
+                st.error(f"Query failed: {str(e)}")
+        
+        st.dataframe(sql_answer['result'], use_container_width=True)
+        chart = chart_columns(sql_answer['result'])
+        if chart:
+            label_column, value_columns = chart
+            st.bar_chart(sql_answer['result'], x=label_column, y=value_columns)
+
 # Future Features Section
 st.markdown("---")
 st.markdown("""
@@ -0,0 +1,31 @@
+import pytest
+
+from Utils import db
+from Utils.answer_cache import lookup_answer, store_answer
+
+
+@pytest.fixture(autouse=True)
+def database(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "test.sqlite3"))
+    monkeypatch.setattr(db, "_created_schemas", set())
+
+
+def test_exact_question_is_served():
+    store_answer("chat:p1", "p1:1", "Total labour hours on floor 2?", {"content": "40"})
+    assert lookup_answer("chat:p1", "p1:1", "total labour hours on floor 2")["content"] == "40"
+
+
+@pytest.mark.parametrize("question", [
+    "Floor 2 labour hours total?",
+    "Total labour hours on floor 3?",
+])
+def test_different_questions_are_not_served_by_default(question):
+    store_answer("chat:p1", "p1:1", "Total labour hours on floor 2?", {"content": "40"})
+    assert lookup_answer("chat:p1", "p1:1", question) is None
+
+
+def test_similar_match_needs_the_same_numbers():
+    store_answer("chat:p1", "p1:1", "Total labour hours on floor 2 of tower a?", {"content": "40"})
+    assert lookup_answer("chat:p1", "p1:1", "Total labour hours on floor 3 of tower a?", similar=True) is None
+    assert lookup_answer("chat:p1", "p1:1", "Total labour hours on floor 2 of tower a please?", similar=True)["content"] == "40"
@@ -0,0 +1,70 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+from Utils.query_router import route_question
+
+SHEET_INFO = {
+    "DirLb": {"meaning": "Direct Labour"},
+    "Subs": {"meaning": "Subcontractors"},
+}
+
+
+@pytest.fixture
+def sheets():
+    return {
+        "DirLb": pd.DataFrame({"Description": ["Wire", "Conduit", "Panels", "Total"],
+                               "Hours": [10.0, 20.0, 5.0, 35.0]}),
+        "Subs": pd.DataFrame({"Subcontractor": ["A", "B", "C"], "Amount": [1000, 5000, 2000]}),
+    }
+
+
+@pytest.mark.parametrize("question", [
+    "How many hours in DirLb?",
+    "How many labour hours are in Direct Labour?",
+    "Total DirLb hours",
+])
+def test_how_many_measure_is_a_total(sheets, question):
+    answer = route_question(question, sheets, SHEET_INFO)
+    assert answer["column"] == "Hours"
+    assert "Total of `Hours`" in answer["content"]
+    assert ": 35**" in answer["content"]
+
+
+@pytest.mark.parametrize("question", ["How many lines are in Subs?", "Number of Subcontractors items"])
+def test_how_many_rows_is_a_row_count(sheets, question):
+    answer = route_question(question, sheets, SHEET_INFO)
+    assert answer["column"] is None
+    assert "**3** lines" in answer["content"]
+
+
+@pytest.mark.parametrize("question", [
+    "How many are in Subs?",
+    "How many hours per line in DirLb?",
+    "What is the project about?",
+    "How many hours in total?",
+])
+def test_ambiguous_questions_fall_through(sheets, question):
+    assert route_question(question, sheets, SHEET_INFO) is None
+
+
+@pytest.mark.parametrize("question", [
+    "total hours for lighting in DirLb",
+    "What is the total DirLb hours excluding conduit?",
+    "How many hours did the lighting take in DirLb?",
+    "Total DirLb hours for floor 2",
+])
+def test_filtered_questions_fall_through(question):
+    sheets = {"DirLb": pd.DataFrame({"Description": ["Lighting", "Conduit", "Lighting"], "Hours": [1, 2, 4]})}
+    assert route_question(question, sheets, SHEET_INFO) is None
+
+
+def test_largest_line_lookup(sheets):
+    answer = route_question("largest subcontractor line", sheets, SHEET_INFO)
+    assert answer["column"] == "Amount"
+    assert "| B | 5000 |" in answer["content"]
+
+
+def test_top_n_lookup(sheets):
+    answer = route_question("top 2 subcontractor lines", sheets, SHEET_INFO)
+    assert "| B | 5000 |" in answer["content"] and "| C | 2000 |" in answer["content"]
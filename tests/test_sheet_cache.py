@@ -0,0 +1,16 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+from Utils import sheet_cache
+
+
+def test_projects_whose_keys_slugify_alike_keep_their_own_sheets(tmp_path, monkeypatch):
+    monkeypatch.setattr(sheet_cache, "SHEET_DIR", str(tmp_path))
+    monkeypatch.setattr(sheet_cache, "_loaded", {})
+    sheet_cache.save_sheets("acme-tower/x", {"DirLb": pd.DataFrame({"Hours": [1]})})
+    sheet_cache.save_sheets("acme/tower-x", {"Subs": pd.DataFrame({"Amount": [2]})})
+
+    sheet_cache._loaded.clear()
+    assert list(sheet_cache.load_sheets("acme-tower/x")) == ["DirLb"]
+    assert list(sheet_cache.load_sheets("acme/tower-x")) == ["Subs"]